@@ -6,7 +6,47 @@ load_dotenv()
 class Settings:
     MONGO_URI = os.getenv("MONGO_URI")
     DB_NAME = os.getenv("DB_NAME")
+    # Mongo connection pool (see app.database.DatabaseProvider)
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0)) or None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 20000))
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,snappy"
+    MONGO_APP_NAME = os.getenv("MONGO_APP_NAME", "timetable-api")
+    # Read-preference routing for read-heavy endpoints (see app.database.reader)
+    READ_PREFERENCE_ROUTING = os.getenv("READ_PREFERENCE_ROUTING", "true").lower() == "true"
+    READ_PREFERENCES = os.getenv("READ_PREFERENCES", "")
+    READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", 90))  # Mongo minimum is 90
     JWT_SECRET = os.getenv("JWT_SECRET")
     JWT_EXPIRE_HOURS = int(os.getenv("JWT_EXPIRE_HOURS", 8))
+    # Verified-token cache and optional revocation list (see app.security)
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    TOKEN_REVOCATION_ENABLED = os.getenv("TOKEN_REVOCATION_ENABLED", "false").lower() == "true"
+    TOKEN_REVOCATION_REFRESH_SECONDS = int(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", 30))
+    # Password hashing (see app.services.passwords); 29000 is passlib's default
+    PASSWORD_ROUNDS = int(os.getenv("PASSWORD_ROUNDS", 29000))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 256))
+    # Precompressed response cache (see app.services.response_cache)
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 512))
+    RESPONSE_CACHE_SPILL_DIR = os.getenv("RESPONSE_CACHE_SPILL_DIR", "")
+    RESPONSE_CACHE_SPILL_MAX = int(os.getenv("RESPONSE_CACHE_SPILL_MAX", 4096))
+    # Calendar feeds (see app.services.ical); SEMESTER_START is an ISO date and
+    # required for feeds, CALENDAR_TIMEZONE an IANA zone such as Africa/Nairobi
+    SEMESTER_START = os.getenv("SEMESTER_START", "")
+    SEMESTER_WEEKS = int(os.getenv("SEMESTER_WEEKS", 15))
+    CALENDAR_TIMEZONE = os.getenv("CALENDAR_TIMEZONE", "")
+    # Peak-memory tracing of generation runs (see app.services.run_recorder);
+    # tracemalloc slows every allocation while on, so it is opt-in
+    RUN_TRACK_MEMORY = os.getenv("RUN_TRACK_MEMORY", "false").lower() == "true"
+    # Headcount reconciliation interval (see app.services.enrollment); 0 disables
+    COUNT_RECONCILE_SECONDS = int(os.getenv("COUNT_RECONCILE_SECONDS", 3600))
+    # Per-request query instrumentation (see app.utils.query_tracker)
+    QUERY_WARN_COUNT = int(os.getenv("QUERY_WARN_COUNT", 50))
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 10))
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+    # Opt-in: admin requests with X-Profile: 1 are profiled (see app.utils.profiling)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
 
 settings = Settings()
@@ -1,5 +1,175 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextvars import ContextVar
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo.read_preferences import Primary, SecondaryPreferred, Nearest
 from app.config import settings
+from app.utils.metrics import mongo_command_metrics, pool_metrics
+from app.utils.query_tracker import query_tracker
 
-client = AsyncIOMotorClient(settings.MONGO_URI)
-db = client[settings.DB_NAME]
+
+class DatabaseProvider:
+    """Holds the active database handle.
+
+    `start()` builds the Motor client from `Settings` and is called from the
+    FastAPI lifespan; `close()` releases its pool on shutdown. Scripts that
+    never start the app get a client lazily on first use. Tests and
+    benchmarks can install another backend (see `app.testing`) without a
+    Mongo server.
+    """
+
+    def __init__(self):
+        self.client = None
+        self._database = None
+
+    @staticmethod
+    def client_options():
+        options = {
+            "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+            "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+            "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+            "appname": settings.MONGO_APP_NAME,
+            "event_listeners": [mongo_command_metrics, query_tracker, pool_metrics],
+        }
+        if settings.MONGO_COMPRESSORS:
+            options["compressors"] = settings.MONGO_COMPRESSORS
+        return options
+
+    def start(self):
+        if self._database is None:
+            self.client = AsyncIOMotorClient(settings.MONGO_URI, **self.client_options())
+            self._database = self.client[settings.DB_NAME]
+        return self._database
+
+    def close(self):
+        if self.client is not None and hasattr(self.client, "close"):
+            self.client.close()
+        self.client = None
+        self._database = None
+
+    def get(self):
+        if self._database is None:
+            return self.start()
+        return self._database
+
+    def use(self, database, client=None):
+        """Swap the active database (e.g. for an in-memory backend)"""
+        self._database = database
+        self.client = client
+
+
+provider = DatabaseProvider()
+
+# Database bound to the current request by `bind_database`. Falls back to the
+# provider outside of a request (scripts, background jobs).
+_request_db: ContextVar = ContextVar("request_db", default=None)
+# Route template of the current request, used for read-preference routing
+_request_route: ContextVar = ContextVar("request_route", default=None)
+
+
+def get_db():
+    """FastAPI dependency returning the database for this request.
+
+    Override with `app.dependency_overrides[get_db]` to point every route at
+    another backend.
+    """
+    return provider.get()
+
+
+def bind_database(database, route: str = None):
+    """Bind `database` (and the matched route) to the running request"""
+    _request_db.set(database)
+    _request_route.set(route)
+
+
+class _DatabaseProxy:
+    """Module-level `db` that resolves to the request-bound database"""
+
+    def _target(self):
+        database = _request_db.get()
+        return provider.get() if database is None else database
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __getitem__(self, name):
+        return self._target()[name]
+
+
+db = _DatabaseProxy()
+
+
+# ==================== READ PREFERENCE ROUTING ====================
+
+# Read-heavy routes that tolerate slightly stale data. Anything not listed
+# (writes, read-your-write paths such as select_time_slot) reads the primary.
+ROUTE_READ_PREFERENCES = {
+    "/student/timetable": "secondaryPreferred",
+    "/student/courses": "secondaryPreferred",
+    "/student/departments": "secondaryPreferred",
+    "/lecturer/available-slots/{assignment_id}": "secondaryPreferred",
+    "/admin/colleges": "nearest",
+    "/admin/departments": "nearest",
+    "/admin/rooms": "nearest",
+    "/admin/available-rooms": "nearest",
+    "/admin/courses": "nearest",
+    "/admin/lecturer-assignments": "nearest",
+    "/admin/users": "nearest",
+    "/admin/timeslots": "nearest",
+    "/admin/timetable": "nearest",
+    "/admin/export/timetable.csv": "secondaryPreferred",
+    "/admin/export/timetable.xlsx": "secondaryPreferred",
+}
+
+
+def _build_read_preference(mode: str):
+    staleness = settings.READ_MAX_STALENESS_SECONDS
+    if mode == "secondaryPreferred":
+        return SecondaryPreferred(max_staleness=staleness)
+    if mode == "nearest":
+        return Nearest(max_staleness=staleness)
+    return Primary()
+
+
+def _route_modes():
+    modes = dict(ROUTE_READ_PREFERENCES)
+    # READ_PREFERENCES="/student/courses=primary,/admin/rooms=secondaryPreferred"
+    for item in settings.READ_PREFERENCES.split(","):
+        route, _, mode = item.strip().partition("=")
+        if route and mode:
+            modes[route] = mode
+    return modes
+
+
+_READ_PREFERENCES = {route: _build_read_preference(mode) for route, mode in _route_modes().items()}
+_reader_cache = {}
+
+
+def read_preference_for(route: str):
+    if not settings.READ_PREFERENCE_ROUTING or route is None:
+        return None
+    preference = _READ_PREFERENCES.get(route)
+    return None if isinstance(preference, Primary) else preference
+
+
+def reader(name: str):
+    """
+    Collection `name` configured with the current route's read preference.
+
+    Use for reads only; writes and reads that must observe the request's own
+    writes should keep using `db` directly, which always targets the primary.
+    """
+    collection = db[name]
+    preference = read_preference_for(_request_route.get())
+    if preference is None:
+        return collection
+    key = (id(collection.database), name, preference.mode, preference.max_staleness)
+    cached = _reader_cache.get(key)
+    if cached is None:
+        configured = collection.with_options(read_preference=preference)
+        # The in-memory backend's with_options returns a synchronous
+        # collection; it has no secondaries anyway, so keep the async one
+        if not isinstance(configured, AsyncIOMotorCollection):
+            configured = collection
+        cached = _reader_cache[key] = configured
+    return cached
@@ -1,13 +1,68 @@
-from fastapi import Depends, HTTPException
+import time
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
-from app.security import decode_token
+from app.config import settings
+from app.security import bearer_token, token_digest, token_verifier
+from app.database import db, get_db, bind_database
 
 oauth2 = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+
+async def use_request_db(request: Request, database=Depends(get_db)):
+    """App-wide dependency so overriding `get_db` reaches every route"""
+    route = request.scope.get("route")
+    bind_database(database, getattr(route, "path", None))
+
+
+_revocations_loaded_at = 0.0
+
+
+async def _refresh_revocations():
+    """Reload the shared revocation list at most every few seconds"""
+    global _revocations_loaded_at
+    now = time.monotonic()
+    if now - _revocations_loaded_at < settings.TOKEN_REVOCATION_REFRESH_SECONDS:
+        return
+    _revocations_loaded_at = now
+    entries = []
+    cursor = db.revoked_tokens.find({"exp": {"$gt": time.time()}}, {"digest": 1, "exp": 1})
+    async for doc in cursor:
+        entries.append((doc["digest"], doc["exp"]))
+    token_verifier.load_revoked(entries)
+
+
+async def get_token_payload(request: Request) -> dict:
+    """
+    Verified claims of the request's bearer token.
+
+    The header is parsed and verified once per request; later callers read
+    the claims from `request.state`.
+    """
+    payload = getattr(request.state, "token_payload", None)
+    if payload is None:
+        token = bearer_token(request.headers.get("authorization"))
+        if settings.TOKEN_REVOCATION_ENABLED:
+            await _refresh_revocations()
+        payload = token_verifier.verify(token)
+        request.state.token = token
+        request.state.token_payload = payload
+    return payload
+
+
+async def revoke_token(token: str, exp: float):
+    """Revoke a token on this worker and, if enabled, for all workers"""
+    digest = token_digest(token)
+    token_verifier.revoke(digest, exp)
+    if settings.TOKEN_REVOCATION_ENABLED:
+        await db.revoked_tokens.update_one(
+            {"digest": digest}, {"$set": {"digest": digest, "exp": exp}}, upsert=True
+        )
+
+
 def require_role(role: str):
-    def checker(token: str = Depends(oauth2)):
+    async def checker(request: Request, token: str = Depends(oauth2)):
         try:
-            payload = decode_token(token)
+            payload = await get_token_payload(request)
             if payload.get("role") != role:
                 raise HTTPException(status_code=403, detail="Insufficient permissions")
             return payload
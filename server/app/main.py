@@ -1,9 +1,38 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, admin, lecturer, student, timetable
+from fastapi.responses import PlainTextResponse
+from app.routes import auth, admin, lecturer, student, timetable, calendar
+from app.config import settings
+from app.database import provider
+from app.services.enrollment import reconcile_forever
+from app.dependencies import use_request_db
+from app.utils.metrics import MetricsMiddleware, render_metrics
+from app.utils.query_tracker import QueryTrackingMiddleware
+from app.utils.profiling import ProfilingMiddleware
+import asyncio
 import os
 
-app = FastAPI(title="Timetable Management System")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the Mongo pool once per worker and close it on shutdown
+    provider.start()
+    reconciler = None
+    if settings.COUNT_RECONCILE_SECONDS > 0:
+        reconciler = asyncio.create_task(reconcile_forever(settings.COUNT_RECONCILE_SECONDS))
+    yield
+    if reconciler:
+        reconciler.cancel()
+    provider.close()
+
+
+# `use_request_db` lets tests swap the database via `get_db` overrides
+app = FastAPI(
+    title="Timetable Management System",
+    lifespan=lifespan,
+    dependencies=[Depends(use_request_db)],
+)
 
 # Read allowed frontend origins from env for secure configuration.
 # Provide a comma-separated list in SERVER/.env, e.g.
@@ -19,6 +48,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profiles admin requests sent with X-Profile: 1.
+app.add_middleware(ProfilingMiddleware)
+
+# Counts Mongo commands per request and flags N+1 patterns.
+app.add_middleware(QueryTrackingMiddleware)
+
+# Added last so it is the outermost layer and times the whole stack.
+app.add_middleware(MetricsMiddleware)
+
 # Note: do NOT add wildcard Access-Control-Allow-Origin when allow_credentials
 # is True. The `CORSMiddleware` above will handle proper CORS responses.
 
@@ -27,8 +65,15 @@ app.include_router(admin.router)
 app.include_router(lecturer.router)
 app.include_router(student.router)
 app.include_router(timetable.router)
+app.include_router(calendar.router)
 
 
 @app.get("/")
 def root():
     return {"message": "Timetable backend is running!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -9,6 +9,10 @@ class TimeSlot(BaseModel):
     start_time: time
     end_time: time
     duration_hours: int  # 2 or 3
+    # Minutes since Monday 00:00 (see app.services.intervals)
+    day_index: Optional[int] = None
+    week_start: Optional[int] = None
+    week_end: Optional[int] = None
     semester: int
     academic_year: int
     created_at: Optional[datetime] = None
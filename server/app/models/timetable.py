@@ -47,6 +47,10 @@ class TimetableEntry(BaseModel):
     day: DayOfWeek
     start_time: time
     end_time: time
+    # Minutes since Monday 00:00 (see app.services.intervals)
+    day_index: Optional[int] = None
+    week_start: Optional[int] = None
+    week_end: Optional[int] = None
     status: str = "active"  # active, cancelled
     assignment_id: str
     created_at: Optional[datetime] = None
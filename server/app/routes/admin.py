@@ -1,7 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.database import db
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from app.database import db, reader
 from app.dependencies import require_role
+from app.utils.profiling import get_profile
+from app.services import versioning
+from app.services.response_cache import response_cache, cached_response
+from app.services.export import stream_csv, write_xlsx
+from app.services import bulk_import, enrollment
+from app.services.intervals import with_interval
+from app.services.room_index import RoomIndex
+import os
 from bson import ObjectId
+from pymongo import UpdateOne
 from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Optional, List
@@ -47,7 +58,7 @@ async def add_college(college: CollegeCreate):
 
 @router.get("/colleges", dependencies=[Depends(require_role("admin"))])
 async def list_colleges():
-    cursor = db.colleges.find({})
+    cursor = reader("colleges").find({})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -84,7 +95,7 @@ async def add_department(dept: DepartmentCreate):
 
 @router.get("/departments", dependencies=[Depends(require_role("admin"))])
 async def list_departments():
-    cursor = db.departments.find({})
+    cursor = reader("departments").find({})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -125,7 +136,7 @@ async def add_room(room: RoomCreate):
 
 @router.get("/rooms", dependencies=[Depends(require_role("admin"))])
 async def list_rooms():
-    cursor = db.rooms.find({})
+    cursor = reader("rooms").find({})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -134,7 +145,7 @@ async def list_rooms():
 
 @router.get("/available-rooms", dependencies=[Depends(require_role("admin"))])
 async def list_available_rooms():
-    cursor = db.rooms.find({"is_available": True})
+    cursor = reader("rooms").find({"is_available": True})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -191,8 +202,8 @@ async def populate_course_units(course_id: str, payload: dict):
     
     units = payload.get("units", [])  # List of {year, semester, code, name, credits, hours}
     
-    for unit in units:
-        unit_doc = {
+    unit_docs = [
+        {
             "_id": ObjectId(),
             "code": unit.get("code"),
             "name": unit.get("name"),
@@ -200,11 +211,15 @@ async def populate_course_units(course_id: str, payload: dict):
             "semester": unit.get("semester"),
             "credits": unit.get("credits", 3),
             "total_hours": unit.get("total_hours", 45),
+            "room_type": unit.get("room_type"),
             "created_at": datetime.utcnow()
         }
+        for unit in units
+    ]
+    if unit_docs:
         await db.courses.update_one(
             {"_id": course_oid},
-            {"$push": {"units": unit_doc}}
+            {"$push": {"units": {"$each": unit_docs}}}
         )
     
     updated = await db.courses.find_one({"_id": course_oid})
@@ -213,7 +228,7 @@ async def populate_course_units(course_id: str, payload: dict):
 
 @router.get("/courses", dependencies=[Depends(require_role("admin"))])
 async def list_courses():
-    cursor = db.courses.find({})
+    cursor = reader("courses").find({})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -285,13 +300,14 @@ async def assign_lecturer(assignment: LecturerAssignmentCreate):
     doc["class_status"] = "pending"
     doc["created_at"] = datetime.utcnow()
     res = await db.lecturer_assignments.insert_one(doc)
+    await versioning.bump(versioning.lecturer_key(assignment.lecturer_id))
     
     return {"message": "Lecturer assigned", "id": str(res.inserted_id)}
 
 
 @router.get("/lecturer-assignments", dependencies=[Depends(require_role("admin"))])
 async def list_lecturer_assignments():
-    cursor = db.lecturer_assignments.find({})
+    cursor = reader("lecturer_assignments").find({})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -332,7 +348,7 @@ async def get_available_lecturer_ids():
 
 @router.get("/users", dependencies=[Depends(require_role("admin"))])
 async def list_users():
-    cursor = db.users.find({}, {"password": 0})
+    cursor = reader("users").find({}, {"password": 0})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -366,7 +382,7 @@ class TimeSlotCreate(BaseModel):
 
 @router.post("/timeslot", dependencies=[Depends(require_role("admin"))])
 async def add_timeslot(slot: TimeSlotCreate):
-    doc = slot.dict()
+    doc = with_interval(slot.dict())
     doc["created_at"] = datetime.utcnow()
     res = await db.timeslots.insert_one(doc)
     return {"message": "Time slot added", "id": str(res.inserted_id)}
@@ -374,7 +390,7 @@ async def add_timeslot(slot: TimeSlotCreate):
 
 @router.get("/timeslots", dependencies=[Depends(require_role("admin"))])
 async def list_timeslots():
-    cursor = db.timeslots.find({})
+    cursor = reader("timeslots").find({})
     docs = []
     async for d in cursor:
         docs.append(_serialize(d))
@@ -433,7 +449,7 @@ async def assign_unit_to_lecturer(course_id: str, unit_id: str, payload: dict):
         "unit_id": str(unit_oid),
         "department_id": str(course.get("department_id", "")),
         "room_id": "",  # To be assigned later or during scheduling
-        "student_count": 0,
+        "student_count": unit.get("student_count", 0),
         "class_status": "pending",
         "created_at": datetime.utcnow()
     }
@@ -447,6 +463,7 @@ async def assign_unit_to_lecturer(course_id: str, unit_id: str, payload: dict):
     
     if not existing:
         await db.lecturer_assignments.insert_one(assignment_doc)
+        await versioning.bump(versioning.lecturer_key(str(lecturer["_id"])))
     
     # Return updated course
     updated = await db.courses.find_one({"_id": course_oid})
@@ -474,6 +491,7 @@ async def update_assignment_status(assignment_id: str, payload: dict):
         raise HTTPException(status_code=404, detail="Assignment not found")
     
     updated = await db.lecturer_assignments.find_one({"_id": oid})
+    await versioning.bump(versioning.lecturer_key(updated.get("lecturer_id")))
     return _serialize(updated)
 
 
@@ -610,6 +628,7 @@ async def add_unit_to_course(course_id: str, payload: dict):
         "semester": payload.get("semester", 1),
         "credits": payload.get("credits", 3),
         "total_hours": payload.get("total_hours", 45),
+        "room_type": payload.get("room_type"),
         "created_at": datetime.utcnow()
     }
     
@@ -626,13 +645,143 @@ async def add_unit_to_course(course_id: str, payload: dict):
 
 
 @router.get("/timetable", dependencies=[Depends(require_role("admin"))])
-async def get_timetable():
+async def get_timetable(request: Request, response: Response):
     """Get all timetable entries"""
-    cursor = db.timetables.find({})
-    docs = []
-    async for d in cursor:
-        docs.append(_serialize(d))
-    return {"data": docs}
+    not_modified, versions = await versioning.conditional(
+        request, response, "admin_timetable", [versioning.TIMETABLE]
+    )
+    if not_modified:
+        return not_modified
+    
+    version = versions[versioning.TIMETABLE]
+    
+    async def build():
+        # Filled from the primary so the body matches its version
+        docs = []
+        async for d in db.timetable_entries.find({}):
+            docs.append(_serialize(d))
+        return {"data": docs}
+    
+    cached = await response_cache.get_or_build(("admin_timetable", None, None, None, version), build)
+    return cached_response(request, cached, dict(response.headers))
+
+
+# ==================== TIMETABLE EXPORT ====================
+
+async def _export_query(department_id: Optional[str], room: Optional[str], lecturer_id: Optional[str],
+                        day: Optional[str], semester: Optional[int], academic_year: Optional[int]) -> dict:
+    query = {}
+    if department_id:
+        # Entries only carry course ids; resolve the department's courses once
+        course_ids = [str(c["_id"]) async for c in db.courses.find({"department_id": department_id}, {"_id": 1})]
+        query["course_id"] = {"$in": course_ids}
+    if room:
+        query["$or"] = [{"room": room}, {"room_code": room}, {"room_id": room}]
+    if lecturer_id:
+        query["lecturer_id"] = lecturer_id
+    if day:
+        query["day"] = day
+    if semester is not None:
+        query["semester"] = semester
+    if academic_year is not None:
+        query["academic_year"] = academic_year
+    return query
+
+
+@router.get("/export/timetable.csv", dependencies=[Depends(require_role("admin"))])
+async def export_timetable_csv(
+    department_id: Optional[str] = None,
+    room: Optional[str] = None,
+    lecturer_id: Optional[str] = None,
+    day: Optional[str] = None,
+    semester: Optional[int] = None,
+    academic_year: Optional[int] = None
+):
+    """Stream timetable entries as CSV, optionally filtered"""
+    query = await _export_query(department_id, room, lecturer_id, day, semester, academic_year)
+    cursor = reader("timetable_entries").find(query)
+    return StreamingResponse(
+        stream_csv(cursor),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="timetable.csv"'}
+    )
+
+
+@router.get("/export/timetable.xlsx", dependencies=[Depends(require_role("admin"))])
+async def export_timetable_xlsx(
+    department_id: Optional[str] = None,
+    room: Optional[str] = None,
+    lecturer_id: Optional[str] = None,
+    day: Optional[str] = None,
+    semester: Optional[int] = None,
+    academic_year: Optional[int] = None
+):
+    """Export timetable entries as an Excel workbook, optionally filtered"""
+    query = await _export_query(department_id, room, lecturer_id, day, semester, academic_year)
+    try:
+        path = await write_xlsx(reader("timetable_entries").find(query))
+    except ImportError:
+        raise HTTPException(status_code=501, detail="XLSX export requires the xlsxwriter package")
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename="timetable.xlsx",
+        background=BackgroundTask(os.remove, path)
+    )
+
+
+# ==================== BULK IMPORT ====================
+
+def _import_rows(request: Request, format: Optional[str]):
+    """Rows of a streamed CSV or JSON Lines body; the format defaults from the content type"""
+    if not format:
+        content_type = request.headers.get("content-type", "")
+        format = "jsonl" if "json" in content_type else "csv"
+    try:
+        return bulk_import.rows_for_format(format, bulk_import.lines_from_chunks(request.stream()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/import/{kind}", dependencies=[Depends(require_role("admin"))])
+async def import_data(kind: str, request: Request, format: Optional[str] = None):
+    """
+    Bulk import courses, units, rooms or enrollments from a CSV or JSON Lines
+    request body. The body is parsed as it arrives and written in batches;
+    rows that fail validation or reference unknown codes are reported
+    without aborting the import.
+    """
+    if kind not in bulk_import.ROW_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown import kind: {kind}")
+    return await bulk_import.import_rows(kind, _import_rows(request, format))
+
+
+@router.post("/enrollments/bulk", dependencies=[Depends(require_role("admin"))])
+async def bulk_enroll(request: Request, format: Optional[str] = None):
+    """
+    Enroll students from a streamed list of records
+    (JSON Lines or CSV with columns student, course_id, unit_ids).
+    Same as POST /admin/import/enrollment_ids.
+    """
+    return await bulk_import.import_rows("enrollment_ids", _import_rows(request, format))
+
+
+@router.post("/reconcile-counts", dependencies=[Depends(require_role("admin"))])
+async def reconcile_counts():
+    """Recompute course and unit headcounts from enrollments and report drift"""
+    return await enrollment.reconcile_counts()
+
+
+# ==================== PROFILING ====================
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_role("admin"))])
+async def get_request_profile(profile_id: str):
+    """Fetch a profile captured with the X-Profile header"""
+    profile = await get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    media_type, body = profile
+    return Response(content=body, media_type=media_type)
 
 
 # ==================== ROOM ASSIGNMENT ALGORITHM ====================
@@ -641,8 +790,10 @@ async def get_timetable():
 async def assign_rooms_to_units():
     """
     Automatically assign rooms to all units based on:
-    - Student enrollment count for each unit (room capacity >= enrollment)
-    - First-fit algorithm: uses first available suitable room
+    - Student headcount for each unit (room capacity >= enrollment)
+    - Room type: units with a room_type get that type, others never get labs
+    - Best fit: the smallest suitable available room, preferring the
+      building of the course's department
     """
     try:
         # Get all courses with their units
@@ -651,13 +802,11 @@ async def assign_rooms_to_units():
         async for course in course_cursor:
             courses.append(_serialize(course))
         
-        # Get all rooms
-        rooms = []
-        room_cursor = db.rooms.find({})
-        async for room in room_cursor:
-            rooms.append(_serialize(room))
+        # Index available rooms by type and building
+        rooms = await db.rooms.find({}).to_list(None)
+        room_index = RoomIndex.from_documents(rooms)
         
-        if not rooms:
+        if not len(room_index):
             raise HTTPException(status_code=400, detail="No rooms available in the system")
         
         results = {
@@ -665,6 +814,8 @@ async def assign_rooms_to_units():
             "failed": [],
             "total_units": 0
         }
+        updates = []
+        assigned_at = datetime.utcnow()
         
         # Process each course and its units
         for course in courses:
@@ -681,50 +832,43 @@ async def assign_rooms_to_units():
                 
                 results["total_units"] += 1
                 
-                # Count students enrolled in this specific unit
-                student_count = 0
-                enrollment_cursor = db.student_enrollments.find({"course_id": course_id_str, "unit_ids": {"$in": [str(unit_id)]}})
-                async for enrollment in enrollment_cursor:
-                    student_count += 1
+                # Per-unit headcount maintained by enroll/withdraw
+                student_count = unit.get("student_count", 0)
                 
                 if student_count == 0:
                     student_count = 1  # Default to 1 if no enrollments yet
                 
-                # Find suitable rooms (capacity >= student count)
-                suitable_rooms = [
-                    r for r in rooms 
-                    if r.get("capacity", 0) >= student_count
-                ]
+                room = room_index.best_fit(student_count, unit.get("room_type"), course.get("department_id"))
                 
-                if not suitable_rooms:
+                if room is None:
+                    kind = f"{unit['room_type']} " if unit.get("room_type") else ""
                     results["failed"].append({
                         "course_id": course_id_str,
                         "course_name": course.get("name", "Unknown"),
                         "unit_id": str(unit_id),
                         "unit_code": unit_code,
                         "unit_name": unit_name,
-                        "reason": f"No room with capacity >= {student_count} students"
+                        "reason": f"No available {kind}room with capacity >= {student_count} students"
                     })
                     continue
                 
-                # Use first-fit: assign the first suitable room
-                assigned_room = suitable_rooms[0]
+                assigned_room = room_index.record(room)
                 
                 # Update unit with room assignment (store room name, not ID)
                 course_id_obj = ObjectId(course_id_str)
                 unit_id_obj = ObjectId(unit_id) if isinstance(unit_id, str) else unit_id
-                room_name = assigned_room.get("name", "")
+                room_name = assigned_room.name or ""
                 
-                await db.courses.update_one(
+                updates.append(UpdateOne(
                     {"_id": course_id_obj, "units._id": unit_id_obj},
                     {
                         "$set": {
                             "units.$.room": room_name,
-                            "units.$.room_code": assigned_room.get("code", ""),
-                            "units.$.assigned_at": datetime.utcnow()
+                            "units.$.room_code": assigned_room.code or "",
+                            "units.$.assigned_at": assigned_at
                         }
                     }
-                )
+                ))
                 
                 results["assigned"].append({
                     "course_id": course_id_str,
@@ -733,11 +877,15 @@ async def assign_rooms_to_units():
                     "unit_code": unit_code,
                     "unit_name": unit_name,
                     "room": room_name,
-                    "room_code": assigned_room.get("code", ""),
-                    "capacity": assigned_room.get("capacity", 0),
+                    "room_code": assigned_room.code or "",
+                    "room_house": assigned_room.house,
+                    "capacity": room_index.capacity(room),
                     "students": student_count
                 })
         
+        if updates:
+            await db.courses.bulk_write(updates, ordered=False)
+        
         return {
             "message": "Room assignment to units completed",
             "summary": {
@@ -752,4 +900,3 @@ async def assign_rooms_to_units():
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Room assignment failed: {str(e)}")
-
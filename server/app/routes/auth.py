@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, EmailStr
-from passlib.hash import pbkdf2_sha256 as pwd_hasher
 from app.database import db
-from app.security import create_token, decode_token
+from app.security import create_token
+from app.dependencies import get_token_payload, revoke_token
+from app.services.passwords import passwords
+from app.services import versioning
 from bson import ObjectId
 from datetime import datetime
 import re
@@ -86,7 +88,7 @@ async def register_student(user: StudentRegisterModel):
         raise HTTPException(status_code=409, detail="Registration number already registered")
     
     # Create user
-    hashed = pwd_hasher.hash(user.password)
+    hashed = await passwords.hash(user.password)
     user_doc = {
         "email": user.email,
         "password": hashed,
@@ -120,7 +122,7 @@ async def register_lecturer(user: LecturerRegisterModel):
         raise HTTPException(status_code=409, detail="Email already registered")
     
     # Create user
-    hashed = pwd_hasher.hash(user.password)
+    hashed = await passwords.hash(user.password)
     user_doc = {
         "email": user.email,
         "password": hashed,
@@ -154,7 +156,7 @@ async def register_admin(user: AdminRegisterModel):
         raise HTTPException(status_code=409, detail="Email already registered")
     
     # Create user
-    hashed = pwd_hasher.hash(user.password)
+    hashed = await passwords.hash(user.password)
     user_doc = {
         "email": user.email,
         "password": hashed,
@@ -181,8 +183,14 @@ async def register_admin(user: AdminRegisterModel):
 async def login(credentials: LoginModel):
     # Find user with specific role
     user = await db.users.find_one({"email": credentials.email, "role": credentials.role})
-    if not user or not pwd_hasher.verify(credentials.password, user["password"]):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials or role mismatch")
+    valid, new_hash = await passwords.verify_and_update(credentials.password, user.get("password", ""))
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials or role mismatch")
+    if new_hash:
+        # Rounds changed since this hash was made; upgrade it transparently
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
     
     token = create_token({"user_id": str(user["_id"]), "email": credentials.email, "role": user["role"]})
 
@@ -203,15 +211,17 @@ async def login(credentials: LoginModel):
     return {"access_token": token, "user": safe_user}
 
 
+@router.post("/logout")
+async def logout(request: Request):
+    """Revoke the caller's token before it expires"""
+    payload = await get_token_payload(request)
+    await revoke_token(request.state.token, payload.get("exp", 0))
+    return {"message": "Logged out"}
+
+
 @router.get("/me")
-async def me(authorization: str = Header(None)):
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    token = parts[1]
-    payload = decode_token(token)
+async def me(request: Request):
+    payload = await get_token_payload(request)
     email = payload.get("email")
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token payload")
@@ -236,17 +246,9 @@ async def me(authorization: str = Header(None)):
 
 
 @router.get("/users")
-async def list_all_users(authorization: str = Header(None)):
+async def list_all_users(request: Request):
     """List all users in the system (requires admin role)"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    payload = decode_token(token)
+    payload = await get_token_payload(request)
     
     # Only admins can list all users
     if payload.get("role") != "admin":
@@ -294,17 +296,9 @@ class CreateAdminModel(BaseModel):
 
 
 @router.post("/create/lecturer", status_code=201)
-async def create_lecturer(lecturer: CreateLecturerModel, authorization: str = Header(None)):
+async def create_lecturer(lecturer: CreateLecturerModel, request: Request):
     """Create a new lecturer account (admin only)"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    payload = decode_token(token)
+    payload = await get_token_payload(request)
     
     # Only admins can create lecturer accounts
     if payload.get("role") != "admin":
@@ -323,7 +317,7 @@ async def create_lecturer(lecturer: CreateLecturerModel, authorization: str = He
     if len(lecturer.password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
-    hashed = pwd_hasher.hash(lecturer.password)
+    hashed = await passwords.hash(lecturer.password)
     
     # Create user
     user_doc = {
@@ -353,17 +347,9 @@ async def create_lecturer(lecturer: CreateLecturerModel, authorization: str = He
 
 
 @router.post("/create/admin", status_code=201)
-async def create_admin(admin: CreateAdminModel, authorization: str = Header(None)):
+async def create_admin(admin: CreateAdminModel, request: Request):
     """Create a new admin account (super admin only)"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    payload = decode_token(token)
+    payload = await get_token_payload(request)
     
     # Only admins can create admin accounts
     if payload.get("role") != "admin":
@@ -381,7 +367,7 @@ async def create_admin(admin: CreateAdminModel, authorization: str = Header(None
     if len(admin.password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
-    hashed = pwd_hasher.hash(admin.password)
+    hashed = await passwords.hash(admin.password)
     
     # Create user
     user_doc = {
@@ -411,17 +397,9 @@ async def create_admin(admin: CreateAdminModel, authorization: str = Header(None
     }
 
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: str, authorization: str = Header(None)):
+async def delete_user(user_id: str, request: Request):
     """Delete a user account (admin only)"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    payload = decode_token(token)
+    payload = await get_token_payload(request)
     
     # Only admins can delete users
     if payload.get("role") != "admin":
@@ -462,28 +440,9 @@ class ProfileUpdateModel(BaseModel):
 
 
 @router.put("/profile")
-async def update_profile(profile_data: ProfileUpdateModel, authorization: str = Header(None)):
+async def update_profile(profile_data: ProfileUpdateModel, request: Request):
     """Update user profile information"""
-    print(f"DEBUG: Authorization header: {authorization}")
-    
-    if not authorization:
-        print("DEBUG: No authorization header")
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        print(f"DEBUG: Invalid auth format. Parts: {len(parts)}, First part: {parts[0] if parts else 'none'}")
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    print(f"DEBUG: Token: {token[:20]}...")
-    
-    try:
-        payload = decode_token(token)
-        print(f"DEBUG: Token decoded successfully. Payload: {payload}")
-    except Exception as e:
-        print(f"DEBUG: Token decode error: {str(e)}")
-        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    payload = await get_token_payload(request)
     
     user_id = payload.get("user_id")
     if not user_id:
@@ -527,6 +486,10 @@ async def update_profile(profile_data: ProfileUpdateModel, authorization: str =
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
+    if payload.get("role") == "lecturer":
+        # The lecturer dashboard embeds the profile
+        await versioning.bump(versioning.lecturer_key(user_id))
+    
     return {"message": "Profile updated successfully", "data": update_data}
 
 
@@ -540,21 +503,10 @@ class NotificationPreferencesModel(BaseModel):
 @router.post("/notification-preferences")
 async def save_notification_preferences(
     preferences: NotificationPreferencesModel,
-    authorization: str = Header(None)
+    request: Request
 ):
     """Save notification preferences for the user"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    try:
-        payload = decode_token(token)
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    payload = await get_token_payload(request)
     
     user_id = payload.get("user_id")
     if not user_id:
@@ -598,21 +550,10 @@ class ChangePasswordModel(BaseModel):
 @router.post("/change-password")
 async def change_password(
     password_data: ChangePasswordModel,
-    authorization: str = Header(None)
+    request: Request
 ):
     """Change user password"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    try:
-        payload = decode_token(token)
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    payload = await get_token_payload(request)
     
     user_id = payload.get("user_id")
     if not user_id:
@@ -633,11 +574,11 @@ async def change_password(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Verify current password
-    if not pwd_hasher.verify(password_data.current_password, user.get("password", "")):
+    if not await passwords.verify(password_data.current_password, user.get("password", "")):
         raise HTTPException(status_code=401, detail="Current password is incorrect")
     
     # Update password
-    hashed_password = pwd_hasher.hash(password_data.new_password)
+    hashed_password = await passwords.hash(password_data.new_password)
     try:
         await db.users.update_one(
             {"_id": user_obj_id},
@@ -650,20 +591,9 @@ async def change_password(
 
 
 @router.delete("/account")
-async def delete_account(authorization: str = Header(None)):
+async def delete_account(request: Request):
     """Delete user's own account"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    try:
-        payload = decode_token(token)
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    payload = await get_token_payload(request)
     
     user_id = payload.get("user_id")
     if not user_id:
@@ -701,22 +631,11 @@ async def delete_account(authorization: str = Header(None)):
 
 
 @router.get("/data-export")
-async def export_user_data(authorization: str = Header(None)):
+async def export_user_data(request: Request):
     """Export all user data as JSON"""
     import json
     
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    try:
-        payload = decode_token(token)
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    payload = await get_token_payload(request)
     
     user_id = payload.get("user_id")
     if not user_id:
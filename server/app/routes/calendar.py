@@ -0,0 +1,103 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from app.database import db
+from app.dependencies import get_token_payload
+from app.services import versioning
+from app.services.ical import build_calendar, feed_token, check_feed_token
+from app.services.response_cache import response_cache, cached_response, compress_body
+from bson import ObjectId
+from datetime import datetime
+
+router = APIRouter(prefix="/calendar", tags=["Calendar"])
+
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+
+
+def _serialize(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        new = {}
+        for k, v in value.items():
+            if k == "_id":
+                new["id"] = _serialize(v)
+            else:
+                new[k] = _serialize(v)
+        return new
+    if isinstance(value, list):
+        return [_serialize(v) for v in value]
+    return value
+
+
+@router.get("/feeds")
+async def get_feed_url(request: Request):
+    """Subscription URL for the current student's or lecturer's calendar"""
+    payload = await get_token_payload(request)
+    role = payload.get("role")
+    user_id = payload.get("user_id")
+    if role not in ("student", "lecturer") or not user_id:
+        raise HTTPException(status_code=400, detail="Calendar feeds are available to students and lecturers")
+    path = f"/calendar/{role}/{user_id}/{feed_token(role, user_id)}.ics"
+    return {"url": str(request.base_url).rstrip("/") + path, "path": path}
+
+
+async def _student_entries(user_id: str):
+    user = await db.users.find_one({"_id": ObjectId(user_id), "role": "student"})
+    if not user:
+        raise HTTPException(status_code=404, detail="Student not found")
+    course_ids = [e.get("course_id") async for e in db.student_enrollments.find(
+        {"student": user["email"]}, {"course_id": 1})]
+    entries = []
+    async for entry in db.timetable_entries.find({"course_id": {"$in": course_ids}}):
+        entries.append(_serialize(entry))
+    return user.get("name") or user["email"], entries
+
+
+async def _lecturer_entries(user_id: str):
+    user = await db.users.find_one({"_id": ObjectId(user_id), "role": "lecturer"})
+    if not user:
+        raise HTTPException(status_code=404, detail="Lecturer not found")
+    entries = []
+    async for entry in db.timetable_entries.find({"lecturer_id": user_id}):
+        entries.append(_serialize(entry))
+    return user.get("name") or user["email"], entries
+
+
+@router.get("/{kind}/{user_id}/{token}.ics")
+async def get_calendar_feed(kind: str, user_id: str, token: str, request: Request):
+    """
+    Weekly recurring iCalendar feed for a student or lecturer.
+
+    Calendar clients poll these often, so the feed is rebuilt only when the
+    version counters it depends on change; otherwise it is a 304 or a cached
+    body.
+    """
+    if kind not in ("student", "lecturer") or not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=404, detail="Feed not found")
+    if not check_feed_token(kind, user_id, token):
+        raise HTTPException(status_code=404, detail="Feed not found")
+
+    if kind == "student":
+        keys = [versioning.TIMETABLE, versioning.student_key(user_id)]
+    else:
+        keys = [versioning.lecturer_key(user_id)]
+    versions = await versioning.current_versions(keys)
+    etag = versioning.make_etag(f"ics_{kind}", versions)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=300"}
+    if versioning.etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    async def build():
+        loader = _student_entries if kind == "student" else _lecturer_entries
+        name, entries = await loader(user_id)
+        try:
+            return build_calendar(f"{name} - Timetable", entries)
+        except ValueError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    cached = await response_cache.get_or_build(
+        (f"ics_{kind}", user_id, None, None, tuple(sorted(versions.items()))),
+        build, compress_body
+    )
+    return cached_response(request, cached, headers, media_type=ICS_MEDIA_TYPE)
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from app.database import db
-from app.dependencies import require_role
-from app.security import decode_token
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from app.database import db, reader
+from app.dependencies import require_role, get_token_payload
+from app.services import availability, versioning
+from app.services.room_index import RoomIndex
+from app.services.slot_ranking import PendingAssignment, SlotRanker
+from app.services.intervals import (
+    MINUTES_PER_DAY, interval_fields, interval_of, overlaps, slot_conflict_query,
+    week_interval, with_interval,
+)
 from bson import ObjectId
+from collections import defaultdict
 from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional, List
@@ -28,17 +35,9 @@ def _serialize(value):
     return value
 
 
-async def get_current_lecturer(authorization: str = Header(None)):
-    """Get current lecturer from token"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    payload = decode_token(token)
+async def get_current_lecturer(request: Request):
+    """Get current lecturer from the request's verified token"""
+    payload = await get_token_payload(request)
     email = payload.get("email")
     
     if not email:
@@ -54,9 +53,9 @@ async def get_current_lecturer(authorization: str = Header(None)):
 # ==================== ASSIGNMENTS ====================
 
 @router.get("/assignments", dependencies=[Depends(require_role("lecturer"))])
-async def get_assignments(authorization: str = Header(None)):
+async def get_assignments(request: Request):
     """Get all assignments for lecturer"""
-    lecturer = await get_current_lecturer(authorization)
+    lecturer = await get_current_lecturer(request)
     
     cursor = db.lecturer_assignments.find({"lecturer_id": lecturer["id"]})
     assignments = []
@@ -102,10 +101,10 @@ async def get_assignments(authorization: str = Header(None)):
 @router.get("/assignments/{assignment_id}", dependencies=[Depends(require_role("lecturer"))])
 async def get_assignment_detail(
     assignment_id: str,
-    authorization: str = Header(None)
+    request: Request
 ):
     """Get assignment details with full information"""
-    lecturer = await get_current_lecturer(authorization)
+    lecturer = await get_current_lecturer(request)
     
     try:
         oid = ObjectId(assignment_id)
@@ -168,14 +167,18 @@ class TimeSlotPreference(BaseModel):
 @router.get("/available-slots/{assignment_id}", dependencies=[Depends(require_role("lecturer"))])
 async def get_available_slots(
     assignment_id: str,
-    authorization: str = Header(None)
+    request: Request,
+    rank: bool = False,
+    top: int = 5
 ):
     """
     Get available time slots for an assignment (7 AM - 7 PM).
     Provides both 2-hour and 3-hour lecture options.
     Limits to maximum 2 selections per unit per week.
+    With ?rank=true, also returns the `top` selectable slots (green or red)
+    ranked by marginal cost (see app.services.slot_ranking), each with its reasons.
     """
-    lecturer = await get_current_lecturer(authorization)
+    lecturer = await get_current_lecturer(request)
     
     try:
         oid = ObjectId(assignment_id)
@@ -228,7 +231,8 @@ async def get_available_slots(
                 "start_time": slot["start"],
                 "end_time": slot["end"],
                 "display": slot["display"],
-                "duration": "2 hours"
+                "duration": "2 hours",
+                **interval_fields(day, slot["start"], slot["end"])
             })
         # Add 3-hour slots
         for slot in slots_3hr:
@@ -237,40 +241,41 @@ async def get_available_slots(
                 "start_time": slot["start"],
                 "end_time": slot["end"],
                 "display": slot["display"],
-                "duration": "3 hours"
+                "duration": "3 hours",
+                **interval_fields(day, slot["start"], slot["end"])
             })
     
-    # Get booked slots (confirmed timetable entries)
-    booked_slots = []
-    timetable_cursor = db.timetable_entries.find({})
+    # Get booked intervals of other units, grouped by day. Other lecturers'
+    # bookings may come from a secondary; this lecturer's own selections below
+    # are read from the primary so a fresh selection always shows up.
+    booked_by_day = defaultdict(list)
+    other_entries = []
+    timetable_cursor = reader("timetable_entries").find(
+        {"unit_id": {"$ne": unit_id}},
+        {"day": 1, "start_time": 1, "end_time": 1, "week_start": 1, "week_end": 1,
+         "unit_id": 1, "lecturer_id": 1, "room_id": 1, "room": 1}
+    )
     async for entry in timetable_cursor:
-        booked_slots.append(_serialize(entry))
+        interval = interval_of(entry)
+        if interval:
+            booked_by_day[interval[0] // MINUTES_PER_DAY].append(interval)
+            other_entries.append(entry)
     
     # Get all slots already selected by this lecturer for this unit
     lecturer_slots = await db.timetable_entries.find({"unit_id": unit_id, "lecturer_id": lecturer["id"]}).to_list(None)
-    lecturer_selected_slots = [_serialize(slot) for slot in lecturer_slots]
+    selected_intervals = {interval_of(slot) for slot in lecturer_slots}
     
     # Mark availability
     available_slots = []
     can_select_more = selected_count < 2  # Max 2 selections per unit
     
     for slot in all_slots:
-        # Check if slot is booked by any lecturer (but not by this lecturer for same unit)
-        is_booked = any(
-            ts["day"] == slot["day"] and
-            ts["start_time"] == slot["start_time"] and
-            ts["end_time"] == slot["end_time"] and
-            ts.get("unit_id") != unit_id  # Only blocked if booked by different unit
-            for ts in booked_slots
-        )
+        interval = (slot["week_start"], slot["week_end"])
+        # Blocked if any other unit's entry overlaps this slot
+        is_booked = any(overlaps(interval, b) for b in booked_by_day[slot["day_index"]])
         
         # Check if this assignment already has selected this exact slot
-        is_already_selected = any(
-            ts["day"] == slot["day"] and
-            ts["start_time"] == slot["start_time"] and
-            ts["end_time"] == slot["end_time"]
-            for ts in lecturer_selected_slots
-        )
+        is_already_selected = interval in selected_intervals
         
         # Determine status
         if is_already_selected:
@@ -291,16 +296,75 @@ async def get_available_slots(
             "can_select_more": can_select_more
         })
     
-    return {"data": available_slots}
+    if not rank:
+        return {"data": available_slots}
+    
+    # Red slots only overlap some other class somewhere on campus; they stay
+    # candidates, priced by the students and rooms they actually clash with
+    open_slots = [s for s in available_slots if s["status"] in ("green", "red")]
+    ranker = await _slot_ranker(assignment, lecturer["id"], other_entries + lecturer_slots)
+    return {"data": available_slots, "recommendations": ranker.top(open_slots, max(1, min(top, 50)))}
+
+
+async def _slot_ranker(assignment: dict, lecturer_id: str, entries: list) -> SlotRanker:
+    """Occupancy for ranking one assignment's slots, loaded in a few queries"""
+    unit_id = str(assignment.get("unit_id"))
+    
+    # Unit room type and headcount
+    unit = {}
+    if ObjectId.is_valid(str(assignment.get("course_id"))):
+        course = await db.courses.find_one(
+            {"_id": ObjectId(assignment["course_id"])},
+            {"units._id": 1, "units.room_type": 1, "units.student_count": 1}
+        )
+        for u in (course or {}).get("units", []):
+            if str(u.get("_id")) == unit_id:
+                unit = u
+    headcount = unit.get("student_count") or assignment.get("student_count") or 0
+    
+    # Students of this unit per other unit they take
+    shared_students = {}
+    async for row in reader("student_enrollments").aggregate([
+        {"$match": {"unit_ids": unit_id}},
+        {"$unwind": "$unit_ids"},
+        {"$match": {"unit_ids": {"$ne": unit_id}}},
+        {"$group": {"_id": "$unit_ids", "students": {"$sum": 1}}},
+    ]):
+        shared_students[str(row["_id"])] = row["students"]
+    
+    # Pending assignments that cannot run at the same time as this one
+    pending_docs = await reader("lecturer_assignments").find(
+        {
+            "_id": {"$ne": assignment["_id"]},
+            "class_status": "pending",
+            "$or": [{"lecturer_id": lecturer_id}, {"unit_id": {"$in": list(shared_students)}}]
+        },
+        {"lecturer_id": 1, "unit_id": 1}
+    ).to_list(None)
+    
+    rooms = await reader("rooms").find({}).to_list(None)
+    masks = await availability.load_masks([lecturer_id] + [p.get("lecturer_id") for p in pending_docs])
+    pending = [
+        PendingAssignment(
+            str(p["_id"]), str(p.get("lecturer_id")), masks.get(str(p.get("lecturer_id")), (0, 0))[0],
+            "same lecturer" if str(p.get("lecturer_id")) == lecturer_id else "shared students"
+        )
+        for p in pending_docs
+    ]
+    unavailable, preferred = masks.get(lecturer_id, (0, 0))
+    return SlotRanker(
+        lecturer_id, unit_id, headcount, unit.get("room_type"), entries,
+        RoomIndex.from_documents(rooms), shared_students, pending, unavailable, preferred
+    )
 
 
 @router.post("/select-time-slot", dependencies=[Depends(require_role("lecturer"))])
 async def select_time_slot(
     preference: TimeSlotPreference,
-    authorization: str = Header(None)
+    request: Request
 ):
     """Lecturer selects a time slot for their class"""
-    lecturer = await get_current_lecturer(authorization)
+    lecturer = await get_current_lecturer(request)
     
     try:
         assignment_oid = ObjectId(preference.assignment_id)
@@ -315,12 +379,13 @@ async def select_time_slot(
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
-    # Check if slot is already booked
-    existing_entry = await db.timetable_entries.find_one({
-        "day": preference.day,
-        "start_time": preference.start_time,
-        "end_time": preference.end_time
-    })
+    if not week_interval(preference.day, preference.start_time, preference.end_time):
+        raise HTTPException(status_code=400, detail="Invalid day or time")
+    
+    # Check if an overlapping slot is already booked
+    existing_entry = await db.timetable_entries.find_one(
+        slot_conflict_query(preference.day, preference.start_time, preference.end_time)
+    )
     
     if existing_entry:
         raise HTTPException(status_code=409, detail="Time slot already booked")
@@ -338,6 +403,7 @@ async def select_time_slot(
         "status": "active",
         "created_at": datetime.utcnow()
     }
+    with_interval(entry)
     
     res = await db.timetable_entries.insert_one(entry)
     
@@ -352,6 +418,10 @@ async def select_time_slot(
             }
         }
     )
+    await versioning.bump(
+        versioning.TIMETABLE, versioning.lecturer_key(lecturer["id"]),
+        versioning.course_key(assignment["course_id"])
+    )
     
     return {
         "message": "Time slot selected successfully",
@@ -363,13 +433,13 @@ async def select_time_slot(
 async def update_availability(
     assignment_id: str,
     payload: dict,
-    authorization: str = Header(None)
+    request: Request
 ):
     """
     Lecturer updates availability by unselecting a timeframe.
     This triggers timetable regeneration.
     """
-    lecturer = await get_current_lecturer(authorization)
+    lecturer = await get_current_lecturer(request)
     
     try:
         assignment_oid = ObjectId(assignment_id)
@@ -404,6 +474,10 @@ async def update_availability(
             }
         }
     )
+    await versioning.bump(
+        versioning.TIMETABLE, versioning.lecturer_key(lecturer["id"]),
+        versioning.course_key(assignment.get("course_id"))
+    )
     
     # Notify system to regenerate timetable
     # This will be handled by admin endpoint
@@ -411,6 +485,48 @@ async def update_availability(
     return {"message": "Availability updated. Timetable will be regenerated."}
 
 
+# ==================== AVAILABILITY & PREFERENCES ====================
+
+class AvailabilityPeriod(BaseModel):
+    day: str
+    start_time: str
+    end_time: str
+
+
+class AvailabilityUpdate(BaseModel):
+    unavailable: List[AvailabilityPeriod] = []
+    preferred: List[AvailabilityPeriod] = []
+
+
+@router.get("/availability", dependencies=[Depends(require_role("lecturer"))])
+async def get_availability(request: Request):
+    """Periods the lecturer is unavailable for or prefers, merged into runs"""
+    lecturer = await get_current_lecturer(request)
+    unavailable, preferred = await availability.get_masks(lecturer["id"])
+    return availability.describe(unavailable, preferred)
+
+
+@router.put("/availability", dependencies=[Depends(require_role("lecturer"))])
+async def set_availability(data: AvailabilityUpdate, request: Request):
+    """
+    Replace the lecturer's unavailable and preferred periods.
+    Periods are rounded out to whole teaching hours (07:00-19:00,
+    Monday-Friday); generation never proposes unavailable periods and tries
+    preferred ones first.
+    """
+    lecturer = await get_current_lecturer(request)
+    try:
+        unavailable = availability.periods_to_mask(p.dict() for p in data.unavailable)
+        preferred = availability.periods_to_mask(p.dict() for p in data.preferred)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if unavailable & preferred:
+        raise HTTPException(status_code=400, detail="A period cannot be both unavailable and preferred")
+    
+    await availability.save_masks(lecturer["id"], unavailable, preferred)
+    return {"message": "Availability saved", **availability.describe(unavailable, preferred)}
+
+
 # ==================== TIME SLOT SELECTION ====================
 
 class TimeSlotSelection(BaseModel):
@@ -423,10 +539,10 @@ class TimeSlotSelection(BaseModel):
 @router.post("/select-time-slot", dependencies=[Depends(require_role("lecturer"))])
 async def select_time_slot(
     data: TimeSlotSelection,
-    authorization: str = Header(None)
+    request: Request
 ):
     """Lecturer selects time slots for their assignment (max 2 per week)"""
-    lecturer = await get_current_lecturer(authorization)
+    lecturer = await get_current_lecturer(request)
     
     try:
         assignment_oid = ObjectId(data.assignment_id)
@@ -453,13 +569,14 @@ async def select_time_slot(
             detail="Maximum 2 time slots per unit per week. You have already selected 2 slots."
         )
     
-    # Check if this exact slot is already booked by another lecturer
-    slot_conflict = await db.timetable_entries.find_one({
-        "day": data.day,
-        "start_time": data.start_time,
-        "end_time": data.end_time,
-        "assignment_id": {"$ne": str(assignment_oid)}
-    })
+    if not week_interval(data.day, data.start_time, data.end_time):
+        raise HTTPException(status_code=400, detail="Invalid day or time")
+    
+    # Check if an overlapping slot is already booked by another lecturer
+    slot_conflict = await db.timetable_entries.find_one(slot_conflict_query(
+        data.day, data.start_time, data.end_time,
+        assignment_id={"$ne": str(assignment_oid)}
+    ))
     
     if slot_conflict:
         raise HTTPException(
@@ -509,6 +626,7 @@ async def select_time_slot(
         "created_at": datetime.utcnow(),
         "status": "confirmed"
     }
+    with_interval(timetable_entry)
     
     # Insert timetable entry
     result = await db.timetable_entries.insert_one(timetable_entry)
@@ -531,6 +649,10 @@ async def select_time_slot(
         {"_id": assignment_oid},
         {"$set": update_data}
     )
+    await versioning.bump(
+        versioning.TIMETABLE, versioning.lecturer_key(lecturer["id"]),
+        versioning.course_key(str(assignment.get("course_id")))
+    )
     
     return {
         "message": "Time slot selected successfully",
@@ -548,9 +670,17 @@ async def select_time_slot(
 # ==================== DASHBOARD ====================
 
 @router.get("/dashboard", dependencies=[Depends(require_role("lecturer"))])
-async def get_dashboard(authorization: str = Header(None)):
+async def get_dashboard(request: Request, response: Response):
     """Get lecturer dashboard with all assignments and schedule"""
-    lecturer = await get_current_lecturer(authorization)
+    payload = await get_token_payload(request)
+    not_modified, _ = await versioning.conditional(
+        request, response, "lecturer_dashboard",
+        [versioning.lecturer_key(payload.get("user_id"))]
+    )
+    if not_modified:
+        return not_modified
+    
+    lecturer = await get_current_lecturer(request)
     
     # Get all assignments
     assignments = []
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, Header, HTTPException
-from app.database import db
-from app.security import decode_token
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from app.database import db, reader
 from bson import ObjectId
-from app.dependencies import require_role
+from pymongo import ReturnDocument
+from app.dependencies import require_role, get_token_payload
+from app.services import versioning
+from app.services import enrollment as enrollments
+from app.services.response_cache import response_cache, cached_response
 from pydantic import BaseModel
 from typing import List
 
@@ -28,17 +31,9 @@ def _serialize(value):
     return value
 
 
-async def get_current_student(authorization: str = Header(None)):
-    """Get current student from token"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    token = parts[1]
-    payload = decode_token(token)
+async def get_current_student(request: Request):
+    """Get current student from the request's verified token"""
+    payload = await get_token_payload(request)
     email = payload.get("email")
     
     if not email:
@@ -56,20 +51,58 @@ class EnrollmentModel(BaseModel):
 
 
 @router.get("/timetable", dependencies=[Depends(require_role("student"))])
-async def view_timetable(authorization: str = Header(None)):
+async def view_timetable(request: Request, response: Response):
     """Get student's timetable"""
-    student = await get_current_student(authorization)
+    payload = await get_token_payload(request)
+    
+    # The view depends only on the student's enrollment and their courses'
+    # entries, so writes to other courses leave the ETag alone. The student's
+    # counter records their course keys, so a 304 needs only that one lookup;
+    # the course ids are part of the scope so a changed enrollment never
+    # reuses an ETag.
+    user_id = payload.get("user_id")
+    tracked = await versioning.student_versions(user_id)
+    if tracked is None:
+        # Counter from before course keys were recorded: backfill it once
+        course_ids = sorted({
+            str(e["course_id"])
+            async for e in db.student_enrollments.find({"student": payload.get("email")})
+            if e.get("course_id")
+        })
+        await versioning.track_student(user_id, course_ids)
+        tracked = await versioning.student_versions(user_id)
+    course_ids, versions = tracked
+    not_modified, versions = await versioning.conditional(
+        request, response, "student_timetable:" + ",".join(course_ids), versions=versions
+    )
+    if not_modified:
+        return not_modified
     
-    # Find student's enrollments
-    enrollments = []
-    cursor = db.student_enrollments.find({"student": student["email"]})
-    async for enrollment in cursor:
-        enrollments.append(_serialize(enrollment))
+    await get_current_student(request)
+    
+    # Students normally have a single course: serve its shared, precompressed
+    # body. The cache is filled from the primary so a body is never stored
+    # under a version newer than the data it was built from.
+    if len(course_ids) == 1:
+        course_id = course_ids[0]
+        version = versions[versioning.course_key(course_id)]
+        
+        async def build():
+            entries = []
+            async for entry in db.timetable_entries.find({"course_id": course_id}):
+                entries.append(_serialize(entry))
+            return {"data": entries}
+        
+        # The body is every entry of the course, so year and semester stay unset
+        cached = await response_cache.get_or_build(
+            ("student_timetable", course_id, None, None, version), build
+        )
+        return cached_response(request, cached, dict(response.headers))
     
     # Get timetable entries for enrolled courses
     timetable = []
-    for enrollment in enrollments:
-        tt_cursor = db.timetable_entries.find({"course_id": enrollment.get("course_id")})
+    for course_id in course_ids:
+        tt_cursor = reader("timetable_entries").find({"course_id": course_id})
         async for entry in tt_cursor:
             timetable.append(_serialize(entry))
     
@@ -80,10 +113,10 @@ async def view_timetable(authorization: str = Header(None)):
 async def enroll(
     course_id: str,
     enrollment: EnrollmentModel,
-    authorization: str = Header(None)
+    request: Request
 ):
     """Enroll student in a course with selected units"""
-    student = await get_current_student(authorization)
+    student = await get_current_student(request)
     
     try:
         course_oid = ObjectId(course_id)
@@ -106,50 +139,65 @@ async def enroll(
             detail="Student already enrolled in another course. Withdraw first."
         )
     
-    # Store enrollment with consistent course_id format
+    # Store enrollment with consistent course_id format; the previous
+    # document comes back atomically so counters move exactly once
     from datetime import datetime
-    enrollment_doc = {
+    now = datetime.utcnow()
+    previous = await db.student_enrollments.find_one_and_update(
+        {"student": student["email"]},
+        {
+            "$set": {
+                "student_id": student["id"],
+                "course_id": course_id_str,
+                "unit_ids": enrollment.unit_ids,
+                "updated_at": now,
+            },
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    await enrollments.apply_membership_change(previous, {
         "student": student["email"],
-        "student_id": student["id"],
         "course_id": course_id_str,
         "unit_ids": enrollment.unit_ids,
-        "created_at": datetime.utcnow()
-    }
-    
-    # Delete any old enrollment for this student in this course first to avoid duplicates
-    await db.student_enrollments.delete_many({
-        "student": student["email"],
-        "course_id": course_id_str
     })
+    await versioning.bump(versioning.course_key(course_id_str), enrollments={student["id"]: [course_id_str]})
     
-    # Insert fresh enrollment document
-    result = await db.student_enrollments.insert_one(enrollment_doc)
-    
-    # Add student to course's student list
-    await db.courses.update_one(
-        {"_id": course_oid},
-        {"$addToSet": {"students": student["email"]}}
-    )
-    
-    # Update student count in course - count all students enrolled
-    student_count = await db.student_enrollments.count_documents({"course_id": course_id_str})
-    await db.courses.update_one(
-        {"_id": course_oid},
-        {"$set": {"student_count": student_count}}
-    )
-    
+    updated = await db.courses.find_one({"_id": course_oid}, {"student_count": 1})
     return {
         "message": "Enrolled successfully",
         "course_id": course_id_str,
         "unit_ids": enrollment.unit_ids,
-        "student_count": student_count
+        "student_count": (updated or {}).get("student_count", 0)
     }
 
 
+@router.delete("/enroll/{course_id}", dependencies=[Depends(require_role("student"))])
+async def withdraw(course_id: str, request: Request):
+    """Withdraw the student from a course"""
+    student = await get_current_student(request)
+    
+    try:
+        course_id_str = str(ObjectId(course_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid course ID")
+    
+    previous = await db.student_enrollments.find_one_and_delete(
+        {"student": student["email"], "course_id": course_id_str}
+    )
+    if not previous:
+        raise HTTPException(status_code=404, detail="Not enrolled in this course")
+    
+    await enrollments.apply_membership_change(previous, None)
+    await versioning.bump(versioning.course_key(course_id_str), enrollments={student["id"]: []})
+    return {"message": "Withdrawn successfully", "course_id": course_id_str}
+
+
 @router.get("/enrollments", dependencies=[Depends(require_role("student"))])
-async def get_enrollments(authorization: str = Header(None)):
+async def get_enrollments(request: Request):
     """Get student's course enrollments with course details"""
-    student = await get_current_student(authorization)
+    student = await get_current_student(request)
     
     enrollments = []
     cursor = db.student_enrollments.find({"student": student["email"]})
@@ -176,12 +224,12 @@ async def get_enrollments(authorization: str = Header(None)):
 
 
 @router.get("/courses", dependencies=[Depends(require_role("student"))])
-async def get_available_courses(authorization: str = Header(None)):
+async def get_available_courses(request: Request):
     """Get all available courses for enrollment"""
-    student = await get_current_student(authorization)
+    student = await get_current_student(request)
     
     courses = []
-    cursor = db.courses.find({})
+    cursor = reader("courses").find({})
     async for course in cursor:
         courses.append(_serialize(course))
     
@@ -189,12 +237,12 @@ async def get_available_courses(authorization: str = Header(None)):
 
 
 @router.get("/departments", dependencies=[Depends(require_role("student"))])
-async def get_departments(authorization: str = Header(None)):
+async def get_departments(request: Request):
     """Get all departments"""
-    student = await get_current_student(authorization)
+    student = await get_current_student(request)
     
     departments = []
-    cursor = db.departments.find({})
+    cursor = reader("departments").find({})
     async for dept in cursor:
         departments.append(_serialize(dept))
     
@@ -1,13 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException
+from app.config import settings
 from app.database import db
 from app.dependencies import require_role
 from app.services.timetable_optimizer import TimetableGenerator, ClashDetector, ScheduleValidator
+from app.services.intervals import interval_of
+from app.services.problem import Problem, compile_assignments
+from app.services.room_matching import RoomMatcher, Session
+from app.services.run_recorder import RunRecorder
+from app.services import availability, versioning
 from bson import ObjectId
+from pymongo import UpdateOne
 from datetime import datetime
 from typing import List
 
 router = APIRouter(prefix="/timetable", tags=["Timetable"])
 
+# `source` of entries written by /timetable/generate
+GENERATOR_SOURCE = "generator"
+
 
 def _serialize(value):
     if isinstance(value, ObjectId):
@@ -27,69 +37,341 @@ def _serialize(value):
     return value
 
 
+async def _unit_details(course_ids) -> tuple:
+    """Units by id (room_type, student_count) and department per course"""
+    course_oids = list({ObjectId(str(c)) for c in course_ids if ObjectId.is_valid(str(c))})
+    units = {}
+    departments = {}
+    async for course in db.courses.find(
+        {"_id": {"$in": course_oids}},
+        {"department_id": 1, "units._id": 1, "units.room_type": 1, "units.student_count": 1}
+    ):
+        departments[str(course["_id"])] = course.get("department_id")
+        for unit in course.get("units", []):
+            units[str(unit.get("_id"))] = unit
+    return units, departments
+
+
+async def _scoped_units(semester: int, year=None, department_id=None) -> dict:
+    """
+    Units taught in `semester` (optionally one year level and department),
+    keyed by unit id, from the courses' embedded units
+    """
+    course_match = {}
+    if department_id:
+        ids = [department_id] + ([ObjectId(department_id)] if ObjectId.is_valid(str(department_id)) else [])
+        course_match["department_id"] = {"$in": ids}
+    unit_match = {"units.semester": semester}
+    if year is not None:
+        unit_match["units.year"] = year
+    pipeline = [
+        {"$match": {**course_match, **unit_match}},
+        {"$unwind": "$units"},
+        {"$match": unit_match},
+        {"$project": {"_id": 0, "course_id": "$_id", "unit": {
+            "_id": "$units._id", "room_type": "$units.room_type", "student_count": "$units.student_count",
+            "total_hours": "$units.total_hours"}}},
+    ]
+    units = {}
+    async for row in db.courses.aggregate(pipeline):
+        units[str(row["unit"]["_id"])] = row["unit"]
+    return units
+
+
+def _replaced_by_run(semester: int, academic_year: int, units) -> dict:
+    """Entries earlier runs generated for `units`, which a new run replaces"""
+    return {
+        "semester": semester,
+        "academic_year": academic_year,
+        "unit_id": {"$in": list(units)},
+        "$or": [
+            {"source": GENERATOR_SOURCE},
+            # Generated before entries carried a source
+            {"source": {"$exists": False}, "generated_at": {"$exists": True}}
+        ]
+    }
+
+
 @router.post("/generate", dependencies=[Depends(require_role("admin"))])
 async def generate_timetable(payload: dict):
     """
     Generate clash-free timetable for a semester
     
+    Only assignments for units taught in that semester (by the unit's
+    `semester`, and `year` level if given) are scheduled. The run replaces
+    the entries previous runs generated for the same units. Entries booked
+    by lecturers are left alone, and they and every other entry the run
+    keeps hold their lecturer and room; assignments with a booked slot are
+    not scheduled again. Each unit gets its weekly sessions
+    (total_hours over SEMESTER_WEEKS, at most two) on different days,
+    avoiding periods lecturers marked unavailable and trying their
+    preferred periods first.
+    
     payload: {
         semester: int,
         academic_year: int,
-        department_id: str (optional)
+        department_id: str (optional),
+        year: int (optional, unit year level),
+        track_memory: bool (optional, record the solver's peak memory;
+                            defaults to RUN_TRACK_MEMORY, slows the run)
     }
     """
     semester = payload.get("semester")
     academic_year = payload.get("academic_year")
     department_id = payload.get("department_id")
+    year = payload.get("year")
+    track_memory = bool(payload.get("track_memory", settings.RUN_TRACK_MEMORY))
     
     if not semester or not academic_year:
         raise HTTPException(status_code=400, detail="semester and academic_year required")
     
-    # Fetch all assignments for this semester
-    query = {
-        "class_status": {"$in": ["pending", "confirmed"]}
-    }
-    if department_id:
-        query["department_id"] = department_id
-    
-    assignments = []
-    cursor = db.lecturer_assignments.find(query)
-    async for assignment in cursor:
-        assignments.append(_serialize(assignment))
-    
-    # Fetch available time slots
-    timeslots = []
-    slot_cursor = db.timeslots.find({
-        "semester": semester,
-        "academic_year": academic_year
-    })
-    async for slot in slot_cursor:
-        timeslots.append(_serialize(slot))
+    recorder = RunRecorder()
+    run_id = ObjectId()
+
+    with recorder.phase("db_load"):
+        # Assignments for this semester's units only
+        units = await _scoped_units(semester, year, department_id)
+        query = {
+            "class_status": "pending",
+            "confirmed_time_slot_id": {"$exists": False},
+            "unit_id": {"$in": list(units)}
+        }
+        if department_id:
+            query["department_id"] = department_id
+        # Entries this run does not replace (lecturer bookings, other units'
+        # generated classes) keep their lecturer and room busy
+        booked = await db.timetable_entries.find(
+            {
+                "status": {"$ne": "cancelled"},
+                "$or": [
+                    {"semester": {"$exists": False}},
+                    {"semester": semester, "academic_year": academic_year}
+                ],
+                "$nor": [_replaced_by_run(semester, academic_year, units)]
+            },
+            {"assignment_id": 1, "lecturer_id": 1, "day": 1, "start_time": 1, "end_time": 1,
+             "week_start": 1, "week_end": 1, "room_id": 1, "room": 1, "room_code": 1}
+        ).to_list(None)
+        # Assignments a lecturer has started booking are left to them
+        booking = {str(e.get("assignment_id")) for e in booked if e.get("assignment_id")}
+        raw_assignments = [
+            a for a in await db.lecturer_assignments.find(query).to_list(None)
+            if str(a["_id"]) not in booking
+        ]
+        raw_slots = await db.timeslots.find({
+            "semester": semester,
+            "academic_year": academic_year
+        }).to_list(None)
+        raw_rooms = await db.rooms.find({}).to_list(None)
+        masks = await availability.load_masks(a.get("lecturer_id") for a in raw_assignments)
     
-    if not timeslots:
+    if not raw_slots:
         raise HTTPException(status_code=400, detail="No time slots available for this semester")
     
+    # Intern ids and parse slots once; the solver works on typed arrays
+    with recorder.phase("compile"):
+        for a in raw_assignments:
+            unit = units.get(str(a.get("unit_id")), {})
+            # Room type and live headcount come from the unit
+            if unit.get("room_type") and not a.get("room_type"):
+                a["room_type"] = unit["room_type"]
+            if not a.get("student_count") and unit.get("student_count"):
+                a["student_count"] = unit["student_count"]
+            # Weekly sessions are derived from the unit's hours per semester
+            a.setdefault("total_hours", unit.get("total_hours") or 45)
+        problem = compile_assignments(raw_assignments, raw_slots, raw_rooms,
+                                      weeks=settings.SEMESTER_WEEKS, masks=masks, booked=booked)
+    
     # Generate timetable
     generator = TimetableGenerator()
-    result = generator.generate_timetable(assignments, timeslots)
+    with recorder.phase("solve", track_memory=track_memory):
+        result = generator.solve(problem)
     
     # Save generated timetable entries
-    for entry in result["timetable"]:
-        entry["semester"] = semester
-        entry["academic_year"] = academic_year
-        entry["generated_at"] = datetime.utcnow()
-        await db.timetable_entries.insert_one(entry)
+    with recorder.phase("persist"):
+        generated_at = datetime.utcnow()
+        for entry in result["timetable"]:
+            entry["semester"] = semester
+            entry["academic_year"] = academic_year
+            entry["generated_at"] = generated_at
+            entry["source"] = GENERATOR_SOURCE
+            entry["run_id"] = run_id
+        if result["timetable"]:
+            await db.timetable_entries.insert_many(result["timetable"])
+        # Then drop what earlier runs generated for these units
+        previous = {**_replaced_by_run(semester, academic_year, units), "run_id": {"$ne": run_id}}
+        replaced = await db.timetable_entries.find(previous, {"lecturer_id": 1, "course_id": 1}).to_list(None)
+        if replaced:
+            await db.timetable_entries.delete_many({"_id": {"$in": [e["_id"] for e in replaced]}})
+        touched = result["timetable"] + replaced
+        await versioning.bump(
+            versioning.TIMETABLE,
+            versioning.semester_key(academic_year, semester),
+            *{versioning.lecturer_key(e["lecturer_id"]) for e in touched},
+            *{versioning.course_key(e["course_id"]) for e in touched}
+        )
+    
+    stats = {**recorder.as_dict(), "counters": result["stats"]}
+    run = await db.timetable_runs.insert_one({
+        "_id": run_id,
+        "semester": semester,
+        "academic_year": academic_year,
+        "department_id": department_id,
+        "year": year,
+        "units_in_scope": len(units),
+        "assignments": len(raw_assignments),
+        "sessions": problem.task_count,
+        "timeslots": len(raw_slots),
+        "generated_entries": len(result["timetable"]),
+        "replaced_entries": len(replaced),
+        "unassigned": len(result["unassigned"]),
+        **stats
+    })
     
     return {
         "message": "Timetable generated successfully",
+        "run_id": str(run.inserted_id),
         "generated_entries": len(result["timetable"]),
+        "replaced_entries": len(replaced),
         "clashes_detected": len(result["clashes"]),
         "unassigned": len(result["unassigned"]),
-        "timetable": result["timetable"][:10],  # Return first 10 for preview
-        "unassigned_assignments": result["unassigned"]
+        "timetable": _serialize(result["timetable"][:10]),  # Return first 10 for preview
+        "unassigned_assignments": result["unassigned"],
+        "stats": _serialize(stats)
     }
 
 
+@router.post("/reassign-rooms", dependencies=[Depends(require_role("admin"))])
+async def reassign_rooms(payload: dict):
+    """
+    Re-pick rooms for a generated timetable without moving any class.
+
+    For each time slot the classes placed there are matched to the rooms
+    free at that time, minimising wasted seats and building changes, and
+    classes that had no room are seated where possible. Only room fields
+    change.
+
+    payload: {
+        semester: int,
+        academic_year: int,
+        department_id: str (optional, other departments' rooms stay put)
+    }
+    """
+    semester = payload.get("semester")
+    academic_year = payload.get("academic_year")
+    department_id = payload.get("department_id")
+
+    if not semester or not academic_year:
+        raise HTTPException(status_code=400, detail="semester and academic_year required")
+
+    recorder = RunRecorder()
+    with recorder.phase("db_load"):
+        entries = await db.timetable_entries.find({
+            "semester": semester,
+            "academic_year": academic_year,
+            "status": "active"
+        }).to_list(None)
+        # Everything else booked that week keeps its room: lecturer-booked
+        # entries carry no semester and may be "confirmed" rather than active
+        others = await db.timetable_entries.find(
+            {
+                "_id": {"$nin": [e["_id"] for e in entries]},
+                "status": {"$ne": "cancelled"},
+                "$or": [
+                    {"semester": {"$exists": False}},
+                    {"semester": semester, "academic_year": academic_year}
+                ]
+            },
+            {"day": 1, "start_time": 1, "end_time": 1, "week_start": 1, "week_end": 1,
+             "room_id": 1, "room": 1, "room_code": 1}
+        ).to_list(None)
+        rooms = await db.rooms.find({}).to_list(None)
+        units, departments = await _unit_details(e.get("course_id") for e in entries)
+
+    with recorder.phase("compile"):
+        problem = Problem()
+        for room in rooms:
+            problem.add_room(room)
+
+        locked = []
+        for entry in others:
+            interval = interval_of(entry)
+            room = problem.room_of(entry)
+            if interval is not None and room is not None and room >= 0:
+                locked.append((room, *interval))
+
+        sessions = []
+        for entry in entries:
+            interval = interval_of(entry)
+            if interval is None:
+                continue
+            room = problem.room_of(entry)
+            course_department = departments.get(str(entry.get("course_id")))
+            if room is None:
+                continue  # room not on record; leave the entry alone
+            if department_id and str(course_department) != str(department_id):
+                # Out of scope: stays where it is but still occupies its room
+                if room >= 0:
+                    locked.append((room, *interval))
+                continue
+            unit = units.get(str(entry.get("unit_id")), {})
+            sessions.append(Session(
+                entry["_id"], *interval,
+                headcount=unit.get("student_count", 0),
+                room_type=unit.get("room_type"),
+                department_id=course_department,
+                lecturer=entry.get("lecturer_id"),
+                cohort=entry.get("course_id"),
+                room=room,
+            ))
+
+    with recorder.phase("solve"):
+        stats = RoomMatcher(problem).reassign(sessions, locked)
+
+    with recorder.phase("persist"):
+        changed = [s for s in sessions if s.changed and s.room >= 0]
+        updates = []
+        for session in changed:
+            record = problem.room_records[session.room]
+            updates.append(UpdateOne({"_id": session.key}, {"$set": {
+                "room_id": record.id,
+                "room": record.name,
+                "room_code": record.code,
+                "room_house": record.house,
+                "room_reassigned_at": datetime.utcnow(),
+            }}))
+        if updates:
+            await db.timetable_entries.bulk_write(updates, ordered=False)
+            await versioning.bump(
+                versioning.TIMETABLE,
+                versioning.semester_key(academic_year, semester),
+                *{versioning.lecturer_key(s.lecturer) for s in changed},
+                *{versioning.course_key(s.cohort) for s in changed}
+            )
+
+    return {
+        "message": "Rooms reassigned",
+        "updated_entries": len(updates),
+        "unseated": [str(s.key) for s in sessions if s.room < 0],
+        "stats": {**stats, **recorder.as_dict()}
+    }
+
+
+@router.get("/runs", dependencies=[Depends(require_role("admin"))])
+async def list_generation_runs(semester: int = None, academic_year: int = None, limit: int = 20):
+    """List recent generation runs with their phase timings and counters"""
+    query = {}
+    if semester is not None:
+        query["semester"] = semester
+    if academic_year is not None:
+        query["academic_year"] = academic_year
+    cursor = db.timetable_runs.find(query).sort("started_at", -1).limit(limit)
+    runs = []
+    async for run in cursor:
+        runs.append(_serialize(run))
+    return {"data": runs}
+
+
 @router.get("/clashes", dependencies=[Depends(require_role("admin"))])
 async def detect_clashes(semester: int = 1, academic_year: int = 2024):
     """Detect all clashes in current timetable"""
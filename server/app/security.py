@@ -1,3 +1,6 @@
+import hashlib
+import time
+from collections import OrderedDict
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from fastapi import HTTPException
@@ -13,3 +16,76 @@ def decode_token(token: str):
         return jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def bearer_token(authorization: str) -> str:
+    """Extract the token from an `Authorization: Bearer ...` header"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authorization header")
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+    return parts[1]
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenVerifier:
+    """
+    Verifies bearer tokens, remembering verified claims until the token's
+    `exp` so repeat requests skip the HS256 check and JSON decoding.
+
+    Keyed by a SHA-256 digest so raw tokens are never held in memory, and
+    bounded to `max_entries` (least recently used evicted first). Revoked
+    digests are rejected even while cached; they are dropped once their
+    token has expired, since decoding rejects it from then on.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # digest -> (claims, exp)
+        self._revoked = {}  # digest -> exp
+
+    def verify(self, token: str) -> dict:
+        digest = token_digest(token)
+        now = time.time()
+        revoked_until = self._revoked.get(digest)
+        if revoked_until is not None:
+            if revoked_until > now:
+                raise HTTPException(status_code=401, detail="Token has been revoked")
+            del self._revoked[digest]
+
+        cached = self._cache.get(digest)
+        if cached is not None:
+            claims, exp = cached
+            if exp > now:
+                self._cache.move_to_end(digest)
+                return dict(claims)  # callers may mutate their copy
+            del self._cache[digest]
+
+        claims = decode_token(token)
+        exp = claims.get("exp")
+        if exp:
+            self._cache[digest] = (claims, exp)
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return dict(claims)
+
+    def revoke(self, digest: str, exp: float):
+        now = time.time()
+        self._revoked = {d: e for d, e in self._revoked.items() if e > now}
+        if exp > now:
+            self._revoked[digest] = exp
+        self._cache.pop(digest, None)
+
+    def load_revoked(self, entries):
+        """Replace the revocation list with (digest, exp) pairs, dropping expired ones"""
+        now = time.time()
+        self._revoked = {digest: exp for digest, exp in entries if exp > now}
+        for digest in self._revoked:
+            self._cache.pop(digest, None)
+
+
+token_verifier = TokenVerifier(settings.TOKEN_CACHE_SIZE)
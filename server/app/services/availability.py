@@ -0,0 +1,68 @@
+"""
+Lecturer availability and preferences as weekly period bitmasks.
+
+Each lecturer has one document in `lecturer_availability`:
+    {_id: lecturer_id, unavailable: Int64, preferred: Int64, updated_at}
+with one bit per teaching period (see the period grid in
+app.services.intervals). The solver loads the masks once per run, so
+checking a candidate slot is a single AND against the slot's period mask.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from bson.int64 import Int64
+
+from app.database import db
+from app.services.intervals import FULL_MASK, mask_intervals, period_mask, week_interval
+
+
+def periods_to_mask(periods: Iterable[Dict]) -> int:
+    """
+    Mask for a list of {day, start_time, end_time} periods.
+    Raises ValueError for an unparsable or empty period, or one outside the
+    teaching grid (it would set no bit and be silently ignored).
+    """
+    mask = 0
+    for period in periods:
+        interval = week_interval(period.get("day"), period.get("start_time"), period.get("end_time"))
+        if interval is None or interval[1] <= interval[0]:
+            raise ValueError(f"Invalid period: {period}")
+        bits = period_mask(*interval)
+        if not bits:
+            raise ValueError(f"Period outside teaching hours (Monday-Friday 07:00-19:00): {period}")
+        mask |= bits
+    return mask
+
+
+async def get_masks(lecturer_id: str) -> Tuple[int, int]:
+    """(unavailable, preferred) for one lecturer; (0, 0) if never set"""
+    doc = await db.lecturer_availability.find_one({"_id": str(lecturer_id)})
+    if not doc:
+        return 0, 0
+    return int(doc.get("unavailable", 0)), int(doc.get("preferred", 0))
+
+
+async def load_masks(lecturer_ids: Iterable) -> Dict[str, Tuple[int, int]]:
+    """(unavailable, preferred) per lecturer that has set any, in one query"""
+    ids = list({str(i) for i in lecturer_ids if i})
+    masks = {}
+    async for doc in db.lecturer_availability.find({"_id": {"$in": ids}}):
+        masks[doc["_id"]] = (int(doc.get("unavailable", 0)), int(doc.get("preferred", 0)))
+    return masks
+
+
+async def save_masks(lecturer_id: str, unavailable: int, preferred: int):
+    await db.lecturer_availability.update_one(
+        {"_id": str(lecturer_id)},
+        {"$set": {
+            "unavailable": Int64(unavailable & FULL_MASK),
+            "preferred": Int64(preferred & FULL_MASK),
+            "updated_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+
+
+def describe(unavailable: int, preferred: int) -> Dict[str, List[Dict]]:
+    return {"unavailable": mask_intervals(unavailable), "preferred": mask_intervals(preferred)}
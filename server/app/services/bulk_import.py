@@ -0,0 +1,383 @@
+"""
+Streaming bulk import of courses, units, rooms and enrollments.
+
+Enrollments come by code (`enrollments`: student_email, course_code,
+unit_codes) or by id (`enrollment_ids`: student, course_id, unit_ids, as
+stored on enrollment documents).
+
+Input is parsed incrementally (CSV or JSON Lines) and handled in batches:
+each batch is validated with a Pydantic TypeAdapter, references (department,
+college and course codes, student emails) are resolved through in-memory
+lookup tables, and the batch is written with one unordered bulk_write.
+Invalid rows are reported with their row number and never abort the import.
+"""
+
+import csv
+import json
+from datetime import datetime
+from time import perf_counter
+from typing import AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from pydantic import BaseModel, TypeAdapter, ValidationError, field_validator
+from pymongo import UpdateOne
+
+from app.database import db
+from app.services import enrollment
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+# ==================== ROW MODELS ====================
+
+class CourseRow(BaseModel):
+    code: str
+    name: str
+    department_code: str
+    college_code: str
+    duration_years: int = 3
+    color: Optional[str] = None
+
+
+class UnitRow(BaseModel):
+    course_code: str
+    code: str
+    name: str
+    year: int
+    semester: int
+    credits: int = 3
+    total_hours: int = 45
+    room_type: Optional[str] = None
+
+
+class RoomRow(BaseModel):
+    code: str
+    name: str
+    capacity: int
+    department_code: str
+    building_location: Optional[str] = None
+    house: Optional[str] = None
+    floor: Optional[int] = None
+    room_type: Optional[str] = None
+    is_available: bool = True
+
+
+def _split_list(value):
+    # CSV cells carry lists as "CS101;CS102"
+    if isinstance(value, str):
+        return [c.strip() for c in value.split(";") if c.strip()]
+    return value
+
+
+class EnrollmentRow(BaseModel):
+    student_email: str
+    course_code: str
+    unit_codes: List[str] = []
+
+    split_codes = field_validator("unit_codes", mode="before")(_split_list)
+
+
+class EnrollmentIdRow(BaseModel):
+    student: str  # student email, as stored on enrollments
+    course_id: str
+    unit_ids: List[str] = []
+
+    split_ids = field_validator("unit_ids", mode="before")(_split_list)
+
+
+ROW_MODELS = {
+    "courses": CourseRow,
+    "units": UnitRow,
+    "rooms": RoomRow,
+    "enrollments": EnrollmentRow,
+    "enrollment_ids": EnrollmentIdRow,
+}
+ENROLLMENT_KINDS = ("enrollments", "enrollment_ids")
+_ADAPTERS = {kind: TypeAdapter(List[model]) for kind, model in ROW_MODELS.items()}
+
+
+# ==================== PARSING ====================
+
+async def lines_from_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream (e.g. `request.stream()`) into text lines"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8-sig").rstrip("\r")
+
+
+async def csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Dict]:
+    """Parse CSV with a header row; quoted fields may span lines"""
+    header = None
+    record = []
+    quotes = 0
+    async for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:  # inside a quoted field, keep reading
+            continue
+        values = next(csv.reader(["\n".join(record)]), [])
+        record, quotes = [], 0
+        if not any(v.strip() for v in values):
+            continue
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        yield {k: v for k, v in zip(header, values) if v != ""}
+
+
+async def jsonl_rows(lines: AsyncIterator[str]) -> AsyncIterator[Dict]:
+    """Parse JSON Lines; malformed lines are passed through as errors"""
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"__parse_error__": str(e)}
+
+
+def rows_for_format(fmt: str, lines: AsyncIterator[str]) -> AsyncIterator[Dict]:
+    if fmt == "csv":
+        return csv_rows(lines)
+    if fmt in ("jsonl", "ndjson", "json"):
+        return jsonl_rows(lines)
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+
+# ==================== VALIDATION ====================
+
+def validate_batch(kind: str, rows: List[Dict], first_row: int, errors: List[Dict]):
+    """
+    Validate a batch in one TypeAdapter call. Rows that fail are reported
+    (1-based row numbers) and the rest are returned as models.
+    """
+    bad = {}
+    for i, row in enumerate(rows):
+        if "__parse_error__" in row:
+            bad[i] = [row["__parse_error__"]]
+    candidates = [r for i, r in enumerate(rows) if i not in bad]
+    positions = [i for i in range(len(rows)) if i not in bad]
+    try:
+        models = _ADAPTERS[kind].validate_python(candidates)
+    except ValidationError as e:
+        failed = {}
+        for err in e.errors():
+            failed.setdefault(err["loc"][0], []).append(
+                f"{'.'.join(str(p) for p in err['loc'][1:])}: {err['msg']}"
+            )
+        for idx, messages in failed.items():
+            bad[positions[idx]] = messages
+        keep = [(p, r) for idx, (p, r) in enumerate(zip(positions, candidates)) if idx not in failed]
+        positions = [p for p, _ in keep]
+        models = _ADAPTERS[kind].validate_python([r for _, r in keep])
+    for idx in sorted(bad):
+        errors.append({"row": first_row + idx, "errors": bad[idx]})
+    return list(zip(positions, models))
+
+
+# ==================== LOOKUPS ====================
+
+class Lookups:
+    """In-memory code -> id tables, loaded once per import"""
+
+    def __init__(self):
+        self.departments: Dict[str, ObjectId] = {}
+        self.colleges: Dict[str, ObjectId] = {}
+        self.courses: Dict[str, Dict] = {}  # code -> {_id, units: {code: _id}}
+        self.course_ids: Dict[str, Dict] = {}  # str id -> {_id, units: {str id: _id}}
+
+    @classmethod
+    async def load(cls, kind: str) -> "Lookups":
+        lookups = cls()
+        if kind in ("courses", "rooms"):
+            async for d in db.departments.find({}, {"code": 1}):
+                lookups.departments[d.get("code")] = d["_id"]
+        if kind == "courses":
+            async for c in db.colleges.find({}, {"code": 1}):
+                lookups.colleges[c.get("code")] = c["_id"]
+        if kind in ("units", "enrollments"):
+            async for c in db.courses.find({}, {"code": 1, "units._id": 1, "units.code": 1}):
+                lookups.courses[c.get("code")] = {
+                    "_id": c["_id"],
+                    "units": {u.get("code"): u.get("_id") for u in c.get("units", [])},
+                }
+        if kind == "enrollment_ids":
+            async for c in db.courses.find({}, {"units._id": 1}):
+                lookups.course_ids[str(c["_id"])] = {
+                    "_id": c["_id"],
+                    "units": {str(u.get("_id")): u.get("_id") for u in c.get("units", [])},
+                }
+        return lookups
+
+
+# ==================== WRITERS ====================
+
+def _error(errors, row, message):
+    errors.append({"row": row, "errors": [message]})
+
+
+async def _write_courses(batch, lookups, first_row, errors):
+    now = datetime.utcnow()
+    ops = []
+    for pos, row in batch:
+        dept = lookups.departments.get(row.department_code)
+        college = lookups.colleges.get(row.college_code)
+        if dept is None or college is None:
+            missing = "department" if dept is None else "college"
+            _error(errors, first_row + pos, f"Unknown {missing} code")
+            continue
+        # Same field formats as POST /admin/course
+        ops.append(UpdateOne(
+            {"code": row.code},
+            {
+                "$set": {"name": row.name, "department_id": str(dept), "college_id": str(college),
+                         "duration_years": row.duration_years, "color": row.color, "updated_at": now},
+                "$setOnInsert": {"units": [], "created_at": now},
+            },
+            upsert=True,
+        ))
+    return ops and await db.courses.bulk_write(ops, ordered=False)
+
+
+async def _write_rooms(batch, lookups, first_row, errors):
+    now = datetime.utcnow()
+    ops = []
+    for pos, row in batch:
+        dept = lookups.departments.get(row.department_code)
+        if dept is None:
+            _error(errors, first_row + pos, "Unknown department code")
+            continue
+        fields = row.model_dump(exclude={"department_code"})
+        # Same field formats as POST /admin/room
+        ops.append(UpdateOne(
+            {"code": row.code},
+            {"$set": {**fields, "department_id": dept, "updated_at": now},
+             "$setOnInsert": {"created_at": now}},
+            upsert=True,
+        ))
+    return ops and await db.rooms.bulk_write(ops, ordered=False)
+
+
+async def _write_units(batch, lookups, first_row, errors):
+    now = datetime.utcnow()
+    per_course: Dict[ObjectId, List[Dict]] = {}
+    for pos, row in batch:
+        course = lookups.courses.get(row.course_code)
+        if course is None:
+            _error(errors, first_row + pos, "Unknown course code")
+            continue
+        if row.code in course["units"]:
+            _error(errors, first_row + pos, f"Unit {row.code} already exists in course {row.course_code}")
+            continue
+        unit_doc = {"_id": ObjectId(), **row.model_dump(exclude={"course_code"}), "created_at": now}
+        course["units"][row.code] = unit_doc["_id"]
+        per_course.setdefault(course["_id"], []).append(unit_doc)
+    # One $push with $each per course instead of one update per unit
+    ops = [UpdateOne({"_id": course_id}, {"$push": {"units": {"$each": units}}})
+           for course_id, units in per_course.items()]
+    return ops and await db.courses.bulk_write(ops, ordered=False)
+
+
+def _enrollment_fields(row, lookups):
+    """(student email, course lookup or None, unit keys) for either enrollment kind"""
+    if isinstance(row, EnrollmentIdRow):
+        return row.student, lookups.course_ids.get(row.course_id), row.unit_ids
+    return row.student_email, lookups.courses.get(row.course_code), row.unit_codes
+
+
+async def _write_enrollments(batch, lookups, first_row, errors, touched_courses):
+    emails = [_enrollment_fields(row, lookups)[0] for _, row in batch]
+    students = {u["email"]: str(u["_id"]) async for u in db.users.find(
+        {"email": {"$in": emails}, "role": "student"}, {"email": 1})}
+    async for e in db.student_enrollments.find({"student": {"$in": emails}}, {"course_id": 1}):
+        touched_courses.add(e.get("course_id"))  # previous course loses the student
+
+    records = []
+    for pos, row in batch:
+        email, course, units = _enrollment_fields(row, lookups)
+        student_id = students.get(email)
+        if course is None or student_id is None:
+            _error(errors, first_row + pos, "Unknown course" if course is None else "Unknown student email")
+            continue
+        # Units must belong to the course the student enrolls in
+        unknown = [u for u in units if u not in course["units"]]
+        if unknown:
+            _error(errors, first_row + pos, f"Units not in course: {', '.join(unknown)}")
+            continue
+        course_id = str(course["_id"])
+        touched_courses.add(course_id)
+        records.append({
+            "student": email,
+            "student_id": student_id,
+            "course_id": course_id,
+            "unit_ids": [str(course["units"][u]) for u in units],
+        })
+    return await enrollment.upsert_enrollments(records)
+
+
+def _count(result, totals):
+    if not result:
+        return
+    if isinstance(result, dict):
+        totals["upserted"] += result["upserted"]
+        totals["modified"] += result["modified"]
+        return
+    totals["upserted"] += result.upserted_count
+    totals["modified"] += result.modified_count
+
+
+# ==================== PIPELINE ====================
+
+async def import_rows(kind: str, rows: AsyncIterator[Dict]) -> Dict:
+    """Import a stream of raw rows of `kind` and return a report"""
+    if kind not in ROW_MODELS:
+        raise ValueError(f"Unknown import kind: {kind}")
+    started = perf_counter()
+    lookups = await Lookups.load(kind)
+    errors: List[Dict] = []
+    totals = {"rows": 0, "upserted": 0, "modified": 0}
+    touched_courses = set()
+
+    async def flush(raw_batch, first_row):
+        valid = validate_batch(kind, raw_batch, first_row, errors)
+        if kind == "courses":
+            result = await _write_courses(valid, lookups, first_row, errors)
+        elif kind == "rooms":
+            result = await _write_rooms(valid, lookups, first_row, errors)
+        elif kind == "units":
+            result = await _write_units(valid, lookups, first_row, errors)
+        else:
+            result = await _write_enrollments(valid, lookups, first_row, errors, touched_courses)
+        _count(result, totals)
+
+    batch: List[Dict] = []
+    first_row = 1
+    async for row in rows:
+        batch.append(row)
+        totals["rows"] += 1
+        if len(batch) >= BATCH_SIZE:
+            await flush(batch, first_row)
+            first_row += len(batch)
+            batch = []
+    if batch:
+        await flush(batch, first_row)
+
+    if touched_courses:
+        await enrollment.reconcile_counts([c for c in touched_courses if c])
+
+    elapsed = perf_counter() - started
+    return {
+        "kind": kind,
+        **totals,
+        "failed": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "errors_truncated": len(errors) > MAX_REPORTED_ERRORS,
+        "duration_seconds": round(elapsed, 3),
+        "rows_per_second": round(totals["rows"] / elapsed, 1) if elapsed else None,
+    }
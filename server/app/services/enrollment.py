@@ -0,0 +1,233 @@
+"""
+Bulk enrollment writes shared by the import pipeline and the admin API.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.database import db
+from app.services import versioning
+from app.utils.logger import logger
+
+MAX_REPORTED_DRIFT = 1000
+
+RECONCILE_LEASE = "reconcile_counts"
+# Identifies this worker process as a lease holder
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def upsert_enrollments(records: List[Dict]) -> Dict:
+    """
+    Upsert one enrollment per student with a single bulk_write.
+
+    records: [{student, student_id, course_id, unit_ids}]
+    A student has one enrollment, so a record replaces any previous course.
+    """
+    if not records:
+        return {"upserted": 0, "modified": 0}
+    # Unordered upserts on the same key could both insert; last record wins
+    records = list({r["student"]: r for r in records}.values())
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"student": r["student"]},
+            {
+                "$set": {
+                    "student_id": r["student_id"],
+                    "course_id": r["course_id"],
+                    "unit_ids": r.get("unit_ids", []),
+                    "updated_at": now,
+                },
+                "$setOnInsert": {"created_at": now},
+            },
+            upsert=True,
+        )
+        for r in records
+    ]
+    result = await db.student_enrollments.bulk_write(ops, ordered=False)
+    await versioning.bump(
+        *{versioning.course_key(r["course_id"]) for r in records},
+        enrollments={r["student_id"]: [r["course_id"]] for r in records},
+    )
+    return {"upserted": result.upserted_count, "modified": result.modified_count}
+
+
+def _object_ids(ids) -> List[ObjectId]:
+    return [ObjectId(i) for i in ids if ObjectId.is_valid(str(i))]
+
+
+def _counter_update(course_id, delta: int, email: str, added, removed) -> Optional[UpdateOne]:
+    """$inc for one course: `delta` students, +1/-1 on the added/removed units"""
+    if not ObjectId.is_valid(str(course_id)):
+        return None
+    inc = {}
+    array_filters = []
+    if delta:
+        inc["student_count"] = delta
+    if added:
+        inc["units.$[added].student_count"] = 1
+        array_filters.append({"added._id": {"$in": _object_ids(added)}})
+    if removed:
+        inc["units.$[removed].student_count"] = -1
+        array_filters.append({"removed._id": {"$in": _object_ids(removed)}})
+    if not inc:
+        return None
+    update = {"$inc": inc}
+    if delta > 0:
+        update["$addToSet"] = {"students": email}
+    elif delta < 0:
+        update["$pull"] = {"students": email}
+    return UpdateOne({"_id": ObjectId(str(course_id))}, update, array_filters=array_filters or None)
+
+
+async def apply_membership_change(before: Optional[Dict], after: Optional[Dict]):
+    """
+    Adjust course and unit headcounts for one student's enrollment going
+    from `before` to `after` (None for no enrollment). Counters are only
+    touched for memberships that actually changed.
+    """
+    if not before and not after:
+        return
+    email = (after or before)["student"]
+    before_course = before.get("course_id") if before else None
+    after_course = after.get("course_id") if after else None
+    before_units = set(before.get("unit_ids") or []) if before else set()
+    after_units = set(after.get("unit_ids") or []) if after else set()
+
+    if before_course == after_course:
+        ops = [_counter_update(after_course, 0, email, after_units - before_units, before_units - after_units)]
+    else:
+        ops = [
+            before_course and _counter_update(before_course, -1, email, (), before_units),
+            after_course and _counter_update(after_course, 1, email, after_units, ()),
+        ]
+    ops = [op for op in ops if op]
+    if ops:
+        await db.courses.bulk_write(ops, ordered=False)
+
+
+async def reconcile_counts(course_ids: List[str] = None) -> Dict:
+    """
+    Recompute `students`, `student_count` and per-unit `student_count` on
+    courses from enrollments with one aggregation, optionally limited to
+    `course_ids`, and report the drift that was corrected.
+
+    Each fix is conditional on the stored course count being unchanged, so
+    an enroll that lands mid-run is not overwritten; it is picked up by the
+    next run instead.
+    """
+    match = {"course_id": {"$in": list(course_ids)}} if course_ids else {}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$course_id",
+            "students": {"$addToSet": "$student"},
+            "unit_ids": {"$push": "$unit_ids"},
+        }},
+    ]
+    actual = {}
+    async for row in db.student_enrollments.aggregate(pipeline):
+        units = Counter()
+        for ids in row["unit_ids"]:
+            units.update(set(ids or []))
+        actual[row["_id"]] = (row["students"], units)
+
+    query = {"_id": {"$in": _object_ids(course_ids)}} if course_ids else {}
+    projection = {"student_count": 1, "students": 1, "units._id": 1, "units.code": 1, "units.student_count": 1}
+    ops = []
+    drift = []
+    checked = 0
+    async for course in db.courses.find(query, projection):
+        checked += 1
+        students, units = actual.get(str(course["_id"]), ([], Counter()))
+        stored = course.get("student_count")
+        fixes = {}
+        array_filters = []
+        course_drift = None
+        if (stored or 0) != len(students) or set(course.get("students") or []) != set(students):
+            fixes["student_count"] = len(students)
+            fixes["students"] = students
+            course_drift = {"stored": stored, "actual": len(students)}
+        unit_drift = []
+        for i, unit in enumerate(course.get("units") or []):
+            if unit.get("_id") is None:
+                continue
+            have = unit.get("student_count")
+            want = units.get(str(unit["_id"]), 0)
+            if (have or 0) != want:  # missing counters read as 0; $inc creates them
+                fixes[f"units.$[u{i}].student_count"] = want
+                array_filters.append({f"u{i}._id": unit["_id"], f"u{i}.student_count": have})
+                unit_drift.append({"unit_code": unit.get("code"), "stored": have, "actual": want})
+        if fixes:
+            drift.append({"course_id": str(course["_id"]), "student_count": course_drift, "units": unit_drift})
+            ops.append(UpdateOne(
+                {"_id": course["_id"], "student_count": stored},
+                {"$set": fixes},
+                array_filters=array_filters or None,
+            ))
+
+    fixed = 0
+    if ops:
+        result = await db.courses.bulk_write(ops, ordered=False)
+        fixed = result.modified_count
+    return {
+        "courses_checked": checked,
+        "courses_drifted": len(drift),
+        "courses_fixed": fixed,
+        "skipped_concurrent": len(ops) - fixed,
+        "drift": drift[:MAX_REPORTED_DRIFT],
+    }
+
+
+async def acquire_lease(name: str, holder: str, ttl_seconds: float) -> bool:
+    """
+    Take or renew the lease `name` in `leases` for `ttl_seconds`.
+
+    Returns True if `holder` now holds it: it was free, expired, or already
+    held by `holder`. A lease held by another live worker makes the
+    conditional upsert collide on `_id`, which reads as False.
+    """
+    now = datetime.utcnow()
+    try:
+        lease = await db.leases.find_one_and_update(
+            {"_id": name, "$or": [{"holder": holder}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return False
+    return lease is not None and lease.get("holder") == holder
+
+
+async def reconcile_forever(interval_seconds: int):
+    """
+    Background loop started from the app lifespan.
+
+    Every worker runs the loop, but only the holder of the reconcile lease
+    does the work. The holder renews the lease for two intervals on each
+    tick, so another worker takes over within an interval or two if it dies.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            if not await acquire_lease(RECONCILE_LEASE, WORKER_ID, 2 * interval_seconds):
+                continue
+            report = await reconcile_counts()
+        except Exception:
+            logger.exception("Headcount reconciliation failed")
+            continue
+        if report["courses_drifted"]:
+            logger.warning(
+                "Headcount drift corrected on %d of %d courses",
+                report["courses_fixed"], report["courses_checked"]
+            )
@@ -0,0 +1,81 @@
+"""
+Streaming CSV/XLSX export of timetable entries.
+
+Rows are pulled from a Motor cursor in batches and encoded batch by batch on
+a worker thread, so memory stays bounded by the batch size and the event
+loop never runs the encoder. XLSX uses xlsxwriter's constant-memory mode,
+which flushes each row to a temp file as it is written.
+"""
+
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from typing import AsyncIterator, Dict, List
+
+EXPORT_COLUMNS = [
+    "day", "start_time", "end_time", "course_code", "course_name", "unit_code",
+    "unit_name", "lecturer_id", "lecturer_name", "room", "room_code", "room_house",
+    "semester", "academic_year", "status",
+]
+
+BATCH_SIZE = 500
+
+
+def _row(entry: Dict) -> List:
+    return ["" if entry.get(c) is None else str(entry.get(c)) for c in EXPORT_COLUMNS]
+
+
+async def _batches(cursor) -> AsyncIterator[List[List]]:
+    batch = []
+    async for entry in cursor:
+        batch.append(_row(entry))
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _encode_csv(rows: List[List]) -> bytes:
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue().encode()
+
+
+async def stream_csv(cursor) -> AsyncIterator[bytes]:
+    """Yield CSV bytes (header first) for every entry the cursor returns"""
+    yield _encode_csv([EXPORT_COLUMNS])
+    async for batch in _batches(cursor.batch_size(BATCH_SIZE)):
+        yield await asyncio.to_thread(_encode_csv, batch)
+
+
+async def write_xlsx(cursor) -> str:
+    """
+    Write every entry to a temporary .xlsx file and return its path.
+    The caller is responsible for deleting the file.
+    """
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "tmpdir": tempfile.gettempdir()})
+    try:
+        sheet = workbook.add_worksheet("Timetable")
+        bold = workbook.add_format({"bold": True})
+        sheet.write_row(0, 0, EXPORT_COLUMNS, bold)
+        row_index = 1
+
+        def write_batch(rows, start):
+            for offset, row in enumerate(rows):
+                sheet.write_row(start + offset, 0, row)
+
+        async for batch in _batches(cursor.batch_size(BATCH_SIZE)):
+            await asyncio.to_thread(write_batch, batch, row_index)
+            row_index += len(batch)
+        await asyncio.to_thread(workbook.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
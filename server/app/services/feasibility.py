@@ -0,0 +1,99 @@
+"""
+Vectorised feasibility masks over a compiled problem.
+
+Every hard constraint that does not depend on earlier placements is
+evaluated once for all pairs with NumPy broadcasting:
+
+    task x slot:  the lecturer is available that day and has none of the
+                  slot's periods marked unavailable (one AND of bitmasks),
+                  and the slot length matches the session length the task
+                  asks for (if any)
+    task x room:  capacity >= headcount, the room is available, and the
+                  room type matches (specialised rooms only for tasks that
+                  request that type)
+
+Solvers then iterate only over the feasible candidates of each task and
+keep just the placement-dependent checks (clashes) in their inner loops.
+Slots entirely within the lecturer's preferred periods are offered first.
+"""
+
+from typing import List
+
+import numpy as np
+
+from app.services.problem import Problem
+
+
+def _np(values, dtype) -> np.ndarray:
+    return np.asarray(values, dtype=dtype)
+
+
+class Feasibility:
+    """Boolean task x slot and task x room masks"""
+
+    __slots__ = ("task_slot", "task_room", "task_preferred")
+
+    def __init__(self, task_slot: np.ndarray, task_room: np.ndarray, task_preferred: np.ndarray = None):
+        self.task_slot = task_slot
+        self.task_room = task_room
+        self.task_preferred = task_preferred
+
+    def slots_for(self, task: int) -> List[int]:
+        """Feasible slots, the lecturer's preferred ones first"""
+        feasible = self.task_slot[task]
+        if self.task_preferred is None:
+            return np.flatnonzero(feasible).tolist()
+        preferred = feasible & self.task_preferred[task]
+        return np.flatnonzero(preferred).tolist() + np.flatnonzero(feasible & ~preferred).tolist()
+
+    def rooms_for(self, task: int) -> List[int]:
+        return np.flatnonzero(self.task_room[task]).tolist()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "feasible_task_slots": int(self.task_slot.sum()),
+            "task_slot_pairs": int(self.task_slot.size),
+            "feasible_task_rooms": int(self.task_room.sum()),
+            "task_room_pairs": int(self.task_room.size),
+            "preferred_task_slots": int((self.task_slot & self.task_preferred).sum())
+            if self.task_preferred is not None else 0,
+        }
+
+
+def build_feasibility(problem: Problem) -> Feasibility:
+    task_lecturer = _np(problem.task_lecturer, np.int64)
+    task_minutes = _np(problem.task_minutes, np.int32)[:, None]
+    task_headcount = _np(problem.task_headcount, np.int32)[:, None]
+    task_room_type = _np(problem.task_room_type, np.int32)[:, None]
+
+    # task x slot: lecturer's day bitmask has the slot's day; duration matches
+    lecturer_days = _np(problem.lecturer_days, np.int32)
+    task_days = lecturer_days[task_lecturer] if len(task_lecturer) else np.zeros(0, np.int32)
+    slot_day = _np(problem.slot_day, np.int32)[None, :]
+    slot_duration = _np(problem.slot_duration, np.int32)[None, :]
+    task_slot = ((task_days[:, None] >> slot_day) & 1).astype(bool)
+    task_slot &= (task_minutes == 0) | (task_minutes == slot_duration)
+
+    # task x slot: no unavailable period, one AND per pair; preferred when
+    # every period of the slot is preferred
+    slot_periods = _np(problem.slot_periods, np.int64)[None, :]
+    lecturer_unavailable = _np(problem.lecturer_unavailable, np.int64)
+    lecturer_preferred = _np(problem.lecturer_preferred, np.int64)
+    if len(task_lecturer):
+        task_unavailable = lecturer_unavailable[task_lecturer][:, None]
+        task_prefers = lecturer_preferred[task_lecturer][:, None]
+    else:
+        task_unavailable = task_prefers = np.zeros((0, 1), np.int64)
+    task_slot &= (slot_periods & task_unavailable) == 0
+    task_preferred = ((slot_periods & ~task_prefers) == 0) & (slot_periods != 0) & (task_prefers != 0)
+
+    # task x room: capacity, availability, type compatibility
+    room_capacity = _np(problem.room_capacity, np.int32)[None, :]
+    room_available = _np(problem.room_available, bool)[None, :]
+    room_type = _np(problem.room_type, np.int32)[None, :]
+    room_general = _np(problem.room_general, bool)[None, :]
+    type_ok = np.where(task_room_type < 0, room_general, room_type == task_room_type)
+    task_room = (room_capacity >= task_headcount) & room_available & type_ok
+
+    return Feasibility(task_slot, task_room, task_preferred)
@@ -0,0 +1,176 @@
+"""
+iCalendar (RFC 5545) feeds built from timetable entries.
+
+Each entry becomes one weekly recurring event starting on the first matching
+weekday of the semester (SEMESTER_START, required) and repeating for
+SEMESTER_WEEKS weeks. With CALENDAR_TIMEZONE set, times carry a TZID and
+the feed includes the matching VTIMEZONE, built from the tz database for
+the semester's dates; otherwise they are floating local times. Feed URLs
+carry an HMAC token instead of a bearer token, because calendar clients
+cannot send Authorization headers.
+"""
+
+import base64
+import hashlib
+import hmac
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.config import settings
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def feed_token(kind: str, user_id: str) -> str:
+    """Unguessable, stable token for a user's feed URL"""
+    mac = hmac.new(settings.JWT_SECRET.encode(), f"ics:{kind}:{user_id}".encode(), hashlib.sha256)
+    return base64.urlsafe_b64encode(mac.digest()[:24]).decode().rstrip("=")
+
+
+def check_feed_token(kind: str, user_id: str, token: str) -> bool:
+    return hmac.compare_digest(feed_token(kind, user_id), token)
+
+
+def semester_start() -> date:
+    """
+    SEMESTER_START as a date. Raises ValueError when it is missing or not an
+    ISO date: guessing would move every event whenever the guess changes.
+    """
+    if not settings.SEMESTER_START:
+        raise ValueError("Calendar feeds need SEMESTER_START (an ISO date)")
+    return date.fromisoformat(settings.SEMESTER_START)
+
+
+def calendar_zone() -> Optional[ZoneInfo]:
+    """CALENDAR_TIMEZONE as a zone, None if unset; ValueError if unknown"""
+    if not settings.CALENDAR_TIMEZONE:
+        return None
+    try:
+        return ZoneInfo(settings.CALENDAR_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown CALENDAR_TIMEZONE: {settings.CALENDAR_TIMEZONE}")
+
+
+def _escape(text) -> str:
+    return (str(text or "").replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Fold content lines longer than 75 octets (RFC 5545 3.1)"""
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line
+    parts = []
+    while raw:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(raw))
+        while cut < len(raw) and (raw[cut] & 0xC0) == 0x80:  # don't split UTF-8 sequences
+            cut -= 1
+        parts.append(raw[:cut].decode())
+        raw = raw[cut:]
+    return "\r\n ".join(parts)
+
+
+def _local(dt: datetime) -> str:
+    return dt.strftime("%Y%m%dT%H%M%S")
+
+
+def _offset(delta: timedelta) -> str:
+    minutes = int(delta.total_seconds()) // 60
+    sign = "-" if minutes < 0 else "+"
+    return f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+
+def _vtimezone_lines(zone: ZoneInfo, first: date, last: date) -> List[str]:
+    """
+    VTIMEZONE for `zone` covering [first, last]: the offset in force on
+    `first` plus one observance per transition up to `last`, found by
+    stepping through the range in UTC hours.
+    """
+    def observance(at_utc: datetime, before: timedelta) -> List[str]:
+        local = at_utc.astimezone(zone)
+        kind = "DAYLIGHT" if local.dst() else "STANDARD"
+        return [
+            f"BEGIN:{kind}",
+            # DTSTART is local time in the offset in force before the change
+            f"DTSTART:{_local((at_utc + before).replace(tzinfo=None))}",
+            f"TZOFFSETFROM:{_offset(before)}",
+            f"TZOFFSETTO:{_offset(local.utcoffset())}",
+            f"TZNAME:{local.tzname()}",
+            f"END:{kind}",
+        ]
+
+    at = datetime(first.year, first.month, first.day, tzinfo=timezone.utc) - timedelta(days=1)
+    end = datetime(last.year, last.month, last.day, tzinfo=timezone.utc) + timedelta(days=2)
+    current = at.astimezone(zone).utcoffset()
+    lines = ["BEGIN:VTIMEZONE", f"TZID:{zone.key}"] + observance(at, current)
+    while at < end:
+        at += timedelta(hours=1)
+        offset = at.astimezone(zone).utcoffset()
+        if offset != current:
+            lines += observance(at, current)
+            current = offset
+    lines.append("END:VTIMEZONE")
+    return lines
+
+
+def _event_lines(entry: Dict, start_date: date, weeks: int, stamp: str, tz: str) -> List[str]:
+    day = entry.get("day")
+    if day not in DAY_NAMES or not entry.get("start_time") or not entry.get("end_time"):
+        return []
+    first = start_date + timedelta(days=(DAY_NAMES.index(day) - start_date.weekday()) % 7)
+    start_h, start_m = map(int, str(entry["start_time"])[:5].split(":"))
+    end_h, end_m = map(int, str(entry["end_time"])[:5].split(":"))
+    dtstart = datetime(first.year, first.month, first.day, start_h, start_m)
+    dtend = datetime(first.year, first.month, first.day, end_h, end_m)
+
+    summary = " - ".join(filter(None, [entry.get("unit_code"), entry.get("unit_name")])) \
+        or entry.get("course_code") or "Class"
+    location = ", ".join(filter(None, [entry.get("room"), entry.get("room_house")]))
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{entry.get('id') or entry.get('_id')}@timetable",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART{tz}:{_local(dtstart)}",
+        f"DTEND{tz}:{_local(dtend)}",
+        f"RRULE:FREQ=WEEKLY;COUNT={weeks}",
+        f"SUMMARY:{_escape(summary)}",
+    ]
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    if entry.get("lecturer_name"):
+        lines.append(f"DESCRIPTION:{_escape('Lecturer: ' + entry['lecturer_name'])}")
+    if entry.get("status") == "cancelled":
+        lines.append("STATUS:CANCELLED")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def build_calendar(name: str, entries: List[Dict]) -> bytes:
+    """
+    Render `entries` as a VCALENDAR document. Raises ValueError when
+    SEMESTER_START or CALENDAR_TIMEZONE is not usable.
+    """
+    start_date = semester_start()
+    zone = calendar_zone()
+    weeks = settings.SEMESTER_WEEKS
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Timetable Management System//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    tz = ""
+    if zone is not None:
+        lines.append(f"X-WR-TIMEZONE:{zone.key}")
+        lines.extend(_vtimezone_lines(zone, start_date, start_date + timedelta(weeks=weeks)))
+        tz = f";TZID={zone.key}"
+    for entry in entries:
+        lines.extend(_event_lines(entry, start_date, weeks, stamp, tz))
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode()
@@ -0,0 +1,177 @@
+"""
+Canonical integer representation of weekly time intervals.
+
+A slot such as Monday 07:00-09:00 is stored as
+    day_index  = 0                     (Monday = 0 ... Sunday = 6)
+    week_start = 0 * 1440 + 420 = 420  (minutes since Monday 00:00)
+    week_end   = 0 * 1440 + 540 = 540
+so overlap checks are two integer comparisons and "entries overlapping
+[a, b)" is an indexed range query instead of re-parsing "HH:MM" strings.
+"""
+
+from datetime import time
+from typing import Dict, List, Optional, Tuple
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MINUTES_PER_DAY = 24 * 60
+
+_DAY_INDEX = {d.lower(): i for i, d in enumerate(DAYS)}
+
+
+def day_index(day) -> Optional[int]:
+    """Index of a day name (case-insensitive), or None"""
+    if isinstance(day, int):
+        return day if 0 <= day < 7 else None
+    return _DAY_INDEX.get(str(getattr(day, "value", day)).strip().lower())
+
+
+def to_minutes(value) -> Optional[int]:
+    """Minutes since midnight for "HH:MM[:SS]", datetime.time or int"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    try:
+        hours, minutes = str(value).strip().split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+
+def format_minutes(minutes: int) -> str:
+    """Minutes since midnight (or since Monday) as "HH:MM" within the day"""
+    minutes %= MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def week_interval(day, start, end) -> Optional[Tuple[int, int]]:
+    """(week_start, week_end) for a day and start/end time, or None"""
+    d = day_index(day)
+    s = to_minutes(start)
+    e = to_minutes(end)
+    if d is None or s is None or e is None:
+        return None
+    return d * MINUTES_PER_DAY + s, d * MINUTES_PER_DAY + e
+
+
+def interval_fields(day, start, end) -> Dict:
+    """Fields stored on timeslots and timetable entries ({} if unparsable)"""
+    interval = week_interval(day, start, end)
+    if interval is None:
+        return {}
+    return {"day_index": interval[0] // MINUTES_PER_DAY, "week_start": interval[0], "week_end": interval[1]}
+
+
+def with_interval(doc: Dict) -> Dict:
+    """Add interval fields to a document with day/start_time/end_time"""
+    doc.update(interval_fields(doc.get("day"), doc.get("start_time"), doc.get("end_time")))
+    return doc
+
+
+def interval_of(doc: Dict) -> Optional[Tuple[int, int]]:
+    """Stored interval of a document, falling back to its day/time strings"""
+    if doc.get("week_start") is not None and doc.get("week_end") is not None:
+        return doc["week_start"], doc["week_end"]
+    return week_interval(doc.get("day"), doc.get("start_time"), doc.get("end_time"))
+
+
+def parse_label(label: str) -> Optional[Tuple[int, int]]:
+    """Interval for a "Monday 07:00-09:00" label"""
+    try:
+        day, times = str(label).split(" ", 1)
+        start, end = times.split("-", 1)
+    except ValueError:
+        return None
+    return week_interval(day, start, end)
+
+
+def overlaps(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    """Half-open [start, end) intervals overlap"""
+    return a[0] < b[1] and b[0] < a[1]
+
+
+def overlap_query(week_start: int, week_end: int, **filters) -> Dict:
+    """Mongo filter for documents whose interval overlaps [week_start, week_end)"""
+    return {**filters, "week_start": {"$lt": week_end}, "week_end": {"$gt": week_start}}
+
+
+def slot_conflict_query(day, start, end, **filters) -> Dict:
+    """
+    Overlap filter for a day/start/end slot. Documents not yet migrated
+    (no week_start) still match on the exact day and time strings.
+    """
+    legacy = {**filters, "week_start": {"$exists": False}, "day": day, "start_time": start, "end_time": end}
+    interval = week_interval(day, start, end)
+    if interval is None:
+        return legacy
+    return {"$or": [overlap_query(*interval, **filters), legacy]}
+
+
+# ---- period bitmasks ----
+#
+# Lecturer availability and preferences are kept per hourly teaching period:
+# Monday-Friday x 12 periods from 07:00 = 60 bits, one Int64 per mask. Bit
+# day * PERIODS_PER_DAY + period is set for a period. Time outside the grid
+# (evenings, weekends) has no bit and is never masked out.
+
+PERIOD_START = 7 * 60
+PERIOD_MINUTES = 60
+PERIODS_PER_DAY = 12
+GRID_DAYS = 5
+GRID_BITS = GRID_DAYS * PERIODS_PER_DAY
+FULL_MASK = (1 << GRID_BITS) - 1
+
+
+def period_mask(week_start: int, week_end: int) -> int:
+    """Bits of every grid period that [week_start, week_end) touches"""
+    mask = 0
+    day, start = divmod(week_start, MINUTES_PER_DAY)
+    end = week_end - day * MINUTES_PER_DAY
+    if day >= GRID_DAYS:
+        return 0
+    first = max((start - PERIOD_START) // PERIOD_MINUTES, 0)
+    last = min(-(-(end - PERIOD_START) // PERIOD_MINUTES), PERIODS_PER_DAY)
+    for period in range(first, last):
+        mask |= 1 << (day * PERIODS_PER_DAY + period)
+    return mask
+
+
+def mask_intervals(mask: int) -> List[Dict]:
+    """{day, start_time, end_time} for each run of consecutive set periods"""
+    runs = []
+    for day in range(GRID_DAYS):
+        period = 0
+        while period < PERIODS_PER_DAY:
+            if not mask >> (day * PERIODS_PER_DAY + period) & 1:
+                period += 1
+                continue
+            first = period
+            while period < PERIODS_PER_DAY and mask >> (day * PERIODS_PER_DAY + period) & 1:
+                period += 1
+            runs.append({
+                "day": DAYS[day],
+                "start_time": format_minutes(PERIOD_START + first * PERIOD_MINUTES),
+                "end_time": format_minutes(PERIOD_START + period * PERIOD_MINUTES),
+            })
+    return runs
+
+
+# Indexes serving overlap queries (created by scripts/migrate_intervals.py)
+INDEXES = {
+    "timetable_entries": [
+        [("week_start", 1), ("week_end", 1)],
+        [("room", 1), ("week_start", 1)],
+        [("lecturer_id", 1), ("week_start", 1)],
+    ],
+    "timeslots": [
+        [("semester", 1), ("academic_year", 1), ("week_start", 1)],
+    ],
+}
+
+
+async def ensure_indexes(database):
+    for collection, indexes in INDEXES.items():
+        for keys in indexes:
+            await database[collection].create_index(keys)
@@ -0,0 +1,94 @@
+"""
+Password hashing off the event loop.
+
+PBKDF2 is deliberately slow, so hashing inline in an async handler stalls
+every other request on the worker. Hashes are computed on a small thread
+pool (hashlib's PBKDF2 releases the GIL), at most PASSWORD_HASH_WORKERS at a
+time. Requests beyond PASSWORD_HASH_MAX_QUEUE waiting callers get a 503
+instead of piling up.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.hash import pbkdf2_sha256
+
+from app.config import settings
+from app.utils.metrics import Metric, register, LATENCY_BUCKETS
+
+HASH_QUEUE_DEPTH = register(Metric(
+    "password_hash_queue_depth", "Password hash/verify calls waiting for a worker", "gauge"))
+HASH_IN_PROGRESS = register(Metric(
+    "password_hash_in_progress", "Password hash/verify calls running", "gauge"))
+HASH_DURATION = register(Metric(
+    "password_hash_duration_seconds", "Password hash/verify time including queueing",
+    "histogram", ("operation",), LATENCY_BUCKETS))
+HASH_REJECTED = register(Metric(
+    "password_hash_rejected_total", "Password calls rejected because the queue was full", "counter"))
+
+
+class PasswordService:
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        self.rounds = rounds
+        self.max_queue = max_queue
+        self._hasher = pbkdf2_sha256.using(rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+        self._slots = asyncio.Semaphore(workers)
+        self._waiting = 0
+
+    async def _run(self, operation: str, fn, *args):
+        if self._waiting >= self.max_queue:
+            HASH_REJECTED.inc()
+            raise HTTPException(status_code=503, detail="Server busy, please retry shortly")
+        start = perf_counter()
+        self._waiting += 1
+        HASH_QUEUE_DEPTH.inc()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+            HASH_QUEUE_DEPTH.dec()
+        HASH_IN_PROGRESS.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+            HASH_IN_PROGRESS.dec()
+            HASH_DURATION.observe(perf_counter() - start, operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self._hasher.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        if not hashed:
+            return False
+        return await self._run("verify", pbkdf2_sha256.verify, password, hashed)
+
+    def needs_update(self, hashed: str) -> bool:
+        """True if `hashed` was made with a different round count"""
+        try:
+            return pbkdf2_sha256.from_string(hashed).rounds != self.rounds
+        except (ValueError, TypeError):
+            return False
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and, if it matches but the stored hash uses stale
+        rounds, return a replacement hash for the caller to persist.
+        """
+        if not await self.verify(password, hashed):
+            return False, None
+        if self.needs_update(hashed):
+            return True, await self.hash(password)
+        return True, None
+
+
+passwords = PasswordService(
+    rounds=settings.PASSWORD_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
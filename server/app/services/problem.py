@@ -0,0 +1,370 @@
+"""
+Compiled problem model shared by the timetabling engines.
+
+Solvers used to walk lists of serialised Mongo documents, paying a
+string-keyed dict lookup (and often a time parse) on every access. Here
+lecturers, rooms, units, cohorts and slots are interned to dense integer ids
+once, numeric attributes live in typed arrays, and the remaining per-entity
+data sits in small __slots__ records. Solvers index the arrays and only go
+back to documents when they emit output.
+"""
+
+import math
+import re
+from array import array
+from itertools import combinations_with_replacement
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.services.intervals import DAYS, day_index, interval_of, period_mask, week_interval
+
+ALL_DAYS = (1 << len(DAYS)) - 1
+# Same cap the lecturer slot-selection flow enforces
+MAX_SESSIONS_PER_WEEK = 2
+
+
+def room_type_key(value) -> Optional[str]:
+    """Normalised room type ("Computer Lab " -> "computer lab"), None if unset"""
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+SPECIALISED_ROOM_WORDS = {"lab", "labs", "laboratory", "laboratories", "workshop", "studio"}
+
+
+def is_general_room(room_type: Optional[str]) -> bool:
+    """Rooms any class may use; specialised rooms (labs) need a matching request"""
+    return room_type is None or not SPECIALISED_ROOM_WORDS & set(re.split(r"\W+", room_type))
+
+
+class Interner:
+    """Maps hashable keys to dense ids 0..n-1 and back"""
+
+    __slots__ = ("ids", "keys")
+
+    def __init__(self):
+        self.ids: Dict[Hashable, int] = {}
+        self.keys: List[Hashable] = []
+
+    def intern(self, key) -> int:
+        i = self.ids.get(key)
+        if i is None:
+            i = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        return i
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class SlotRecord:
+    __slots__ = ("day", "start_time", "end_time", "source")
+
+    def __init__(self, day, start_time, end_time, source=None):
+        self.day = day
+        self.start_time = start_time
+        self.end_time = end_time
+        self.source = source
+
+
+class RoomRecord:
+    __slots__ = ("id", "name", "code", "room_type", "house", "department_id", "is_available")
+
+    def __init__(self, doc: Dict):
+        self.id = str(doc.get("_id") or doc.get("id") or doc.get("name"))
+        self.name = doc.get("name")
+        self.code = doc.get("code")
+        self.room_type = room_type_key(doc.get("room_type"))
+        self.house = doc.get("house")
+        self.department_id = str(doc["department_id"]) if doc.get("department_id") else None
+        self.is_available = doc.get("is_available", True) is not False
+
+
+class Problem:
+    """
+    Tasks (assignments or courses to place), slots, rooms and lecturers as
+    dense ids. Parallel arrays are indexed by task, slot or room id; -1 means
+    "none".
+    """
+
+    __slots__ = (
+        "lecturers", "rooms", "units", "cohorts", "room_types",
+        "slots", "slot_day", "slot_start", "slot_end", "slot_duration", "slot_periods",
+        "room_records", "room_capacity", "room_available", "room_type", "room_general", "room_keys",
+        "booked", "lecturer_days", "lecturer_unavailable", "lecturer_preferred",
+        "tasks", "task_lecturer", "task_unit", "task_cohort", "task_room",
+        "task_headcount", "task_minutes", "task_room_type", "task_group", "task_session",
+    )
+
+    def __init__(self):
+        self.lecturers = Interner()
+        self.rooms = Interner()
+        self.units = Interner()
+        self.cohorts = Interner()
+        self.room_types = Interner()
+
+        self.slots: List[SlotRecord] = []
+        self.slot_day = array("b")
+        self.slot_start = array("i")  # minutes since Monday 00:00
+        self.slot_end = array("i")
+        self.slot_duration = array("i")
+        self.slot_periods = array("q")  # period bitmask (see intervals.period_mask)
+
+        self.room_records: List[RoomRecord] = []
+        self.room_capacity = array("i")
+        self.room_available = array("B")
+        self.room_type = array("i")  # room_types id, -1 = untyped
+        self.room_general = array("B")  # 1 if usable by untyped requests
+        self.room_keys: Dict[str, int] = {}  # room id, name or code -> room id
+
+        # Occupancy of existing entries the solver must work around:
+        # ("lecturer" | "room", dense id, start, end)
+        self.booked: List[Tuple[str, int, int, int]] = []
+
+        self.lecturer_days = array("B")  # bit d set: available on DAYS[d]
+        self.lecturer_unavailable = array("q")  # period bitmasks (app.services.availability)
+        self.lecturer_preferred = array("q")
+
+        self.tasks: List[Dict] = []  # source documents, used for output only
+        self.task_lecturer = array("i")
+        self.task_unit = array("i")
+        self.task_cohort = array("i")
+        self.task_room = array("i")
+        self.task_headcount = array("i")
+        self.task_minutes = array("i")  # required session length, 0 = any
+        self.task_room_type = array("i")  # required room_types id, -1 = general room
+        self.task_group = array("i")  # sessions of one unit share a group, placed together
+        self.task_session = array("i")  # session number within the group
+
+    # ---- building ----
+
+    def add_slot(self, day, start, end, source=None) -> Optional[int]:
+        interval = week_interval(day, start, end)
+        if interval is None:
+            return None
+        self.slots.append(SlotRecord(day, start, end, source))
+        self.slot_day.append(interval[0] // 1440)
+        self.slot_start.append(interval[0])
+        self.slot_end.append(interval[1])
+        self.slot_duration.append(interval[1] - interval[0])
+        self.slot_periods.append(period_mask(*interval))
+        return len(self.slots) - 1
+
+    def add_room(self, doc: Dict) -> int:
+        record = RoomRecord(doc)
+        room = self.rooms.intern(record.id)
+        if room == len(self.room_records):
+            self._append_room(record, int(doc.get("capacity") or 0))
+        return room
+
+    def room_id(self, key) -> int:
+        """Id for a room referenced only by key (no document loaded)"""
+        if not key:
+            return -1
+        room = self.rooms.intern(str(key))
+        if room == len(self.room_records):
+            # Unknown room: usable where it is referenced, never picked for others
+            self._append_room(RoomRecord({"_id": key, "is_available": False}), 0)
+        return room
+
+    def room_of(self, doc: Dict) -> Optional[int]:
+        """Room of an entry by room_id, name or code; -1 if it names none, None if unknown"""
+        keys = [doc.get(k) for k in ("room_id", "room", "room_code") if doc.get(k)]
+        if not keys:
+            return -1
+        return next((self.room_keys[str(k)] for k in keys if str(k) in self.room_keys), None)
+
+    def _append_room(self, record: RoomRecord, capacity: int):
+        for key in (record.id, record.name, record.code):
+            if key:
+                self.room_keys.setdefault(str(key), len(self.room_records))
+        self.room_records.append(record)
+        self.room_capacity.append(capacity)
+        self.room_available.append(1 if record.is_available else 0)
+        self.room_type.append(self.room_types.intern(record.room_type) if record.room_type else -1)
+        self.room_general.append(1 if is_general_room(record.room_type) else 0)
+
+    def lecturer_id(self, key, days: int = ALL_DAYS, unavailable: int = 0, preferred: int = 0) -> int:
+        lecturer = self.lecturers.intern(key)
+        if lecturer == len(self.lecturer_days):
+            self.lecturer_days.append(days)
+            self.lecturer_unavailable.append(unavailable)
+            self.lecturer_preferred.append(preferred)
+        return lecturer
+
+    def add_task(self, source: Dict, lecturer: int, unit=None, cohort=None,
+                 room: int = -1, headcount: int = 0, minutes: int = 0, room_type=None,
+                 group: Optional[int] = None, session: int = 0) -> int:
+        """Add a task; `group` defaults to a new group of its own"""
+        self.task_group.append(len(self.tasks) if group is None else group)
+        self.task_session.append(session)
+        self.tasks.append(source)
+        self.task_lecturer.append(lecturer)
+        self.task_unit.append(self.units.intern(unit) if unit is not None else -1)
+        self.task_cohort.append(self.cohorts.intern(cohort) if cohort is not None else -1)
+        self.task_room.append(room)
+        self.task_headcount.append(headcount)
+        self.task_minutes.append(minutes)
+        room_type = room_type_key(room_type)
+        self.task_room_type.append(self.room_types.intern(room_type) if room_type else -1)
+        return len(self.tasks) - 1
+
+    def add_booking(self, doc: Dict):
+        """
+        Lock the lecturer and room of an existing entry (e.g. one a lecturer
+        booked) for its interval. Rooms not on record lock nothing.
+        """
+        interval = interval_of(doc)
+        if interval is None:
+            return
+        if doc.get("lecturer_id"):
+            self.booked.append(("lecturer", self.lecturer_id(_key(doc["lecturer_id"])), *interval))
+        room = self.room_of(doc)
+        if room is not None and room >= 0:
+            self.booked.append(("room", room, *interval))
+
+    def groups(self) -> List[List[int]]:
+        """Task ids per group, in order of first appearance"""
+        groups: Dict[int, List[int]] = {}
+        for task, group in enumerate(self.task_group):
+            groups.setdefault(group, []).append(task)
+        return list(groups.values())
+
+    # ---- sizes ----
+
+    @property
+    def task_count(self) -> int:
+        return len(self.tasks)
+
+    @property
+    def slot_count(self) -> int:
+        return len(self.slots)
+
+    @property
+    def room_count(self) -> int:
+        return len(self.room_records)
+
+
+def _key(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _days_mask(days: Iterable) -> int:
+    mask = 0
+    for day in days or ():
+        d = day_index(day)
+        if d is not None:
+            mask |= 1 << d
+    return mask
+
+
+def _session_minutes(doc: Dict) -> int:
+    hours = doc.get("duration_hours") or doc.get("session_hours")
+    return int(hours) * 60 if hours else 0
+
+
+def plan_sessions(weekly_minutes: int, lengths: Iterable[int],
+                  max_sessions: int = MAX_SESSIONS_PER_WEEK) -> List[int]:
+    """
+    Session lengths (minutes) for a week: at most `max_sessions` sessions
+    of the given lengths, preferring to cover `weekly_minutes`, then the
+    smallest difference, then fewer sessions.
+    """
+    lengths = sorted({length for length in lengths if length > 0}, reverse=True)
+    best, plan = None, []
+    for count in range(1, max_sessions + 1):
+        for combo in combinations_with_replacement(lengths, count):
+            total = sum(combo)
+            key = (total < weekly_minutes, abs(total - weekly_minutes), count)
+            if best is None or key < best:
+                best, plan = key, list(combo)
+    return plan
+
+
+def weekly_sessions(doc: Dict, weeks: int, slot_lengths: Iterable[int]) -> List[int]:
+    """
+    Session lengths for an assignment, from its unit's total_hours spread
+    over `weeks` teaching weeks. A fixed duration_hours/session_hours sets
+    the length; otherwise lengths are chosen among the slot lengths on
+    offer. [0] (one session of any length) when there is nothing to go by.
+    """
+    fixed = _session_minutes(doc)
+    total_hours = doc.get("total_hours")
+    if not weeks or not total_hours:
+        return [fixed]
+    weekly = math.ceil(float(total_hours) * 60 / weeks)
+    if fixed:
+        return [fixed] * max(1, min(MAX_SESSIONS_PER_WEEK, math.ceil(weekly / fixed)))
+    return plan_sessions(weekly, slot_lengths) or [0]
+
+
+def compile_assignments(assignments: Iterable[Dict], slots: Iterable[Dict],
+                        rooms: Iterable[Dict] = (), availability: Optional[Dict] = None,
+                        weeks: int = 0, masks: Optional[Dict] = None,
+                        booked: Iterable[Dict] = ()) -> Problem:
+    """
+    Problem for TimetableGenerator: lecturer assignments over time slots.
+    `availability` maps lecturer ids to day names; lecturers not listed (or
+    no mapping at all) are available every day. `masks` maps lecturer ids to
+    (unavailable, preferred) period bitmasks. With `weeks`, each
+    assignment becomes a group of weekly sessions (see weekly_sessions);
+    without it, one session of any length. `booked` entries stay where
+    they are and hold their lecturer and room (see Problem.add_booking).
+    """
+    problem = Problem()
+    for slot in slots:
+        problem.add_slot(slot.get("day"), slot.get("start_time"), slot.get("end_time"), slot)
+    for room in rooms:
+        problem.add_room(room)
+
+    def days_for(lecturer):
+        if availability is None or lecturer not in availability:
+            return ALL_DAYS
+        return _days_mask(availability[lecturer])
+
+    slot_lengths = set(problem.slot_duration)
+    for a in assignments:
+        lecturer = _key(a.get("lecturer_id"))
+        lecturer_id = problem.lecturer_id(lecturer, days_for(lecturer), *(masks or {}).get(lecturer, (0, 0)))
+        room = problem.room_id(a.get("room_id"))
+        group = problem.task_count
+        for session, minutes in enumerate(weekly_sessions(a, weeks, slot_lengths)):
+            problem.add_task(
+                a,
+                lecturer=lecturer_id,
+                unit=_key(a.get("unit_id")),
+                cohort=_key(a.get("course_id")),
+                room=room,
+                headcount=int(a.get("student_count") or 0),
+                minutes=minutes,
+                room_type=a.get("room_type"),
+                group=group,
+                session=session,
+            )
+    # After the tasks, so lecturers keep the availability given above
+    for entry in booked:
+        problem.add_booking(entry)
+    return problem
+
+
+def compile_courses(courses: Iterable[Dict], rooms: Iterable[Dict], slots: Iterable[Dict],
+                    availability: Dict) -> Problem:
+    """Problem for greedy_schedule: courses over {day, start, end} slots and rooms"""
+    problem = Problem()
+    for slot in slots:
+        problem.add_slot(slot.get("day"), slot.get("start"), slot.get("end"), slot)
+    for room in rooms:
+        problem.add_room(room)
+    for course in courses:
+        lecturer = course.get("lecturer_id")
+        problem.add_task(
+            course,
+            lecturer=problem.lecturer_id(lecturer, _days_mask(availability.get(lecturer, []))),
+            unit=_key(course.get("unit_id")),
+            cohort=_key(course.get("course_id")),
+            headcount=len(course.get("students", [])),
+            minutes=_session_minutes(course),
+            room_type=course.get("room_type"),
+        )
+    return problem
@@ -0,0 +1,196 @@
+"""
+Cache of encoded, precompressed response bodies (JSON and calendar feeds).
+
+Entries are keyed by (endpoint, course, year, semester, version) where the
+version comes from `app.services.versioning`, so a write simply makes the
+old key unreachable instead of needing invalidation. The JSON body and its
+gzip (and, if the `brotli` package is installed, brotli) variants are built
+once when a version is first requested; hits return the stored bytes with
+no serialisation or compression work.
+
+Memory is bounded by RESPONSE_CACHE_SIZE entries (least recently used
+evicted first). If RESPONSE_CACHE_SPILL_DIR is set, evicted entries are
+written there and read back on a later miss, up to RESPONSE_CACHE_SPILL_MAX
+files. Keys carry persistent version counters, so files left by a previous
+run are still valid and are indexed again at startup.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.utils.metrics import Metric, register
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+CACHE_REQUESTS = register(Metric(
+    "response_cache_requests_total", "Response cache lookups", "counter", ("endpoint", "result")))
+
+
+class CachedBody:
+    __slots__ = ("identity", "gzip", "br")
+
+    def __init__(self, identity: bytes, gzipped: bytes, br: Optional[bytes]):
+        self.identity = identity
+        self.gzip = gzipped
+        self.br = br
+
+
+def encode_body(payload) -> CachedBody:
+    """JSON-encode `payload` and precompress it"""
+    return compress_body(json.dumps(payload, separators=(",", ":"), default=str).encode())
+
+
+def compress_body(body: bytes) -> CachedBody:
+    return CachedBody(
+        body,
+        gzip.compress(body, compresslevel=6),
+        brotli.compress(body, quality=5) if brotli is not None else None,
+    )
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, spill_dir: str = "", spill_max: int = 0):
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir or None
+        self.spill_max = spill_max
+        self._entries: "OrderedDict[Tuple, CachedBody]" = OrderedDict()
+        self._spilled: "OrderedDict[str, None]" = OrderedDict()
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._index_spilled()
+
+    def _index_spilled(self):
+        """Index files spilled by a previous run, oldest first, trimmed to spill_max"""
+        files = []
+        for entry in os.scandir(self.spill_dir):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                files.append((entry.stat().st_mtime, entry.name))
+        for _, name in sorted(files):
+            self._spilled[name] = None
+        self._trim_spilled()
+
+    def _trim_spilled(self):
+        while len(self._spilled) > self.spill_max:
+            old, _ = self._spilled.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.spill_dir, old))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _file_name(key: Tuple) -> str:
+        return hashlib.sha1(repr(key).encode()).hexdigest() + ".bin"
+
+    def _spill(self, key: Tuple, cached: CachedBody):
+        name = self._file_name(key)
+        with open(os.path.join(self.spill_dir, name), "wb") as f:
+            pickle.dump((key, cached.identity, cached.gzip, cached.br), f)
+        self._spilled[name] = None
+        self._spilled.move_to_end(name)
+        self._trim_spilled()
+
+    def _load_spilled(self, key: Tuple) -> Optional[CachedBody]:
+        name = self._file_name(key)
+        if name not in self._spilled:
+            return None
+        try:
+            with open(os.path.join(self.spill_dir, name), "rb") as f:
+                stored_key, identity, gzipped, br = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, ValueError):
+            return None
+        return CachedBody(identity, gzipped, br) if stored_key == key else None
+
+    def get(self, key: Tuple) -> Optional[CachedBody]:
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            return cached
+        if self.spill_dir:
+            cached = self._load_spilled(key)
+            if cached is not None:
+                self._store(key, cached)
+        return cached
+
+    def _store(self, key: Tuple, cached: CachedBody):
+        self._entries[key] = cached
+        while len(self._entries) > self.max_entries:
+            old_key, old = self._entries.popitem(last=False)
+            if self.spill_dir:
+                self._spill(old_key, old)
+
+    def clear(self):
+        """Drop the in-memory entries (spilled files are left alone)"""
+        self._entries.clear()
+
+    def put(self, key: Tuple, payload, encoder=encode_body) -> CachedBody:
+        cached = encoder(payload)
+        self._store(key, cached)
+        return cached
+
+    async def get_or_build(self, key: Tuple, build, encoder=encode_body) -> CachedBody:
+        """
+        Return the cached body for `key`, building it with `await build()` on
+        a miss. `encoder` turns the built value into a CachedBody (JSON by
+        default; use `compress_body` for prebuilt bytes).
+        """
+        cached = self.get(key)
+        CACHE_REQUESTS.inc(key[0], "hit" if cached is not None else "miss")
+        if cached is None:
+            cached = self.put(key, await build(), encoder)
+        return cached
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q}"""
+    accepted = {}
+    for part in header.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def cached_response(request: Request, cached: CachedBody, headers: Dict[str, str] = None,
+                    media_type: str = "application/json") -> Response:
+    """Serve the best precompressed variant the client accepts"""
+    accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+    wildcard = accepted.get("*", 0.0)
+    br_q = accepted.get("br", wildcard) if cached.br is not None else 0.0
+    gzip_q = accepted.get("gzip", wildcard)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if br_q > 0 and br_q >= gzip_q:
+        body = cached.br
+        headers["Content-Encoding"] = "br"
+    elif gzip_q > 0:
+        body = cached.gzip
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = cached.identity
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_SIZE,
+    settings.RESPONSE_CACHE_SPILL_DIR,
+    settings.RESPONSE_CACHE_SPILL_MAX,
+)
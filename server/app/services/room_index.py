@@ -0,0 +1,113 @@
+"""
+Best-fit room lookup shared by every room picker.
+
+Available rooms are grouped into buckets by room type and house, each
+sorted by capacity, so "smallest room of this type that seats N" is a
+bisect plus a short walk past rooms the caller rejects (e.g. already booked
+at that time). General-purpose rooms also sit in the untyped bucket, so
+requests without a room type never land in a lab; typed requests only see
+rooms of that type. A department's own building (the house most of its
+rooms are in) is tried before the rest of the campus.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services.problem import Problem, room_type_key
+
+
+class _Bucket:
+    __slots__ = ("capacities", "rooms")
+
+    def __init__(self):
+        self.capacities: List[int] = []
+        self.rooms: List[int] = []
+
+    def add(self, capacity: int, room: int):
+        # bisect_right keeps insertion order among equal capacities
+        i = bisect_right(self.capacities, capacity)
+        self.capacities.insert(i, capacity)
+        self.rooms.insert(i, room)
+
+    def first_fit(self, headcount: int, accept: Optional[Callable[[int], bool]]) -> Optional[int]:
+        for j in range(bisect_left(self.capacities, headcount), len(self.rooms)):
+            if accept is None or accept(self.rooms[j]):
+                return self.rooms[j]
+        return None
+
+
+class RoomIndex:
+    """Capacity-sorted room buckets over the rooms of a compiled problem"""
+
+    def __init__(self, problem: Problem):
+        self.problem = problem
+        self._by_type: Dict[Optional[str], _Bucket] = defaultdict(_Bucket)
+        self._by_house: Dict[Tuple[Optional[str], str], _Bucket] = defaultdict(_Bucket)
+        self.indexed = 0
+        department_houses: Dict[str, Counter] = defaultdict(Counter)
+
+        for room, record in enumerate(problem.room_records):
+            if record.department_id and record.house:
+                department_houses[record.department_id][record.house] += 1
+            if not problem.room_available[room]:
+                continue
+            self.indexed += 1
+            capacity = problem.room_capacity[room]
+            keys = [record.room_type] if record.room_type else []
+            if problem.room_general[room]:
+                keys.append(None)
+            for key in keys:
+                self._by_type[key].add(capacity, room)
+                if record.house:
+                    self._by_house[(key, record.house)].add(capacity, room)
+
+        self._department_house = {
+            dept: houses.most_common(1)[0][0] for dept, houses in department_houses.items()
+        }
+
+    @classmethod
+    def from_documents(cls, rooms: Iterable[Dict]) -> "RoomIndex":
+        problem = Problem()
+        for room in rooms:
+            problem.add_room(room)
+        return cls(problem)
+
+    def __len__(self):
+        """Number of available (indexed) rooms"""
+        return self.indexed
+
+    def department_house(self, department_id) -> Optional[str]:
+        """Building most of a department's rooms are in"""
+        return self._department_house.get(str(department_id)) if department_id else None
+
+    def best_fit(self, headcount: int, room_type=None, department_id=None, house: Optional[str] = None,
+                 accept: Optional[Callable[[int], bool]] = None) -> Optional[int]:
+        """
+        Smallest suitable room id seating `headcount`, or None.
+        `accept(room_id)` can reject candidates (e.g. booked at that time).
+        """
+        headcount = max(int(headcount or 0), 1)
+        key = room_type_key(room_type)
+        preferred = house or self.department_house(department_id)
+        if preferred:
+            bucket = self._by_house.get((key, preferred))
+            if bucket:
+                room = bucket.first_fit(headcount, accept)
+                if room is not None:
+                    return room
+        bucket = self._by_type.get(key)
+        return bucket.first_fit(headcount, accept) if bucket else None
+
+    def candidates(self, headcount: int, room_type=None) -> List[int]:
+        """Every available room of the type seating `headcount`, smallest first"""
+        bucket = self._by_type.get(room_type_key(room_type))
+        if not bucket:
+            return []
+        return bucket.rooms[bisect_left(bucket.capacities, max(int(headcount or 0), 1)):]
+
+    def record(self, room: int):
+        return self.problem.room_records[room]
+
+    def capacity(self, room: int) -> int:
+        return self.problem.room_capacity[room]
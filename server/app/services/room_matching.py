@@ -0,0 +1,251 @@
+"""
+Per-slot room reassignment.
+
+Once session times are fixed, the room choice at each time is an independent
+assignment problem. Handing rooms out first-come lets a small class take a
+large hall early so a later, bigger class at the same time finds nothing.
+This pass revisits the sessions interval by interval and solves a min-cost
+bipartite matching between the sessions at that time and the rooms free then:
+
+    cost(session, room) = wasted seats
+                        + BUILDING_CHANGE_COST per building change
+
+A building change is counted against the previous session of the same
+lecturer and of the same cohort that day (or the department's own building
+for the first session of the day). Each session also gets a private
+"no room" column, so the matching first seats as many sessions as possible
+and only then minimises waste. Sessions that already had a room cost more to
+leave unseated, so nobody loses a room to make space for another session.
+Intervals are processed in order of start time; a room still held by a
+session of a later, overlapping interval stays blocked until that session
+is matched, so a 2h class starting at 08:00 cannot take the room of a 3h
+class that also starts at 08:00.
+
+scipy.optimize.linear_sum_assignment is used when scipy is installed;
+otherwise a pure-Python Hungarian algorithm solves the (small) per-slot
+matrices.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.problem import Problem, room_type_key
+from app.services.room_index import RoomIndex
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # optional dependency
+    linear_sum_assignment = None
+
+# One building change is worth this many empty seats
+BUILDING_CHANGE_COST = 25
+# Leaving a session without a room outweighs any amount of waste
+UNPLACED_COST = 1_000_000
+FORBIDDEN_COST = 1_000_000_000
+
+
+class Session:
+    """A placed session whose room may be (re)chosen; `room` is a problem room id or -1"""
+
+    __slots__ = ("key", "start", "end", "headcount", "room_type", "department_id",
+                 "lecturer", "cohort", "room", "original_room")
+
+    def __init__(self, key, start: int, end: int, headcount: int = 0, room_type=None,
+                 department_id=None, lecturer=None, cohort=None, room: int = -1):
+        self.key = key
+        self.start = start
+        self.end = end
+        self.headcount = max(int(headcount or 0), 1)
+        self.room_type = room_type_key(room_type)
+        self.department_id = str(department_id) if department_id else None
+        self.lecturer = lecturer
+        self.cohort = cohort
+        self.room = room
+        self.original_room = room
+
+    @property
+    def changed(self) -> bool:
+        return self.room != self.original_room
+
+
+def _hungarian(cost: List[List[float]]) -> List[int]:
+    """Column for each row minimising total cost (rows <= columns)"""
+    n = len(cost)
+    m = len(cost[0]) if n else 0
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)  # match[j]: row (1-based) assigned to column j
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+    columns = [-1] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            columns[match[j] - 1] = j - 1
+    return columns
+
+
+def solve_assignment(cost: np.ndarray) -> List[int]:
+    """Min-cost column per row of a rows <= columns cost matrix"""
+    if not cost.size:
+        return [-1] * cost.shape[0]
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+        columns = [-1] * cost.shape[0]
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            columns[r] = c
+        return columns
+    return _hungarian(cost.tolist())
+
+
+class RoomMatcher:
+    """Reassigns rooms slot by slot over the rooms of a compiled problem"""
+
+    def __init__(self, problem: Problem, room_index: Optional[RoomIndex] = None):
+        self.problem = problem
+        self.room_index = room_index or RoomIndex(problem)
+        self.capacity = np.asarray(problem.room_capacity, dtype=np.int64)
+        self.available = np.asarray(problem.room_available, dtype=bool)
+        self.general = np.asarray(problem.room_general, dtype=bool)
+        self.types = [r.room_type for r in problem.room_records]
+        self.houses = [r.house for r in problem.room_records]
+
+    def _compatible(self, session: Session) -> np.ndarray:
+        if session.room_type is None:
+            type_ok = self.general
+        else:
+            type_ok = np.fromiter((t == session.room_type for t in self.types), bool, len(self.types))
+        return self.available & type_ok & (self.capacity >= session.headcount)
+
+    def reassign(self, sessions: Sequence[Session],
+                 locked: Iterable[Tuple[int, int, int]] = ()) -> Dict:
+        """
+        Choose `session.room` for every session, slot by slot.
+        `locked` holds (room, start, end) bookings that must stay where they are.
+        Returns before/after counters.
+        """
+        busy: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        for room, start, end in locked:
+            if room >= 0:
+                busy[room].append((start, end))
+
+        # Decided sessions per lecturer / cohort, for building changes
+        placed: Dict[Tuple[str, object], List[Session]] = defaultdict(list)
+
+        groups: Dict[Tuple[int, int], List[Session]] = defaultdict(list)
+        # Original rooms of sessions not matched yet
+        held: Dict[int, List[Session]] = defaultdict(list)
+        for session in sessions:
+            groups[(session.start, session.end)].append(session)
+            if session.original_room >= 0:
+                held[session.original_room].append(session)
+
+        before = self._summary(sessions)
+        for (start, end), group in sorted(groups.items()):
+            for session in group:
+                if session.original_room >= 0:
+                    held[session.original_room].remove(session)
+            self._match_slot(start, end, group, busy, held, placed)
+            for session in group:
+                if session.room >= 0:
+                    busy[session.room].append((start, end))
+                for owner in (("lecturer", session.lecturer), ("cohort", session.cohort)):
+                    if owner[1] is not None:
+                        placed[owner].append(session)
+        after = self._summary(sessions)
+
+        return {
+            "sessions": len(sessions),
+            "slots": len(groups),
+            "rooms_changed": sum(1 for s in sessions if s.changed),
+            "seated_before": before["seated"],
+            "seated_after": after["seated"],
+            "wasted_seats_before": before["wasted_seats"],
+            "wasted_seats_after": after["wasted_seats"],
+        }
+
+    def _match_slot(self, start: int, end: int, group: List[Session], busy, held, placed):
+        free = self.available.copy()
+        for room, intervals in busy.items():
+            if free[room] and any(start < b_end and b_start < end for b_start, b_end in intervals):
+                free[room] = False
+        for room, holders in held.items():
+            if free[room] and any(start < h.end and h.start < end for h in holders):
+                free[room] = False
+
+        compatible = np.stack([self._compatible(s) & free for s in group])
+        candidates = np.flatnonzero(compatible.any(axis=0))
+        n, k = len(group), len(candidates)
+
+        cost = np.full((n, k + n), FORBIDDEN_COST, dtype=np.float64)
+        if k:
+            wasted = self.capacity[candidates][None, :] - np.array([s.headcount for s in group])[:, None]
+            changes = np.array([
+                [self._building_changes(s, self.houses[r], start, placed) for r in candidates.tolist()]
+                for s in group
+            ]).reshape(n, k)
+            cost[:, :k] = np.where(compatible[:, candidates], wasted + BUILDING_CHANGE_COST * changes,
+                                   FORBIDDEN_COST)
+        for i, session in enumerate(group):
+            # Unseating someone who had a room is worse than not seating a newcomer
+            cost[i, k + i] = UNPLACED_COST * (2 if session.original_room >= 0 else 1)
+
+        for i, column in enumerate(solve_assignment(cost)):
+            seated = 0 <= column < k and cost[i, column] < FORBIDDEN_COST
+            group[i].room = int(candidates[column]) if seated else -1
+
+    def _building_changes(self, session: Session, house: Optional[str], start: int, placed) -> int:
+        day = start // 1440
+        references = []
+        for owner in (("lecturer", session.lecturer), ("cohort", session.cohort)):
+            previous = None
+            for other in placed.get(owner, ()):
+                if other.room >= 0 and other.end <= start and other.start // 1440 == day:
+                    if previous is None or other.end > previous.end:
+                        previous = other
+            if previous is not None:
+                references.append(self.houses[previous.room])
+        if not references:
+            references.append(self.room_index.department_house(session.department_id))
+        return sum(1 for ref in references if ref and house and ref != house)
+
+    def _summary(self, sessions: Sequence[Session]) -> Dict:
+        seated = [s for s in sessions if s.room >= 0]
+        return {
+            "seated": len(seated),
+            "wasted_seats": int(sum(max(self.capacity[s.room] - s.headcount, 0) for s in seated)),
+        }
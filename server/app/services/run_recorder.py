@@ -0,0 +1,51 @@
+"""
+Timing and memory instrumentation for timetable generation runs
+"""
+
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Dict
+
+
+class RunRecorder:
+    """Collects per-phase timings and peak memory for one generation run"""
+
+    def __init__(self):
+        self.started_at = datetime.utcnow()
+        self.phases: Dict[str, float] = {}
+        self.peak_memory_bytes = None
+        self._start = perf_counter()
+
+    @contextmanager
+    def phase(self, name: str, track_memory: bool = False):
+        """
+        Time a block as `name` (milliseconds). With track_memory, the peak
+        Python heap allocated inside the block is recorded via tracemalloc;
+        use it only around synchronous work so other requests on the event
+        loop do not inflate the figure. Tracing slows every allocation, so
+        callers enable it only when asked to (off by default).
+        """
+        owns_tracing = track_memory and not tracemalloc.is_tracing()
+        if owns_tracing:
+            tracemalloc.start()
+        elif track_memory:
+            tracemalloc.reset_peak()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((perf_counter() - start) * 1000, 3)
+            if track_memory:
+                self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            if owns_tracing:
+                tracemalloc.stop()
+
+    def as_dict(self) -> Dict:
+        return {
+            "started_at": self.started_at,
+            "total_ms": round((perf_counter() - self._start) * 1000, 3),
+            "phases_ms": dict(self.phases),
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
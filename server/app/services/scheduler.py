@@ -1,34 +1,56 @@
+from collections import defaultdict
+
+from app.services.feasibility import build_feasibility
+from app.services.problem import compile_courses
+from app.services.room_index import RoomIndex
+
+
+def _free(busy, start, end):
+    return not any(start < b_end and b_start < end for b_start, b_end in busy)
+
+
 def greedy_schedule(courses, rooms, slots, availability):
+    problem = compile_courses(courses, rooms, slots, availability)
+    # Day availability, duration, capacity, room availability and room type
+    feasibility = build_feasibility(problem)
+    room_index = RoomIndex(problem)
     timetable = []
-    lecturer_busy = {}
-    room_busy = {}
+    lecturer_busy = defaultdict(list)
+    room_busy = defaultdict(list)
 
-    for course in courses:
-        for slot in slots:
-            if slot["day"] not in availability.get(course.get("lecturer_id"), []):
-                continue
-            l_key = (course.get("lecturer_id"), slot["day"], slot["start"])
-            if l_key in lecturer_busy:
+    slot_start, slot_end = problem.slot_start, problem.slot_end
+
+    for task in range(problem.task_count):
+        lecturer = problem.task_lecturer[task]
+        if not feasibility.task_room[task].any():
+            continue
+        course = problem.tasks[task]
+        for slot in feasibility.slots_for(task):
+            start, end = slot_start[slot], slot_end[slot]
+            if not _free(lecturer_busy[lecturer], start, end):
                 continue
-            room = next(
-                (r for r in rooms if r.get("capacity", 0) >= len(course.get("students", []))
-                 and (r.get("name"), slot["day"], slot["start"]) not in room_busy),
-                None
+            # Best fit, own department's building first, free at this time
+            room = room_index.best_fit(
+                problem.task_headcount[task], course.get("room_type"), course.get("department_id"),
+                accept=lambda r: _free(room_busy[r], start, end)
             )
-            if not room:
+            if room is None:
                 continue
 
-            lecturer_busy[l_key] = True
-            room_busy[(room["name"], slot["day"], slot["start"])] = True
+            lecturer_busy[lecturer].append((start, end))
+            room_busy[room].append((start, end))
 
+            record = problem.slots[slot]
             timetable.append({
                 "course": course.get("code") or course.get("course"),
                 "course_id": course.get("course_id"),
                 "unit_id": course.get("unit_id"),
                 "unit_code": course.get("unit_code"),
                 "lecturer": course.get("lecturer_id"),
-                "room": room["name"],
-                "timeslot": f"{slot['day']} {slot['start']}-{slot['end']}"
+                "room": problem.room_records[room].name,
+                "timeslot": f"{record.day} {record.start_time}-{record.end_time}",
+                "week_start": start,
+                "week_end": end,
             })
             break
 
@@ -0,0 +1,175 @@
+"""
+Ranked slot recommendations for a lecturer's assignment.
+
+Every candidate slot gets a marginal cost from occupancy loaded once per
+request (timetable entries grouped by day, enrollments, pending
+assignments, room index and availability masks):
+
+    cohort      students of this unit who have another class then
+    room        no suitable room free is a hard stop; otherwise wasted
+                seats of the best-fitting free room plus a scarcity term
+                when few suitable rooms are left
+    load        hours the lecturer already teaches that day
+    blocking    share of the remaining options this slot takes away from
+                pending assignments that cannot run at the same time
+                (same lecturer, or units sharing students)
+    preference  bonus when the slot lies within the lecturer's preferred
+                periods
+
+Slots clashing with the lecturer's own classes or unavailable periods are
+never recommended. Lower cost ranks first; each result carries reasons.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.intervals import MINUTES_PER_DAY, interval_of, period_mask
+from app.services.room_index import RoomIndex
+
+COHORT_WEIGHT = 1.0  # per student with a clash
+WASTE_WEIGHT = 0.05  # per empty seat in the best-fitting room
+SCARCITY_WEIGHT = 10.0  # divided by the number of suitable rooms left
+LOAD_WEIGHT = 2.0  # per hour already taught that day
+BLOCKING_WEIGHT = 20.0  # per pending assignment losing all its options
+PREFERRED_BONUS = 5.0
+
+Interval = Tuple[int, int]
+
+
+def _overlapping(intervals: Iterable[Tuple], start: int, end: int):
+    return (item for item in intervals if item[0] < end and start < item[1])
+
+
+class PendingAssignment:
+    """A pending assignment that cannot share a time with the one being placed"""
+
+    __slots__ = ("assignment_id", "lecturer_id", "unavailable", "why")
+
+    def __init__(self, assignment_id: str, lecturer_id: str, unavailable: int, why: str):
+        self.assignment_id = assignment_id
+        self.lecturer_id = lecturer_id
+        self.unavailable = unavailable
+        self.why = why
+
+
+class SlotRanker:
+    """Scores candidate slots for one assignment against current occupancy"""
+
+    def __init__(self, lecturer_id: str, unit_id: str, headcount: int, room_type,
+                 entries: Iterable[Dict], room_index: RoomIndex,
+                 shared_students: Dict[str, int], pending: Iterable[PendingAssignment],
+                 unavailable: int = 0, preferred: int = 0):
+        self.lecturer_id = str(lecturer_id)
+        self.unit_id = str(unit_id)
+        self.headcount = headcount
+        self.room_index = room_index
+        self.shared_students = shared_students
+        self.pending = list(pending)
+        self.unavailable = unavailable
+        self.preferred = preferred
+
+        # Suitable rooms, smallest first, and every key an entry may use for them
+        self.suitable = room_index.candidates(headcount, room_type)
+        self.room_keys = {}
+        for room, record in enumerate(room_index.problem.room_records):
+            for key in (record.id, record.name, record.code):
+                if key:
+                    self.room_keys.setdefault(str(key), room)
+
+        # Occupancy per day: (start, end, unit_id, lecturer_id, room)
+        self.by_day: Dict[int, List[Tuple]] = defaultdict(list)
+        self.lecturer_busy: Dict[str, List[Interval]] = defaultdict(list)
+        for entry in entries:
+            interval = interval_of(entry)
+            if interval is None:
+                continue
+            room_key = entry.get("room_id") or entry.get("room")
+            room = self.room_keys.get(str(room_key)) if room_key else None
+            lecturer = str(entry.get("lecturer_id"))
+            self.by_day[interval[0] // MINUTES_PER_DAY].append(
+                (interval[0], interval[1], str(entry.get("unit_id")), lecturer, room))
+            self.lecturer_busy[lecturer].append(interval)
+
+        self._options: Dict[str, int] = {}
+
+    def prepare(self, candidates: List[Dict]):
+        """Count each pending assignment's open candidates (for blocking)"""
+        for pending in self.pending:
+            self._options[pending.assignment_id] = sum(
+                1 for c in candidates if self._open_for(pending, c["week_start"], c["week_end"]))
+
+    def _open_for(self, pending: PendingAssignment, start: int, end: int) -> bool:
+        if period_mask(start, end) & pending.unavailable:
+            return False
+        return not any(True for _ in _overlapping(self.lecturer_busy.get(pending.lecturer_id, ()), start, end))
+
+    def score(self, start: int, end: int) -> Optional[Dict]:
+        """Cost and reasons for [start, end), or None if it cannot be used"""
+        day = start // MINUTES_PER_DAY
+        periods = period_mask(start, end)
+        if periods & self.unavailable:
+            return None
+        if any(True for _ in _overlapping(self.lecturer_busy.get(self.lecturer_id, ()), start, end)):
+            return None
+
+        overlapping = list(_overlapping(self.by_day.get(day, ()), start, end))
+        reasons = []
+        breakdown = {}
+
+        # Rooms: best fit among suitable rooms nobody occupies then
+        taken = {item[4] for item in overlapping if item[4] is not None}
+        free = [room for room in self.suitable if room not in taken]
+        if not free:
+            return None
+        best = self.room_index.record(free[0])
+        waste = max(self.room_index.capacity(free[0]) - self.headcount, 0)
+        breakdown["room"] = WASTE_WEIGHT * waste + SCARCITY_WEIGHT / len(free)
+        reasons.append(f"{len(free)} suitable room{'s' if len(free) != 1 else ''} free, "
+                       f"best fit {best.name or best.code} ({waste} spare seats)")
+
+        # Students of this unit with another class at this time
+        clashing_units = {item[2] for item in overlapping if item[2] != self.unit_id}
+        students = sum(self.shared_students.get(unit, 0) for unit in clashing_units)
+        breakdown["cohort"] = COHORT_WEIGHT * students
+        if students:
+            reasons.append(f"{students} enrolled student{'s' if students != 1 else ''} "
+                           f"have another class then")
+
+        # Lecturer's teaching hours already on this day
+        minutes = sum(e - s for s, e in self.lecturer_busy.get(self.lecturer_id, ())
+                      if s // MINUTES_PER_DAY == day)
+        breakdown["load"] = LOAD_WEIGHT * minutes / 60
+        if minutes:
+            reasons.append(f"You already teach {minutes / 60:g}h that day")
+
+        # Options this takes away from pending assignments that cannot overlap
+        blocked = [p for p in self.pending if self._open_for(p, start, end)]
+        breakdown["blocking"] = BLOCKING_WEIGHT * sum(
+            1 / self._options[p.assignment_id] for p in blocked if self._options.get(p.assignment_id))
+        if blocked:
+            reasons.append(f"Overlaps open options of {len(blocked)} pending "
+                           f"class{'es' if len(blocked) != 1 else ''} ({', '.join(sorted({p.why for p in blocked}))})")
+
+        breakdown["preference"] = 0.0
+        if self.preferred and periods and not periods & ~self.preferred:
+            breakdown["preference"] = -PREFERRED_BONUS
+            reasons.append("Within your preferred hours")
+
+        return {
+            "score": round(sum(breakdown.values()), 2),
+            "breakdown": {k: round(v, 2) for k, v in breakdown.items()},
+            "room": best.name,
+            "room_code": best.code,
+            "reasons": reasons,
+        }
+
+    def top(self, candidates: List[Dict], k: int) -> List[Dict]:
+        """The k cheapest usable candidates with their scores"""
+        self.prepare(candidates)
+        ranked = []
+        for candidate in candidates:
+            scored = self.score(candidate["week_start"], candidate["week_end"])
+            if scored is not None:
+                ranked.append({**candidate, **scored})
+        ranked.sort(key=lambda c: (c["score"], c["week_start"]))
+        return ranked[:k]
@@ -3,9 +3,26 @@ Timetable generation and clash detection service
 Ensures no clashes and optimizes schedules
 """
 
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
+from time import perf_counter
+
+from app.services.intervals import interval_of
+from app.services.feasibility import build_feasibility
+from app.services.problem import Problem, compile_assignments
+from app.services.room_index import RoomIndex
+from app.services.room_matching import RoomMatcher, Session
+from app.utils.metrics import SOLVER_DURATION
+
+# Search steps allowed per unit when placing its weekly sessions
+GROUP_SEARCH_LIMIT = 10_000
+
+
+def _id_of(doc: Dict) -> Optional[str]:
+    """Document id, whether or not it has been serialised"""
+    value = doc.get('_id', doc.get('id'))
+    return None if value is None else str(value)
 
 
 class ClashDetector:
@@ -15,56 +32,54 @@ class ClashDetector:
         self.lecturer_schedule = defaultdict(list)
         self.student_schedule = defaultdict(list)
         self.room_schedule = defaultdict(list)
+        self.overlap_tests = 0
     
     def add_schedule(self, entity_id: str, entity_type: str, slot: Dict):
         """
         Add a schedule entry
         entity_type: 'lecturer', 'student', 'room'
-        slot: {day, start_time, end_time}
+        slot: {week_start, week_end} or {day, start_time, end_time}
         """
         schedule_dict = {
             'lecturer': self.lecturer_schedule,
             'student': self.student_schedule,
             'room': self.room_schedule
         }
-        schedule_dict[entity_type][entity_id].append(slot)
+        interval = interval_of(slot)
+        if interval is None:
+            return  # unparsable day or times occupy nothing
+        schedule_dict[entity_type][entity_id].append(interval)
     
     def has_clash(self, entity_id: str, entity_type: str, slot: Dict) -> bool:
-        """Check if slot clashes with existing schedule"""
+        """Check if slot clashes with existing schedule; unparsable slots always do"""
+        interval = interval_of(slot)
+        if interval is None:
+            return True
+        return self.has_interval_clash(entity_id, entity_type, *interval)
+    
+    def has_interval_clash(self, entity_id, entity_type: str, start: int, end: int) -> bool:
+        """has_clash for a [start, end) interval in minutes of the week"""
         schedule_dict = {
             'lecturer': self.lecturer_schedule,
             'student': self.student_schedule,
             'room': self.room_schedule
         }
         
-        existing_slots = schedule_dict[entity_type].get(entity_id, [])
-        
-        for existing in existing_slots:
-            if self._slots_overlap(existing, slot):
+        # Intervals are minutes of the week, so different days never overlap
+        for existing_start, existing_end in schedule_dict[entity_type].get(entity_id, ()):
+            self.overlap_tests += 1
+            if start < existing_end and existing_start < end:
                 return True
         return False
     
-    def _slots_overlap(self, slot1: Dict, slot2: Dict) -> bool:
-        """Check if two time slots overlap"""
-        # Same day
-        if slot1['day'] != slot2['day']:
-            return False
-        
-        start1 = self._time_to_minutes(slot1['start_time'])
-        end1 = self._time_to_minutes(slot1['end_time'])
-        start2 = self._time_to_minutes(slot2['start_time'])
-        end2 = self._time_to_minutes(slot2['end_time'])
-        
-        # Check for overlap
-        return not (end1 <= start2 or end2 <= start1)
-    
-    @staticmethod
-    def _time_to_minutes(t: time) -> int:
-        """Convert time to minutes since midnight"""
-        if isinstance(t, str):
-            hours, minutes = map(int, t.split(':'))
-            return hours * 60 + minutes
-        return t.hour * 60 + t.minute
+    def add_interval(self, entity_id, entity_type: str, start: int, end: int):
+        """add_schedule for a [start, end) interval in minutes of the week"""
+        schedule_dict = {
+            'lecturer': self.lecturer_schedule,
+            'student': self.student_schedule,
+            'room': self.room_schedule
+        }
+        schedule_dict[entity_type][entity_id].append((start, end))
 
 
 class TimetableGenerator:
@@ -72,6 +87,21 @@ class TimetableGenerator:
     
     def __init__(self):
         self.clash_detector = ClashDetector()
+        self.candidate_slots_tried = 0
+        self.backtracks = 0
+        self.feasibility_stats = {}
+        self.room_stats = {}
+
+    @property
+    def stats(self) -> Dict:
+        """Constraint-check counters for the last run"""
+        return {
+            'overlap_tests': self.clash_detector.overlap_tests,
+            'candidate_slots_tried': self.candidate_slots_tried,
+            'backtracks': self.backtracks,
+            **self.feasibility_stats,
+            **self.room_stats,
+        }
     
     def generate_timetable(self, assignments: List[Dict], available_slots: List[Dict]) -> Dict:
         """
@@ -82,58 +112,270 @@ class TimetableGenerator:
         
         Returns: {timetable: [...], clashes: [...], unassigned: [...]}
         """
+        return self.solve(compile_assignments(assignments, available_slots))
+    
+    def solve(self, problem: Problem) -> Dict:
+        """Run the generator on a compiled problem (see app.services.problem)"""
+        started = perf_counter()
         timetable = []
         clashes = []
         unassigned = []
+        created_at = datetime.utcnow().isoformat()
+        
+        # Static constraints for every task x slot pair, computed up front
+        feasibility = build_feasibility(problem)
+        self.feasibility_stats = feasibility.stats
+        # Assignments without a room get the best-fitting free room
+        room_index = RoomIndex(problem) if problem.room_count else None
+        # Solver-chosen rooms (task -> entry) are repacked per slot afterwards
+        chosen = {}
+        pending = []
+        fixed_busy = defaultdict(list)
+        
+        slot_start = problem.slot_start
+        slot_end = problem.slot_end
+        task_lecturer = problem.task_lecturer
+        add_interval = self.clash_detector.add_interval
         
-        for assignment in assignments:
-            assigned = False
+        # Existing bookings hold their lecturer and room; the room pass
+        # below never moves a class into a booked room either
+        for kind, entity, start, end in problem.booked:
+            add_interval(entity, kind, start, end)
+            if kind == 'room':
+                fixed_busy[entity].append((start, end))
+        
+        for group in problem.groups():
+            # Sessions of a unit are placed together on different days
+            options = [
+                self._options(problem, feasibility, room_index, fixed_busy, task, len(group) > 1)
+                for task in group
+            ]
+            placed = self._search_group(problem, options)
             
-            for slot in available_slots:
-                # Check for clashes
-                lecturer_slot = {
-                    'day': slot['day'],
-                    'start_time': slot['start_time'],
-                    'end_time': slot['end_time']
-                }
+            for i, task in enumerate(group):
+                if i not in placed:
+                    if not feasibility.task_slot[task].any():
+                        reason = 'No slot matches availability or duration'
+                    elif not options[i]:
+                        reason = 'No available slot without clash'
+                    else:
+                        reason = "No free day left for this unit's session"
+                    unassigned.append(self._unassigned(problem, task, reason))
+                    continue
                 
-                if not self.clash_detector.has_clash(
-                    assignment['lecturer_id'], 'lecturer', lecturer_slot
-                ):
-                    # Assign this slot
-                    entry = {
-                        'assignment_id': assignment.get('_id'),
-                        'lecturer_id': assignment['lecturer_id'],
-                        'unit_id': assignment['unit_id'],
-                        'course_id': assignment['course_id'],
-                        'room_id': assignment['room_id'],
-                        'day': slot['day'],
-                        'start_time': slot['start_time'],
-                        'end_time': slot['end_time'],
-                        'status': 'active',
-                        'created_at': datetime.utcnow().isoformat()
-                    }
-                    timetable.append(entry)
-                    self.clash_detector.add_schedule(
-                        assignment['lecturer_id'], 'lecturer', lecturer_slot
-                    )
-                    assigned = True
-                    break
-            
-            if not assigned:
-                unassigned.append({
-                    'assignment_id': assignment.get('_id'),
-                    'lecturer_id': assignment['lecturer_id'],
-                    'reason': 'No available slot without clash'
-                })
+                slot, room, _ = placed[i]
+                start, end = slot_start[slot], slot_end[slot]
+                entry = self._entry(problem, task, slot, created_at, room, len(group))
+                timetable.append(entry)
+                add_interval(task_lecturer[task], 'lecturer', start, end)
+                if room < 0:
+                    # Time placed now; the room pass below tries to seat it
+                    chosen[task] = (slot, entry, -1)
+                    pending.append(task)
+                    continue
+                add_interval(room, 'room', start, end)
+                if room == problem.task_room[task]:
+                    fixed_busy[room].append((start, end))
+                else:
+                    chosen[task] = (slot, entry, room)
         
+        if chosen:
+            unseated = self._reassign_rooms(problem, room_index, chosen, fixed_busy)
+            dropped = {id(chosen[task][1]) for task in unseated}
+            timetable = [entry for entry in timetable if id(entry) not in dropped]
+            for task in unseated:
+                unassigned.append(self._unassigned(problem, task, 'No suitable room free at any available slot'))
+            self.room_stats['repacked_sessions'] = len(pending) - len(unseated)
+        
+        SOLVER_DURATION.observe(perf_counter() - started, 'timetable_generator')
         return {
             'timetable': timetable,
             'clashes': clashes,
             'unassigned': unassigned,
+            'stats': self.stats,
             'generated_at': datetime.utcnow().isoformat()
         }
     
+    def _options(self, problem: Problem, feasibility, room_index: Optional[RoomIndex], fixed_busy,
+                 task: int, all_days: bool) -> List[Tuple[int, int, int]]:
+        """
+        Candidate (slot, room, day) placements for a task given what is placed
+        so far: the earliest workable slot per day, rooms picked by best fit.
+        room -1 marks a slot that only the room pass could seat (pending);
+        those come after real candidates. Unless `all_days`, stops at the
+        first real candidate.
+        """
+        has_clash = self.clash_detector.has_interval_clash
+        lecturer = problem.task_lecturer[task]
+        fixed_room = problem.task_room[task]
+        assignment = problem.tasks[task]
+        real = {}
+        pending = {}
+        
+        for slot in feasibility.slots_for(task):
+            day = problem.slot_day[slot]
+            if day in real:
+                continue
+            self.candidate_slots_tried += 1
+            start, end = problem.slot_start[slot], problem.slot_end[slot]
+            if has_clash(lecturer, 'lecturer', start, end):
+                continue
+            room = fixed_room
+            if room >= 0:
+                if has_clash(room, 'room', start, end):
+                    continue
+            elif room_index is not None and len(room_index):
+                room = room_index.best_fit(
+                    problem.task_headcount[task], assignment.get('room_type'),
+                    assignment.get('department_id'),
+                    accept=lambda r: not has_clash(r, 'room', start, end)
+                )
+                if room is None:
+                    # Every suitable room is taken; moving solver-placed
+                    # classes might free one
+                    if day not in pending and self._repackable(feasibility, task, fixed_busy, start, end):
+                        pending[day] = (slot, -1, day)
+                    continue
+                room = int(room)
+            real[day] = (slot, room, day)
+            if not all_days:
+                break
+        
+        return list(real.values()) + [option for day, option in pending.items() if day not in real]
+    
+    def _search_group(self, problem: Problem, options: List[List[Tuple[int, int, int]]]) -> Dict:
+        """
+        Choose at most one option per session of a group, no two on the
+        same day, placing as many sessions as possible. Most constrained
+        session first; each choice removes its day from the others' domains
+        and branches that can no longer beat the best found are cut.
+        Returns {session index: option}.
+        """
+        n = len(options)
+        if n == 1:
+            return {0: options[0][0]} if options[0] else {}
+        
+        order = sorted(range(n), key=lambda i: len(options[i]))
+        best = {}
+        current = {}
+        steps = 0
+        
+        def reachable(k, used):
+            return sum(1 for i in order[k:] if any(o[2] not in used for o in options[i]))
+        
+        def search(k, used) -> bool:
+            nonlocal best, steps
+            if k == n:
+                if len(current) > len(best):
+                    best = dict(current)
+                return len(best) == n
+            if steps >= GROUP_SEARCH_LIMIT:
+                return True
+            i = order[k]
+            for option in options[i]:
+                if option[2] in used:
+                    continue
+                steps += 1
+                narrowed = used | {option[2]}
+                if len(current) + 1 + reachable(k + 1, narrowed) <= len(best):
+                    continue
+                current[i] = option
+                if search(k + 1, narrowed):
+                    return True
+                del current[i]
+                self.backtracks += 1
+            # Leave this session out if the rest can still improve on best
+            if len(current) + reachable(k + 1, used) > len(best):
+                return search(k + 1, used)
+            return False
+        
+        search(0, frozenset())
+        return best
+    
+    @staticmethod
+    def _unassigned(problem: Problem, task: int, reason: str) -> Dict:
+        assignment = problem.tasks[task]
+        return {
+            'assignment_id': _id_of(assignment),
+            'lecturer_id': assignment['lecturer_id'],
+            'session': problem.task_session[task] + 1,
+            'reason': reason
+        }
+    
+    @staticmethod
+    def _repackable(feasibility, task: int, fixed_busy, start: int, end: int) -> bool:
+        """Some suitable room is held only by rooms the solver chose (movable)"""
+        return any(
+            not any(start < b_end and b_start < end for b_start, b_end in fixed_busy.get(room, ()))
+            for room in feasibility.rooms_for(task)
+        )
+    
+    def _reassign_rooms(self, problem: Problem, room_index: RoomIndex, chosen: Dict, fixed_busy) -> List[int]:
+        """
+        Min-cost per-slot room matching over the solver-chosen rooms (see
+        app.services.room_matching). Updates the entries in place and returns
+        the tasks that are still without a room.
+        """
+        sessions = []
+        for task, (slot, entry, room) in chosen.items():
+            assignment = problem.tasks[task]
+            sessions.append(Session(
+                task, problem.slot_start[slot], problem.slot_end[slot],
+                headcount=problem.task_headcount[task],
+                room_type=assignment.get('room_type'),
+                department_id=assignment.get('department_id'),
+                lecturer=problem.task_lecturer[task],
+                cohort=problem.task_cohort[task] if problem.task_cohort[task] >= 0 else None,
+                room=room,
+            ))
+        locked = [(room, start, end) for room, intervals in fixed_busy.items() for start, end in intervals]
+        self.room_stats = RoomMatcher(problem, room_index).reassign(sessions, locked)
+        
+        unseated = []
+        for session in sessions:
+            entry = chosen[session.key][1]
+            if session.room < 0:
+                unseated.append(session.key)
+            elif session.changed:
+                entry.update(self._room_fields(problem.room_records[session.room]))
+        return unseated
+    
+    @staticmethod
+    def _room_fields(record) -> Dict:
+        return {
+            'room_id': record.id,
+            'room': record.name,
+            'room_code': record.code,
+            'room_house': record.house,
+        }
+    
+    @staticmethod
+    def _entry(problem: Problem, task: int, slot: int, created_at: str, room: int = -1,
+               sessions: int = 1) -> Dict:
+        """Timetable entry document for a task placed in a slot (and room)"""
+        assignment = problem.tasks[task]
+        record = problem.slots[slot]
+        entry = {
+            'assignment_id': _id_of(assignment),
+            'lecturer_id': assignment['lecturer_id'],
+            'unit_id': assignment['unit_id'],
+            'course_id': assignment['course_id'],
+            'room_id': assignment['room_id'],
+            'day': record.day,
+            'start_time': record.start_time,
+            'end_time': record.end_time,
+            'day_index': problem.slot_day[slot],
+            'week_start': problem.slot_start[slot],
+            'week_end': problem.slot_end[slot],
+            'session': problem.task_session[task] + 1,
+            'sessions_per_week': sessions,
+            'status': 'active',
+            'created_at': created_at
+        }
+        if room >= 0 and room != problem.task_room[task]:
+            entry.update(TimetableGenerator._room_fields(problem.room_records[room]))
+        return entry
+    
     def detect_clashes(self, timetable: List[Dict]) -> List[Dict]:
         """Detect all clashes in a timetable"""
         clashes = []
@@ -174,15 +416,11 @@ class TimetableGenerator:
     @staticmethod
     def _entries_overlap(entry1: Dict, entry2: Dict) -> bool:
         """Check if two timetable entries overlap"""
-        if entry1['day'] != entry2['day']:
+        a = interval_of(entry1)
+        b = interval_of(entry2)
+        if a is None or b is None:
             return False
-        
-        start1 = ClashDetector._time_to_minutes(entry1['start_time'])
-        end1 = ClashDetector._time_to_minutes(entry1['end_time'])
-        start2 = ClashDetector._time_to_minutes(entry2['start_time'])
-        end2 = ClashDetector._time_to_minutes(entry2['end_time'])
-        
-        return not (end1 <= start2 or end2 <= start1)
+        return a[0] < b[1] and b[0] < a[1]
 
 
 class ScheduleValidator:
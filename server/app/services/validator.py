@@ -1,11 +1,28 @@
+from collections import defaultdict
+
+from app.services.intervals import parse_label
+
+
 def validate(timetable):
-    seen = set()
     clashes = []
+    by_lecturer = defaultdict(list)
 
     for entry in timetable:
-        key = (entry["lecturer"], entry["timeslot"])
-        if key in seen:
-            clashes.append(entry)
-        seen.add(key)
+        if entry.get("week_start") is not None:
+            interval = (entry["week_start"], entry["week_end"])
+        else:
+            interval = parse_label(entry["timeslot"])
+        if interval is not None:
+            by_lecturer[entry["lecturer"]].append((interval, entry))
+
+    # Sweep each lecturer's entries in start order; an entry clashes when it
+    # starts before the latest end seen so far
+    for entries in by_lecturer.values():
+        entries.sort(key=lambda item: item[0])
+        latest_end = None
+        for (start, end), entry in entries:
+            if latest_end is not None and start < latest_end:
+                clashes.append(entry)
+            latest_end = end if latest_end is None else max(latest_end, end)
 
     return clashes
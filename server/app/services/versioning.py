@@ -0,0 +1,150 @@
+"""
+Version counters for timetable data, used for ETags and conditional GETs.
+
+Each counter is a document in `timetable_versions` ({_id: key, v: int}).
+Writes bump the counters of everything they touch; views build their ETag
+from the counters they depend on, so an `If-None-Match` request can be
+answered with 304 after a single indexed lookup.
+
+A student's counter also records the course keys of their enrollment
+(`courses`), so their view's versions come back from one lookup without
+reading the enrollment first.
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.database import db
+
+# Any timetable entry changed (student and admin views depend on it)
+TIMETABLE = "timetable"
+
+
+def semester_key(academic_year, semester) -> str:
+    return f"semester:{academic_year}:{semester}"
+
+
+def lecturer_key(lecturer_id) -> str:
+    return f"lecturer:{lecturer_id}"
+
+
+def course_key(course_id) -> str:
+    return f"course:{course_id}"
+
+
+def student_key(user_id) -> str:
+    return f"student:{user_id}"
+
+
+async def bump(*keys: str, enrollments: Optional[Dict[str, List[str]]] = None):
+    """
+    Increment the counters for `keys`, creating them as needed.
+
+    enrollments: {user_id: course_ids} for students whose enrollment changed;
+    their counters are bumped and record the new course keys.
+    """
+    enrollments = enrollments or {}
+    students = {student_key(u): courses for u, courses in enrollments.items()}
+    ops = [
+        UpdateOne({"_id": k}, {"$inc": {"v": 1}}, upsert=True)
+        for k in dict.fromkeys(keys) if k and k not in students
+    ]
+    ops += [
+        UpdateOne(
+            {"_id": k},
+            {"$inc": {"v": 1}, "$set": {"courses": sorted({course_key(c) for c in courses})}},
+            upsert=True,
+        )
+        for k, courses in students.items()
+    ]
+    if ops:
+        await db.timetable_versions.bulk_write(ops, ordered=False)
+
+
+async def current_versions(keys: Iterable[str]) -> Dict[str, int]:
+    # Always read from the primary: a stale version would serve stale 304s
+    keys = list(keys)
+    versions = {k: 0 for k in keys}
+    async for doc in db.timetable_versions.find({"_id": {"$in": keys}}):
+        versions[doc["_id"]] = doc.get("v", 0)
+    return versions
+
+
+async def student_versions(user_id) -> Optional[Tuple[List[str], Dict[str, int]]]:
+    """
+    Versions of a student's own counter and of their courses, in one lookup.
+
+    Returns (course_ids, versions), or None if the counter predates course
+    tracking; the caller then reads the enrollment and calls `track_student`.
+    """
+    key = student_key(user_id)
+    pipeline = [
+        {"$match": {"_id": key}},
+        {"$lookup": {"from": "timetable_versions", "localField": "courses",
+                     "foreignField": "_id", "as": "course_versions"}},
+    ]
+    docs = await db.timetable_versions.aggregate(pipeline).to_list(1)
+    if not docs or "courses" not in docs[0]:
+        return None
+    doc = docs[0]
+    versions = {key: doc.get("v", 0), **{k: 0 for k in doc["courses"]}}
+    for course in doc["course_versions"]:
+        versions[course["_id"]] = course.get("v", 0)
+    course_ids = [k.removeprefix("course:") for k in doc["courses"]]
+    return course_ids, versions
+
+
+async def track_student(user_id, course_ids: Iterable[str]):
+    """
+    Record course keys on a student counter created before they were tracked.
+
+    A no-op if an enrollment write has recorded them meanwhile, so a stale
+    enrollment read never overwrites newer keys.
+    """
+    try:
+        await db.timetable_versions.update_one(
+            {"_id": student_key(user_id), "courses": {"$exists": False}},
+            {"$set": {"courses": sorted({course_key(c) for c in course_ids})}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        pass
+
+
+def make_etag(scope: str, versions: Dict[str, int]) -> str:
+    raw = scope + "|" + "|".join(f"{k}={versions[k]}" for k in sorted(versions))
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def conditional(request: Request, response: Response, scope: str,
+                      keys: Iterable[str] = (), versions: Optional[Dict[str, int]] = None
+                      ) -> Tuple[Optional[Response], Dict[str, int]]:
+    """
+    Compute the ETag for a view depending on `keys` (or on `versions` the
+    caller already read).
+
+    Returns (304 response, versions) if the client already has this version;
+    otherwise sets the ETag on `response` and returns (None, versions) so the
+    handler continues. Key cached bodies on these versions, not on a second
+    read, so a body always matches the ETag it is served with.
+    """
+    if versions is None:
+        versions = await current_versions(keys)
+    etag = make_etag(scope, versions)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers), versions
+    response.headers.update(headers)
+    return None, versions
@@ -0,0 +1,157 @@
+"""
+In-memory database backend for route tests and benchmarks.
+
+Requires the optional `mongomock-motor` package (see requirements-dev.txt).
+"""
+
+from bson import ObjectId
+from datetime import datetime
+from passlib.hash import pbkdf2_sha256 as pwd_hasher
+
+from app.database import get_db, provider
+from app.services.intervals import interval_fields
+from app.services.response_cache import response_cache
+
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+SLOT_TIMES = [("07:00", "09:00"), ("09:00", "11:00"), ("11:00", "13:00"),
+              ("13:00", "15:00"), ("15:00", "17:00"), ("17:00", "19:00")]
+
+SEED_PASSWORD = "password123"
+
+
+def memory_database(name: str = "tms_test"):
+    """Create an empty Motor-compatible in-memory database"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError as e:
+        raise RuntimeError(
+            "The in-memory backend needs mongomock-motor: "
+            "pip install -r requirements-dev.txt"
+        ) from e
+    client = AsyncMongoMockClient()
+    return client, client[name]
+
+
+def use_memory_database(app=None, name: str = "tms_test"):
+    """
+    Point the application at a fresh in-memory database.
+
+    Installs it on the global provider (for scripts and background code) and,
+    if an app is given, as a `get_db` dependency override. Cached bodies are
+    dropped, since the new database's version counters start over.
+    """
+    client, database = memory_database(name)
+    response_cache.clear()
+    provider.use(database, client)
+    if app is not None:
+        app.dependency_overrides[get_db] = lambda: database
+    return database
+
+
+async def seed_database(db, courses: int = 2, units_per_course: int = 4,
+                        students_per_course: int = 20, semester: int = 1,
+                        academic_year: int = 2024):
+    """
+    Insert a small but complete dataset: one admin, a lecturer per course,
+    students, rooms, courses with units, assignments, time slots and a
+    confirmed timetable entry per course.
+
+    Returns the ids and emails callers need to build requests.
+    """
+    now = datetime.utcnow()
+    password = pwd_hasher.hash(SEED_PASSWORD)
+
+    college = await db.colleges.insert_one({"code": "COPAS", "name": "College of Pure and Applied Sciences", "created_at": now})
+    dept = await db.departments.insert_one({
+        "code": "CS", "name": "Computer Science",
+        "college_id": college.inserted_id, "building_location": "Block A", "created_at": now
+    })
+    dept_id = str(dept.inserted_id)
+
+    room_ids = []
+    for i, capacity in enumerate([30, 60, 120, 300]):
+        res = await db.rooms.insert_one({
+            "code": f"R{i + 1:03d}", "name": f"Room {i + 1}", "capacity": capacity,
+            "department_id": dept.inserted_id, "house": "Block A", "floor": i,
+            "room_type": "Lecture hall", "is_available": True, "created_at": now
+        })
+        room_ids.append(str(res.inserted_id))
+
+    admin = await db.users.insert_one({
+        "email": "admin@example.com", "password": password, "role": "admin",
+        "name": "Seed Admin", "created_at": now
+    })
+
+    for day in DAYS:
+        for start, end in SLOT_TIMES:
+            await db.timeslots.insert_one({
+                "day": day, "start_time": start, "end_time": end, "duration_hours": 2,
+                "semester": semester, "academic_year": academic_year, "created_at": now,
+                **interval_fields(day, start, end)
+            })
+
+    seeded = {"admin_id": str(admin.inserted_id), "admin_email": "admin@example.com",
+              "department_id": dept_id, "room_ids": room_ids,
+              "courses": [], "lecturers": [], "students": [], "assignments": []}
+
+    for c in range(courses):
+        lecturer = await db.users.insert_one({
+            "email": f"lecturer{c}@example.com", "password": password, "role": "lecturer",
+            "name": f"Lecturer {c}", "created_at": now
+        })
+        lecturer_id = str(lecturer.inserted_id)
+        seeded["lecturers"].append({"id": lecturer_id, "email": f"lecturer{c}@example.com"})
+
+        units = [{
+            "_id": ObjectId(), "code": f"C{c}U{u}", "name": f"Unit {u} of course {c}",
+            "year": 1, "semester": semester, "credits": 3, "total_hours": 45,
+            "lecturer_id": lecturer_id, "student_count": students_per_course, "created_at": now
+        } for u in range(units_per_course)]
+        course = await db.courses.insert_one({
+            "code": f"C{c:02d}", "name": f"Course {c}", "department_id": dept_id,
+            "college_id": str(college.inserted_id), "duration_years": 4,
+            "units": units, "students": [], "student_count": 0, "created_at": now
+        })
+        course_id = str(course.inserted_id)
+        seeded["courses"].append(course_id)
+
+        emails = []
+        for s in range(students_per_course):
+            email = f"student{c}.{s}@students.example.com"
+            student = await db.users.insert_one({
+                "email": email, "password": password, "role": "student",
+                "name": f"Student {c}.{s}", "created_at": now
+            })
+            await db.student_enrollments.insert_one({
+                "student": email, "student_id": str(student.inserted_id),
+                "course_id": course_id, "unit_ids": [str(u["_id"]) for u in units],
+                "created_at": now
+            })
+            emails.append(email)
+            seeded["students"].append(email)
+        await db.courses.update_one(
+            {"_id": course.inserted_id},
+            {"$set": {"students": emails, "student_count": len(emails)}}
+        )
+
+        for u, unit in enumerate(units):
+            res = await db.lecturer_assignments.insert_one({
+                "lecturer_id": lecturer_id, "unit_id": str(unit["_id"]),
+                "course_id": course_id, "department_id": dept_id,
+                "room_id": room_ids[u % len(room_ids)], "student_count": students_per_course,
+                "class_status": "pending", "created_at": now
+            })
+            seeded["assignments"].append(str(res.inserted_id))
+
+        start, end = SLOT_TIMES[c % len(SLOT_TIMES)]
+        await db.timetable_entries.insert_one({
+            "assignment_id": seeded["assignments"][-units_per_course],
+            "lecturer_id": lecturer_id, "course_id": course_id,
+            "unit_id": str(units[0]["_id"]), "room_id": room_ids[0],
+            "day": DAYS[c % len(DAYS)], "start_time": start, "end_time": end,
+            "status": "active", "semester": semester, "academic_year": academic_year,
+            "created_at": now, **interval_fields(DAYS[c % len(DAYS)], start, end)
+        })
+
+    return seeded
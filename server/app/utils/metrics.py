@@ -0,0 +1,263 @@
+"""
+Prometheus-style metrics kept in process memory.
+
+Series are created once per label set and then only mutated in place, so
+recording costs a dict lookup and a few integer/float updates. Updates are
+not locked: under the GIL a lost increment between threads is possible but
+rare, which is an acceptable trade-off for monitoring data.
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+
+from pymongo import monitoring
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+
+class Metric:
+    """A metric family: one series per tuple of label values"""
+
+    def __init__(self, name, help_text, kind, labels=(), buckets=None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind  # counter | gauge | histogram
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def _get(self, key):
+        series = self.series.get(key)
+        if series is None:
+            series = _Histogram(self.buckets) if self.kind == "histogram" else _Value()
+            series = self.series.setdefault(key, series)
+        return series
+
+    def observe(self, value, *labels):
+        self._get(labels).observe(value)
+
+    def inc(self, *labels, amount=1):
+        self._get(labels).value += amount
+
+    def dec(self, *labels, amount=1):
+        self._get(labels).value -= amount
+
+    def set(self, value, *labels):
+        self._get(labels).value = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in list(self.series.items()):
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, key))
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{{{label_str}}} {series.value}" if label_str
+                             else f"{self.name} {series.value}")
+                continue
+            prefix = label_str + "," if label_str else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series.count}')
+            suffix = f"{{{label_str}}}" if label_str else ""
+            lines.append(f"{self.name}_sum{suffix} {series.sum}")
+            lines.append(f"{self.name}_count{suffix} {series.count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = []
+
+
+def register(metric: Metric) -> Metric:
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format"""
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+HTTP_LATENCY = register(Metric(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    "histogram", ("method", "route", "status"), LATENCY_BUCKETS))
+HTTP_IN_FLIGHT = register(Metric(
+    "http_requests_in_flight", "HTTP requests currently being served", "gauge"))
+HTTP_RESPONSE_SIZE = register(Metric(
+    "http_response_size_bytes", "HTTP response body size by route",
+    "histogram", ("method", "route"), SIZE_BUCKETS))
+MONGO_LATENCY = register(Metric(
+    "mongo_command_duration_seconds", "MongoDB command latency",
+    "histogram", ("command", "collection"), LATENCY_BUCKETS))
+MONGO_FAILURES = register(Metric(
+    "mongo_command_failures_total", "Failed MongoDB commands", "counter", ("command", "collection")))
+MONGO_DOCUMENTS = register(Metric(
+    "mongo_documents_returned_total", "Documents returned by MongoDB per collection",
+    "counter", ("collection",)))
+SOLVER_DURATION = register(Metric(
+    "solver_run_duration_seconds", "Timetable solver run time",
+    "histogram", ("solver",), LATENCY_BUCKETS))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight count and body size per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        state = [500, 0]  # status, body bytes
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                state[1] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # FastAPI stores the matched route in the scope; use its template
+            # so path parameters do not explode the label cardinality.
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.observe(perf_counter() - start, method, path, state[0])
+            HTTP_RESPONSE_SIZE.observe(state[1], method, path)
+
+
+_CURSOR_COMMANDS = {"find", "aggregate", "getMore"}
+
+
+def _collection_of(command_name, command):
+    if command_name == "getMore":
+        return command.get("collection", "")
+    value = command.get(command_name)
+    return value if isinstance(value, str) else ""
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """PyMongo command listener feeding the Mongo metrics"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[event.request_id] = _collection_of(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name, collection)
+        if event.command_name in _CURSOR_COMMANDS:
+            cursor = event.reply.get("cursor") or {}
+            batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+            if batch:
+                MONGO_DOCUMENTS.inc(collection, amount=len(batch))
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name, collection)
+        MONGO_FAILURES.inc(event.command_name, collection)
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+POOL_CHECKED_OUT = register(Metric(
+    "mongo_pool_checked_out_connections", "Connections currently checked out of the pool",
+    "gauge", ("address",)))
+POOL_WAIT_QUEUE = register(Metric(
+    "mongo_pool_wait_queue_length", "Operations waiting to check out a connection",
+    "gauge", ("address",)))
+POOL_OPEN = register(Metric(
+    "mongo_pool_open_connections", "Open connections in the pool", "gauge", ("address",)))
+POOL_CHECKOUT_FAILURES = register(Metric(
+    "mongo_pool_checkout_failures_total", "Failed connection checkouts", "counter", ("address", "reason")))
+
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """PyMongo pool listener exposing checkout and wait-queue gauges"""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        address = _address(event)
+        POOL_CHECKED_OUT.set(0, address)
+        POOL_WAIT_QUEUE.set(0, address)
+        POOL_OPEN.set(0, address)
+
+    def connection_created(self, event):
+        POOL_OPEN.inc(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_OPEN.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        POOL_WAIT_QUEUE.inc(_address(event))
+
+    def connection_check_out_failed(self, event):
+        address = _address(event)
+        POOL_WAIT_QUEUE.dec(address)
+        POOL_CHECKOUT_FAILURES.inc(address, str(event.reason))
+
+    def connection_checked_out(self, event):
+        address = _address(event)
+        POOL_WAIT_QUEUE.dec(address)
+        POOL_CHECKED_OUT.inc(address)
+
+    def connection_checked_in(self, event):
+        POOL_CHECKED_OUT.dec(_address(event))
+
+
+pool_metrics = PoolMetrics()
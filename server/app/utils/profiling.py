@@ -0,0 +1,130 @@
+"""
+On-demand request profiling for admins.
+
+Send `X-Profile: 1` (or `?profile=1`) with an admin bearer token and the
+request runs under pyinstrument in async mode, so awaited Mongo calls and any
+solver work the handler does are attributed to the request. The profile is
+stored in the `request_profiles` collection (the newest MAX_STORED_PROFILES
+are kept), so any worker can serve it, and the response carries
+`X-Profile-Url` pointing at `GET /admin/profiles/{id}`, which returns a
+speedscope JSON profile. The last body chunk is held back until the profile
+is saved, so the URL works as soon as the response is complete.
+
+Off unless PROFILING_ENABLED is set. The admin check goes through
+get_token_payload, so revoked tokens cannot trigger profiling.
+
+Without pyinstrument installed, cProfile is used instead and the stored
+profile is a pstats text report. cProfile sees every coroutine on the event
+loop thread, so concurrent requests can show up in it.
+"""
+
+import cProfile
+import io
+import pstats
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import Request
+
+from app.config import settings
+from app.database import db
+from app.dependencies import get_token_payload
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # optional dependency
+    Profiler = None
+
+MAX_STORED_PROFILES = 20
+
+
+async def get_profile(profile_id: str) -> Optional[Tuple[str, str]]:
+    """(media type, body) of a stored profile, or None"""
+    doc = await db.request_profiles.find_one({"_id": profile_id})
+    return (doc["media_type"], doc["body"]) if doc else None
+
+
+async def save_profile(profile_id: str, media_type: str, body: str):
+    await db.request_profiles.insert_one({
+        "_id": profile_id, "media_type": media_type, "body": body, "created_at": datetime.utcnow()
+    })
+    old = await db.request_profiles.find({}, {"_id": 1}).sort("created_at", -1) \
+        .skip(MAX_STORED_PROFILES).to_list(None)
+    if old:
+        await db.request_profiles.delete_many({"_id": {"$in": [d["_id"] for d in old]}})
+
+
+def _wants_profile(scope) -> bool:
+    headers = dict(scope.get("headers") or [])
+    if headers.get(b"x-profile", b"").lower() in (b"1", b"true"):
+        return True
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get("profile", [""])[0].lower() in ("1", "true")
+
+
+async def _is_admin(scope) -> bool:
+    try:
+        payload = await get_token_payload(Request(scope))
+    except Exception:
+        return False
+    return payload.get("role") == "admin"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling opted-in admin requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not settings.PROFILING_ENABLED
+                or not _wants_profile(scope) or not await _is_admin(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex  # reserved now so headers can name it
+        url = f"/admin/profiles/{profile_id}"
+
+        held = []  # the final body message, sent once the profile is saved
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                headers.append((b"x-profile-url", url.encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                held.append(message)
+                return
+            await send(message)
+
+        if Profiler is not None:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.stop()
+                await self._finish(profile_id, "application/json",
+                                   profiler.output(SpeedscopeRenderer()), held, send)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+                await self._finish(profile_id, "text/plain", out.getvalue(), held, send)
+
+    @staticmethod
+    async def _finish(profile_id, media_type, body, held, send):
+        try:
+            await save_profile(profile_id, media_type, body)
+        finally:
+            for message in held:
+                await send(message)
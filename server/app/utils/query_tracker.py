@@ -0,0 +1,144 @@
+"""
+Per-request MongoDB query instrumentation.
+
+Counts the commands each request issues and groups them by query shape
+(command, collection and filter keys with values blanked out). Requests that
+issue too many commands, or repeat one shape too often (the N+1 pattern),
+are logged with the route and the offending shape. Commands slower than
+SLOW_QUERY_MS go to the slow query log regardless of request.
+
+Motor runs PyMongo on executor threads with a copy of the caller's context,
+so the listener sees the request's stats object through the context var.
+"""
+
+import json
+import logging
+from collections import Counter
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+from app.config import settings
+from app.utils.logger import logger
+
+slow_logger = logging.getLogger("timetable-system.slow_queries")
+
+# Keys holding the filter for each command we care about
+_FILTER_FIELDS = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query"}
+
+
+def _blank(value):
+    """Replace literal values with placeholders, keeping operators and keys"""
+    if isinstance(value, dict):
+        return {k: _blank(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_blank(value[0])] if value else []
+    return "?"
+
+
+def query_shape(command_name: str, command) -> str:
+    collection = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    if command_name in _FILTER_FIELDS:
+        body = _blank(command.get(_FILTER_FIELDS[command_name]) or {})
+    elif command_name in ("update", "delete"):
+        ops = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        body = _blank(ops[0].get("q") or {})
+    elif command_name == "aggregate":
+        body = [next(iter(stage), "") for stage in command.get("pipeline", [])]
+    else:
+        body = None
+    shape = f"{command_name} {collection}"
+    if body is not None:
+        shape += " " + json.dumps(body, sort_keys=True, default=str)
+    return shape
+
+
+class RequestQueryStats:
+    __slots__ = ("scope", "count", "shapes")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.shapes = Counter()
+
+    @property
+    def route(self):
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+_current: ContextVar = ContextVar("query_stats", default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+class QueryTracker(monitoring.CommandListener):
+    """Feeds per-request stats and the slow query log"""
+
+    def __init__(self):
+        self._shapes = {}
+
+    def started(self, event):
+        shape = query_shape(event.command_name, event.command)
+        self._shapes[event.request_id] = shape
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.shapes[shape] += 1
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        shape = self._shapes.pop(event.request_id, None)
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= settings.SLOW_QUERY_MS:
+            stats = _current.get()
+            slow_logger.warning(json.dumps({
+                "event": "slow_query",
+                "route": stats.route if stats else None,
+                "shape": shape,
+                "duration_ms": round(duration_ms, 2),
+            }))
+
+
+query_tracker = QueryTracker()
+
+
+def report(stats: RequestQueryStats, method: str):
+    """Log a structured warning if the request crossed a threshold"""
+    repeated = [(shape, n) for shape, n in stats.shapes.most_common(3)
+                if n >= settings.QUERY_REPEAT_THRESHOLD]
+    if not repeated and stats.count < settings.QUERY_WARN_COUNT:
+        return
+    logger.warning(json.dumps({
+        "event": "query_budget_exceeded",
+        "method": method,
+        "route": stats.route,
+        "commands": stats.count,
+        "repeated_shapes": [{"shape": shape, "count": n} for shape, n in repeated],
+    }))
+
+
+class QueryTrackingMiddleware:
+    """ASGI middleware opening a query stats scope around every request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestQueryStats(scope)
+        token = _current.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            report(stats, scope["method"])
@@ -0,0 +1,74 @@
+"""
+Route latency benchmark against the in-memory database.
+
+Usage (from the server/ directory):
+    python -m scripts.bench_routes --requests 200 --courses 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("DB_NAME", "tms_bench")
+
+import httpx
+
+from app.main import app
+from app.security import create_token
+from app.testing import use_memory_database, seed_database
+
+
+async def _time_route(client, method, url, headers, count, json=None):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.request(method, url, headers=headers, json=json)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text}")
+    timings.sort()
+    return {
+        "route": f"{method} {url.split('?')[0]}",
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+async def main(args):
+    db = use_memory_database(app)
+    seeded = await seed_database(db, courses=args.courses, students_per_course=args.students)
+
+    def bearer(role, email, user_id=""):
+        token = create_token({"user_id": user_id, "email": email, "role": role})
+        return {"Authorization": f"Bearer {token}"}
+
+    lecturer = seeded["lecturers"][0]
+    student_headers = bearer("student", seeded["students"][0])
+    lecturer_headers = bearer("lecturer", lecturer["email"], lecturer["id"])
+    admin_headers = bearer("admin", seeded["admin_email"], seeded["admin_id"])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = [
+            await _time_route(client, "GET", "/student/timetable", student_headers, args.requests),
+            await _time_route(client, "GET", f"/lecturer/available-slots/{seeded['assignments'][0]}",
+                              lecturer_headers, args.requests),
+            await _time_route(client, "POST", "/timetable/generate", admin_headers,
+                              max(1, args.requests // 10),
+                              json={"semester": 1, "academic_year": 2024}),
+        ]
+
+    for r in results:
+        print(f"{r['route']:<40} mean {r['mean_ms']:8.2f} ms  p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--courses", type=int, default=2)
+    parser.add_argument("--students", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,44 @@
+"""
+Bulk import courses, units, rooms or enrollments from a CSV or JSON Lines file.
+
+Usage (from the server/ directory):
+    python -m scripts.import_data courses courses.csv
+    python -m scripts.import_data enrollments enrollments.jsonl --format jsonl
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.database import provider
+from app.services import bulk_import
+
+READ_CHUNK = 1 << 16
+
+
+async def _file_chunks(path):
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, READ_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def main(args):
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    provider.start()
+    try:
+        rows = bulk_import.rows_for_format(fmt, bulk_import.lines_from_chunks(_file_chunks(args.path)))
+        report = await bulk_import.import_rows(args.kind, rows)
+    finally:
+        provider.close()
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=sorted(bulk_import.ROW_MODELS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+Backfill day_index/week_start/week_end on timeslots and timetable entries
+and create the indexes that serve overlap queries.
+
+The migration is resumable: progress is checkpointed per collection in the
+`migrations` collection after every batch, and only documents without
+week_start are rewritten, so an interrupted run picks up where it stopped.
+
+Usage (from the server/ directory):
+    python -m scripts.migrate_intervals
+    python -m scripts.migrate_intervals --batch-size 500 --restart
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from app.database import provider
+from app.services.intervals import ensure_indexes, interval_fields
+
+COLLECTIONS = ["timeslots", "timetable_entries"]
+
+
+async def migrate_collection(database, name, batch_size, restart):
+    checkpoint_id = f"intervals:{name}"
+    if restart:
+        await database.migrations.delete_one({"_id": checkpoint_id})
+    checkpoint = await database.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    updated = checkpoint.get("updated", 0)
+    skipped = checkpoint.get("skipped", 0)
+
+    while True:
+        query = {"week_start": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await database[name].find(
+            query, {"day": 1, "start_time": 1, "end_time": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(None)
+        if not batch:
+            break
+
+        ops = []
+        for doc in batch:
+            fields = interval_fields(doc.get("day"), doc.get("start_time"), doc.get("end_time"))
+            if fields:
+                ops.append(UpdateOne({"_id": doc["_id"], "week_start": {"$exists": False}}, {"$set": fields}))
+            else:
+                skipped += 1
+        if ops:
+            result = await database[name].bulk_write(ops, ordered=False)
+            updated += result.modified_count
+
+        last_id = batch[-1]["_id"]
+        await database.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "updated": updated, "skipped": skipped,
+                      "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        print(f"{name}: {updated} updated, {skipped} skipped (last _id {last_id})")
+
+    await database.migrations.update_one(
+        {"_id": checkpoint_id}, {"$set": {"completed_at": datetime.utcnow()}}, upsert=True
+    )
+    return {"collection": name, "updated": updated, "skipped": skipped}
+
+
+async def main(args):
+    database = provider.start()
+    try:
+        for name in COLLECTIONS:
+            summary = await migrate_collection(database, name, args.batch_size, args.restart)
+            print(f"{summary['collection']}: done, {summary['updated']} updated, "
+                  f"{summary['skipped']} without a parsable day/time")
+        await ensure_indexes(database)
+        print("Interval indexes ensured")
+    finally:
+        provider.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints")
+    asyncio.run(main(parser.parse_args()))
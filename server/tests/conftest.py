@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("DB_NAME", "tms_test")
+
+
+@pytest.fixture
+def anyio_backend():
+    # Motor and the in-memory backend only run on asyncio
+    return "asyncio"
+
+
+@pytest.fixture
+def app():
+    from app.main import app
+    yield app
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def memory_db(app):
+    """A fresh in-memory database wired into the app and the global provider"""
+    from app.testing import use_memory_database
+    return use_memory_database(app)
+
+
+@pytest.fixture
+def auth():
+    """Authorization headers for a role/email/user_id"""
+    from app.security import create_token
+
+    def headers(role, email, user_id=""):
+        token = create_token({"user_id": user_id, "email": email, "role": role})
+        return {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+@pytest.fixture
+def request_app(app):
+    """request_app(method, url, **kwargs) against the ASGI app"""
+    import httpx
+
+    async def send(method, url, **kwargs):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+    return send
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from app.services import bulk_import
+from app.testing import seed_database
+
+
+@pytest.mark.anyio
+async def test_enrollment_ids_rejects_units_of_other_courses(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=2, students_per_course=2)
+    first, second = await memory_db.courses.find({}).sort("code", 1).to_list(None)
+    other_unit = str(second["units"][0]["_id"])
+    student = seeded["students"][2]  # enrolled in the second course
+
+    body = "\n".join([
+        json.dumps({"student": student, "course_id": str(first["_id"]), "unit_ids": [other_unit]}),
+        json.dumps({"student": "nobody@example.com", "course_id": str(first["_id"])}),
+        json.dumps({"student": student, "course_id": "not-a-course"}),
+        "{not json",
+    ])
+    response = await request_app(
+        "POST", "/admin/enrollments/bulk", content=body,
+        headers={**auth("admin", seeded["admin_email"], seeded["admin_id"]),
+                 "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["kind"] == "enrollment_ids"
+    assert (report["rows"], report["failed"], report["upserted"]) == (4, 4, 0)
+    errors = {e["row"]: e["errors"] for e in report["errors"]}
+    assert errors[1] == [f"Units not in course: {other_unit}"]
+    assert errors[2] == ["Unknown student email"]
+    assert errors[3] == ["Unknown course"]
+
+    enrollment = await memory_db.student_enrollments.find_one({"student": student})
+    assert enrollment["course_id"] == str(second["_id"])
+
+
+def test_list_cells_are_split():
+    errors = []
+    rows = [
+        {"student_email": "a@example.com", "course_code": "C00", "unit_codes": "C0U0; C0U1;"},
+        {"student": "a@example.com", "course_id": "c1", "unit_ids": "u1;u2"},
+    ]
+    (_, by_code), = bulk_import.validate_batch("enrollments", rows[:1], 1, errors)
+    (_, by_id), = bulk_import.validate_batch("enrollment_ids", rows[1:], 1, errors)
+    assert not errors
+    assert by_code.unit_codes == ["C0U0", "C0U1"]
+    assert by_id.unit_ids == ["u1", "u2"]
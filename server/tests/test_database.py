@@ -0,0 +1,35 @@
+import pytest
+
+from app.config import settings
+from app.database import DatabaseProvider
+
+
+@pytest.mark.anyio
+async def test_client_uses_pool_settings(monkeypatch):
+    monkeypatch.setattr(settings, "MONGO_URI", "mongodb://localhost:27017")
+    monkeypatch.setattr(settings, "DB_NAME", "pool_test")
+    monkeypatch.setattr(settings, "MONGO_MAX_POOL_SIZE", 7)
+    monkeypatch.setattr(settings, "MONGO_MIN_POOL_SIZE", 2)
+    monkeypatch.setattr(settings, "MONGO_WAIT_QUEUE_TIMEOUT_MS", 1500)
+    monkeypatch.setattr(settings, "MONGO_APP_NAME", "pool-test")
+
+    provider = DatabaseProvider()
+    database = provider.start()
+    try:
+        assert database.name == "pool_test"
+        assert provider.start() is database  # one client per process
+        pool = provider.client.delegate.options.pool_options
+        assert (pool.max_pool_size, pool.min_pool_size) == (7, 2)
+        assert pool.wait_queue_timeout == 1.5
+        assert provider.client.delegate.options.pool_options.metadata["application"]["name"] == "pool-test"
+    finally:
+        provider.close()
+    assert provider.client is None
+
+
+def test_installed_backend_is_kept_by_start():
+    provider = DatabaseProvider()
+    backend = object()
+    provider.use(backend)
+    assert provider.start() is backend
+    assert provider.get() is backend
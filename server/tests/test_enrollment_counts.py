@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.services import enrollment
+from app.testing import seed_database
+
+
+async def _new_student(db, email):
+    result = await db.users.insert_one({"email": email, "role": "student", "name": "New"})
+    return str(result.inserted_id)
+
+
+@pytest.mark.anyio
+async def test_enroll_and_withdraw_move_course_counters(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1, students_per_course=2)
+    course_id = seeded["courses"][0]
+    email = "fresh@students.example.com"
+    student = auth("student", email, await _new_student(memory_db, email))
+
+    response = await request_app("POST", f"/student/enroll/{course_id}", headers=student,
+                                 json={"unit_ids": []})
+    assert response.status_code == 200, response.text
+    assert response.json()["student_count"] == 3
+    course = await memory_db.courses.find_one({"_id": ObjectId(course_id)})
+    assert email in course["students"]
+
+    # Enrolling again in the same course is not counted twice
+    await request_app("POST", f"/student/enroll/{course_id}", headers=student, json={"unit_ids": []})
+    course = await memory_db.courses.find_one({"_id": ObjectId(course_id)})
+    assert course["student_count"] == 3
+
+    response = await request_app("DELETE", f"/student/enroll/{course_id}", headers=student)
+    assert response.status_code == 200
+    course = await memory_db.courses.find_one({"_id": ObjectId(course_id)})
+    assert course["student_count"] == 2
+    assert email not in course["students"]
+
+
+def test_counter_update_targets_changed_units_only():
+    course_id = str(ObjectId())
+    added, removed = str(ObjectId()), str(ObjectId())
+    op = enrollment._counter_update(course_id, 0, "a@example.com", [added], [removed])
+    assert op._doc == {"$inc": {"units.$[added].student_count": 1,
+                                "units.$[removed].student_count": -1}}
+    assert op._array_filters == [{"added._id": {"$in": [ObjectId(added)]}},
+                                 {"removed._id": {"$in": [ObjectId(removed)]}}]
+    assert enrollment._counter_update(course_id, 0, "a@example.com", (), ()) is None
+    assert enrollment._counter_update("not-an-id", 1, "a@example.com", (), ()) is None
+
+
+@pytest.mark.anyio
+async def test_reconcile_reports_and_fixes_course_drift(memory_db):
+    seeded = await seed_database(memory_db, courses=2, students_per_course=3)
+    drifted = ObjectId(seeded["courses"][0])
+    await memory_db.courses.update_one({"_id": drifted}, {"$set": {"student_count": 7}})
+
+    report = await enrollment.reconcile_counts()
+    assert (report["courses_checked"], report["courses_drifted"], report["courses_fixed"]) == (2, 1, 1)
+    assert report["drift"] == [{"course_id": str(drifted),
+                                "student_count": {"stored": 7, "actual": 3}, "units": []}]
+    course = await memory_db.courses.find_one({"_id": drifted})
+    assert course["student_count"] == 3
+
+    assert (await enrollment.reconcile_counts([str(drifted)]))["courses_drifted"] == 0
+
+
+@pytest.mark.anyio
+async def test_only_one_worker_holds_the_reconcile_lease(memory_db):
+    assert await enrollment.acquire_lease("job", "worker-a", 60)
+    assert not await enrollment.acquire_lease("job", "worker-b", 60)
+    # The holder renews its own lease
+    assert await enrollment.acquire_lease("job", "worker-a", 0)
+    # An expired lease is taken over
+    assert await enrollment.acquire_lease("job", "worker-b", 60)
+    assert not await enrollment.acquire_lease("job", "worker-a", 60)
+
+
+@pytest.mark.anyio
+async def test_reconcile_loop_skips_while_another_worker_holds_the_lease(memory_db, monkeypatch):
+    runs = []
+
+    async def reconcile():
+        runs.append(1)
+        return {"courses_drifted": 0}
+    monkeypatch.setattr(enrollment, "reconcile_counts", reconcile)
+
+    await enrollment.acquire_lease(enrollment.RECONCILE_LEASE, "other-worker", 60)
+    loop = asyncio.create_task(enrollment.reconcile_forever(0.01))
+    await asyncio.sleep(0.05)
+    assert runs == []
+
+    await memory_db.leases.delete_many({})
+    await asyncio.sleep(0.05)
+    loop.cancel()
+    assert runs
+    lease = await memory_db.leases.find_one({"_id": enrollment.RECONCILE_LEASE})
+    assert lease["holder"] == enrollment.WORKER_ID
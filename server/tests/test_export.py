@@ -0,0 +1,83 @@
+import csv
+import io
+import os
+import zipfile
+
+import pytest
+
+from app.services import export
+from app.services.export import EXPORT_COLUMNS, stream_csv, write_xlsx
+from app.testing import seed_database
+
+
+def _entry(n, **fields):
+    return {"day": "Monday", "start_time": "07:00", "end_time": "09:00",
+            "unit_code": f"U{n:03d}", "room": "Room 1", "semester": 1,
+            "academic_year": 2024, "lecturer_id": "l1", **fields}
+
+
+async def _csv_rows(cursor):
+    body = b"".join([chunk async for chunk in stream_csv(cursor)])
+    return list(csv.reader(io.StringIO(body.decode())))
+
+
+@pytest.mark.anyio
+async def test_stream_csv_writes_header_and_every_entry_across_batches(memory_db, monkeypatch):
+    monkeypatch.setattr(export, "BATCH_SIZE", 2)
+    await memory_db.timetable_entries.insert_many([_entry(n) for n in range(5)])
+
+    rows = await _csv_rows(memory_db.timetable_entries.find({}))
+    assert rows[0] == EXPORT_COLUMNS
+    units = [row[EXPORT_COLUMNS.index("unit_code")] for row in rows[1:]]
+    assert sorted(units) == [f"U{n:03d}" for n in range(5)]
+    # Missing fields are written as empty cells, not "None"
+    assert rows[1][EXPORT_COLUMNS.index("course_name")] == ""
+
+
+@pytest.mark.anyio
+async def test_write_xlsx_writes_a_workbook(memory_db):
+    await memory_db.timetable_entries.insert_many([_entry(n) for n in range(3)])
+
+    path = await write_xlsx(memory_db.timetable_entries.find({}))
+    try:
+        with zipfile.ZipFile(path) as workbook:
+            sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+        assert all(f"U{n:03d}" in sheet for n in range(3))
+        assert "unit_code" in sheet
+    finally:
+        os.remove(path)
+
+
+@pytest.mark.anyio
+async def test_export_routes_apply_filters(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+    await memory_db.timetable_entries.delete_many({})
+    await memory_db.timetable_entries.insert_many([
+        _entry(1, day="Monday"), _entry(2, day="Tuesday"), _entry(3, day="Tuesday", room_code="R009"),
+    ])
+
+    response = await request_app("GET", "/admin/export/timetable.csv", headers=admin,
+                                 params={"day": "Tuesday"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert [row[EXPORT_COLUMNS.index("unit_code")] for row in rows[1:]] == ["U002", "U003"]
+
+    response = await request_app("GET", "/admin/export/timetable.csv", headers=admin,
+                                 params={"room": "R009"})
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert [row[EXPORT_COLUMNS.index("unit_code")] for row in rows[1:]] == ["U003"]
+
+    response = await request_app("GET", "/admin/export/timetable.xlsx", headers=admin)
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as workbook:
+        assert "xl/worksheets/sheet1.xml" in workbook.namelist()
+
+
+@pytest.mark.anyio
+async def test_exports_are_admin_only(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1)
+    student = auth("student", seeded["students"][0])
+    response = await request_app("GET", "/admin/export/timetable.csv", headers=student)
+    assert response.status_code in (401, 403)
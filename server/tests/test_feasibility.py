@@ -0,0 +1,36 @@
+from app.services.feasibility import build_feasibility
+from app.services.intervals import period_mask, week_interval
+from app.services.problem import compile_assignments
+
+SLOTS = [
+    {"day": "Monday", "start_time": "07:00", "end_time": "09:00"},
+    {"day": "Monday", "start_time": "09:00", "end_time": "11:00"},
+    {"day": "Tuesday", "start_time": "09:00", "end_time": "11:00"},
+]
+ROOMS = [
+    {"_id": "small", "capacity": 20, "room_type": "Lecture hall", "is_available": True},
+    {"_id": "big", "capacity": 100, "room_type": "Lecture hall", "is_available": True},
+    {"_id": "closed", "capacity": 100, "room_type": "Lecture hall", "is_available": False},
+]
+
+
+def _mask(day, start, end):
+    return period_mask(*week_interval(day, start, end))
+
+
+def test_unavailable_periods_and_preferences():
+    assignments = [{"lecturer_id": "l1", "unit_id": "u1", "course_id": "c1", "student_count": 50}]
+    masks = {"l1": (_mask("Monday", "08:00", "09:00"), _mask("Tuesday", "09:00", "11:00"))}
+    problem = compile_assignments(assignments, SLOTS, ROOMS, masks=masks)
+    feasibility = build_feasibility(problem)
+
+    # Monday 07-09 touches an unavailable period; Tuesday is preferred
+    assert feasibility.slots_for(0) == [2, 1]
+    assert [problem.room_records[r].id for r in feasibility.rooms_for(0)] == ["big"]
+    assert feasibility.stats["preferred_task_slots"] == 1
+
+
+def test_day_availability():
+    assignments = [{"lecturer_id": "l1", "unit_id": "u1", "student_count": 10}]
+    problem = compile_assignments(assignments, SLOTS, ROOMS, availability={"l1": ["Tuesday"]})
+    assert build_feasibility(problem).slots_for(0) == [2]
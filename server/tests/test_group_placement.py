@@ -0,0 +1,64 @@
+from app.services.problem import compile_assignments
+from app.services.timetable_optimizer import TimetableGenerator
+
+ROOMS = [{"_id": "r1", "name": "Room 1", "capacity": 100}, {"_id": "r2", "name": "Room 2", "capacity": 100}]
+
+
+def _slot(day, start, end):
+    return {"day": day, "start_time": start, "end_time": end}
+
+
+def _assignment(key, lecturer="L1", **fields):
+    return {"_id": key, "lecturer_id": lecturer, "unit_id": f"u{key}", "course_id": "c1",
+            "room_id": "", "student_count": 20, **fields}
+
+
+def _solve(assignments, slots, **kwargs):
+    problem = compile_assignments(assignments, slots, ROOMS, weeks=15, **kwargs)
+    return TimetableGenerator().solve(problem)
+
+
+def test_weekly_sessions_land_on_different_days():
+    # 60 hours over 15 weeks: two 2-hour sessions
+    slots = [_slot("Monday", "07:00", "09:00"), _slot("Monday", "09:00", "11:00"),
+             _slot("Tuesday", "07:00", "09:00")]
+    result = _solve([_assignment("A", total_hours=60)], slots)
+
+    entries = result["timetable"]
+    assert sorted(e["session"] for e in entries) == [1, 2]
+    assert {e["day"] for e in entries} == {"Monday", "Tuesday"}
+    assert all(e["sessions_per_week"] == 2 for e in entries)
+    assert not result["unassigned"]
+
+
+def test_most_constrained_session_gets_its_only_day():
+    # 45 hours over 15 weeks: a 2-hour and a 1-hour session. The 1-hour
+    # session only fits Monday, so the 2-hour one must move to Tuesday.
+    slots = [_slot("Monday", "07:00", "09:00"), _slot("Monday", "09:00", "10:00"),
+             _slot("Tuesday", "07:00", "09:00")]
+    result = _solve([_assignment("A", total_hours=45)], slots)
+
+    days = {e["end_time"]: e["day"] for e in result["timetable"]}
+    assert days == {"10:00": "Monday", "09:00": "Tuesday"}
+
+
+def test_sessions_without_a_free_day_are_unassigned():
+    slots = [_slot("Monday", "07:00", "09:00"), _slot("Monday", "09:00", "11:00")]
+    result = _solve([_assignment("A", total_hours=60)], slots)
+
+    assert len(result["timetable"]) == 1
+    assert result["unassigned"] == [{"assignment_id": "A", "lecturer_id": "L1", "session": 2,
+                                     "reason": "No free day left for this unit's session"}]
+
+
+def test_unavailable_lecturer_and_busy_slots_are_reported():
+    slots = [_slot("Monday", "07:00", "09:00")]
+    result = _solve(
+        [_assignment("A", total_hours=30), _assignment("B", lecturer="L2", total_hours=30),
+         _assignment("C", total_hours=30)],
+        slots, availability={"L2": ["Friday"]})
+
+    reasons = {u["assignment_id"]: u["reason"] for u in result["unassigned"]}
+    assert [e["assignment_id"] for e in result["timetable"]] == ["A"]
+    assert reasons == {"B": "No slot matches availability or duration",
+                       "C": "No available slot without clash"}
@@ -0,0 +1,48 @@
+import pytest
+
+from app.config import settings
+from app.services.ical import build_calendar
+
+ENTRY = {"id": "e1", "day": "Tuesday", "start_time": "09:00", "end_time": "11:00", "unit_code": "CS101"}
+
+
+@pytest.fixture
+def calendar_settings(monkeypatch):
+    def configure(start="2025-02-03", zone=""):
+        monkeypatch.setattr(settings, "SEMESTER_START", start)
+        monkeypatch.setattr(settings, "CALENDAR_TIMEZONE", zone)
+        monkeypatch.setattr(settings, "SEMESTER_WEEKS", 15)
+    return configure
+
+
+def _lines():
+    return build_calendar("Test", [ENTRY]).decode().split("\r\n")
+
+
+def test_semester_start_is_required(calendar_settings):
+    calendar_settings(start="")
+    with pytest.raises(ValueError):
+        build_calendar("Test", [ENTRY])
+
+
+def test_floating_times_without_timezone(calendar_settings):
+    calendar_settings()
+    lines = _lines()
+    assert "DTSTART:20250204T090000" in lines
+    assert not any(line.startswith("BEGIN:VTIMEZONE") for line in lines)
+
+
+def test_timezone_is_defined_with_its_transitions(calendar_settings):
+    calendar_settings(zone="Europe/London")
+    lines = _lines()
+    assert "DTSTART;TZID=Europe/London:20250204T090000" in lines
+    zone = lines[lines.index("BEGIN:VTIMEZONE"):lines.index("END:VTIMEZONE") + 1]
+    assert "TZID:Europe/London" in zone
+    daylight = zone[zone.index("BEGIN:DAYLIGHT"):zone.index("END:DAYLIGHT")]
+    assert daylight[1:4] == ["DTSTART:20250330T010000", "TZOFFSETFROM:+0000", "TZOFFSETTO:+0100"]
+
+
+def test_unknown_timezone_is_rejected(calendar_settings):
+    calendar_settings(zone="Mars/Olympus")
+    with pytest.raises(ValueError):
+        build_calendar("Test", [ENTRY])
@@ -0,0 +1,125 @@
+import pytest
+
+from app.services import bulk_import
+from app.testing import seed_database
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def _collect(rows):
+    return [row async for row in rows]
+
+
+@pytest.mark.anyio
+async def test_lines_survive_chunk_boundaries():
+    lines = bulk_import.lines_from_chunks(_chunks(b"\xef\xbb\xbfcode,na", b"me\r\nC1,", b"One\nC2,Two"))
+    assert await _collect(lines) == ["code,name", "C1,One", "C2,Two"]
+
+
+@pytest.mark.anyio
+async def test_csv_rows_keep_quoted_newlines_and_skip_blank_lines():
+    lines = _chunks("code,name,color", "", 'C1,"Line one', 'line two",', "C2,Two,red")
+    assert await _collect(bulk_import.csv_rows(lines)) == [
+        {"code": "C1", "name": "Line one\nline two"},
+        {"code": "C2", "name": "Two", "color": "red"},
+    ]
+
+
+@pytest.mark.anyio
+async def test_jsonl_rows_pass_parse_errors_through():
+    rows = await _collect(bulk_import.jsonl_rows(_chunks('{"code": "C1"}', "  ", "{oops")))
+    assert rows[0] == {"code": "C1"}
+    assert "__parse_error__" in rows[1]
+    assert len(rows) == 2
+
+
+def test_validate_batch_reports_bad_rows_and_keeps_good_ones():
+    errors = []
+    rows = [
+        {"code": "R1", "name": "Room", "capacity": 30, "department_code": "CS"},
+        {"code": "R2", "name": "Room", "capacity": "many", "department_code": "CS"},
+        {"__parse_error__": "Expecting value"},
+    ]
+    valid = bulk_import.validate_batch("rooms", rows, 11, errors)
+    assert [(pos, row.code) for pos, row in valid] == [(0, "R1")]
+    assert [e["row"] for e in errors] == [12, 13]
+    assert errors[0]["errors"][0].startswith("capacity:")
+
+
+@pytest.mark.anyio
+async def test_import_courses_units_and_rooms_by_code(memory_db, auth, request_app, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BATCH_SIZE", 2)
+    seeded = await seed_database(memory_db, courses=1)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+
+    courses = "code,name,department_code,college_code\nBSC,Science,CS,COPAS\nBAD,Bad,XX,COPAS\nBSC,Renamed,CS,COPAS\n"
+    response = await request_app("POST", "/admin/import/courses", content=courses,
+                                 headers={**admin, "Content-Type": "text/csv"})
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["rows"], report["upserted"], report["failed"]) == (3, 1, 1)
+    assert report["errors"] == [{"row": 2, "errors": ["Unknown department code"]}]
+    course = await memory_db.courses.find_one({"code": "BSC"})
+    assert course["name"] == "Renamed"
+    assert course["department_id"] == seeded["department_id"]
+
+    units = "\n".join([
+        '{"course_code": "BSC", "code": "S101", "name": "Intro", "year": 1, "semester": 1}',
+        '{"course_code": "BSC", "code": "S102", "name": "Next", "year": 1, "semester": 2}',
+        '{"course_code": "BSC", "code": "S101", "name": "Again", "year": 1, "semester": 1}',
+        '{"course_code": "NOPE", "code": "X1", "name": "Lost", "year": 1, "semester": 1}',
+    ])
+    response = await request_app("POST", "/admin/import/units", content=units,
+                                 headers={**admin, "Content-Type": "application/x-ndjson"})
+    report = response.json()
+    assert report["failed"] == 2
+    assert {e["row"]: e["errors"] for e in report["errors"]} == {
+        3: ["Unit S101 already exists in course BSC"], 4: ["Unknown course code"],
+    }
+    course = await memory_db.courses.find_one({"code": "BSC"})
+    assert [u["code"] for u in course["units"]] == ["S101", "S102"]
+
+    rooms = "code,name,capacity,department_code,is_available\nLAB9,Lab 9,40,CS,false\n"
+    response = await request_app("POST", "/admin/import/rooms", params={"format": "csv"},
+                                 content=rooms, headers=admin)
+    assert response.json()["upserted"] == 1
+    room = await memory_db.rooms.find_one({"code": "LAB9"})
+    assert (room["capacity"], room["is_available"]) == (40, False)
+
+
+@pytest.mark.anyio
+async def test_import_rejects_unknown_kinds_and_formats(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+    response = await request_app("POST", "/admin/import/lecturers", content="", headers=admin)
+    assert response.status_code == 404
+    response = await request_app("POST", "/admin/import/rooms", params={"format": "xml"},
+                                 content="", headers=admin)
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_import_enrollments_by_code(memory_db, auth, request_app, monkeypatch):
+    seeded = await seed_database(memory_db, courses=2, students_per_course=2)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+    student = seeded["students"][0]
+    # The in-memory backend has no array filters, which the counter fix-up uses
+    reconciled = []
+
+    async def record(course_ids):
+        reconciled.extend(course_ids)
+    monkeypatch.setattr(bulk_import.enrollment, "reconcile_counts", record)
+
+    body = f"student_email,course_code,unit_codes\n{student},C01,C1U0;C1U1\n{student},C01,C0U0\n"
+    response = await request_app("POST", "/admin/import/enrollments", content=body,
+                                 headers={**admin, "Content-Type": "text/csv"})
+    report = response.json()
+    assert report["errors"] == [{"row": 2, "errors": ["Units not in course: C0U0"]}]
+    enrollment = await memory_db.student_enrollments.find_one({"student": student})
+    assert enrollment["course_id"] == seeded["courses"][1]
+    assert len(enrollment["unit_ids"]) == 2
+    # Both the previous and the new course get their counters fixed
+    assert sorted(reconciled) == sorted(seeded["courses"])
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services.intervals import (
+    FULL_MASK, interval_fields, mask_intervals, overlap_query, overlaps, period_mask,
+    slot_conflict_query, week_interval,
+)
+from app.services.availability import periods_to_mask
+
+
+def test_week_interval():
+    assert week_interval("Tuesday", "09:00", "11:30") == (1440 + 540, 1440 + 690)
+    assert week_interval("Funday", "09:00", "11:00") is None
+    assert week_interval("Monday", "9am", "11:00") is None
+
+
+def test_overlaps_is_half_open():
+    assert overlaps((0, 120), (60, 180))
+    assert not overlaps((0, 120), (120, 180))
+
+
+@pytest.mark.anyio
+async def test_overlap_queries(memory_db):
+    await memory_db.entries.insert_many([
+        {"name": "mon-9", "room_id": "r1", **interval_fields("Monday", "09:00", "11:00")},
+        {"name": "mon-11", "room_id": "r1", **interval_fields("Monday", "11:00", "13:00")},
+        {"name": "mon-10-r2", "room_id": "r2", **interval_fields("Monday", "10:00", "12:00")},
+        {"name": "legacy", "room_id": "r1", "day": "Monday", "start_time": "10:00", "end_time": "12:00"},
+    ])
+
+    async def names(query):
+        return sorted([d["name"] async for d in memory_db.entries.find(query)])
+
+    ws, we = week_interval("Monday", "10:00", "12:00")
+    assert await names(overlap_query(ws, we)) == ["mon-10-r2", "mon-11", "mon-9"]
+    assert await names(slot_conflict_query("Monday", "10:00", "12:00", room_id="r1")) == \
+        ["legacy", "mon-11", "mon-9"]
+
+
+def test_period_mask_round_trip():
+    mask = period_mask(*week_interval("Wednesday", "08:00", "10:00"))
+    assert bin(mask).count("1") == 2
+    assert mask_intervals(mask) == [{"day": "Wednesday", "start_time": "08:00", "end_time": "10:00"}]
+    # Partly covered periods count; time off the grid has no bits
+    assert period_mask(*week_interval("Monday", "07:30", "08:10")) == 0b11
+    assert period_mask(*week_interval("Saturday", "09:00", "11:00")) == 0
+    assert mask_intervals(FULL_MASK)[0] == {"day": "Monday", "start_time": "07:00", "end_time": "19:00"}
+
+
+def test_periods_to_mask():
+    mask = periods_to_mask([
+        {"day": "Monday", "start_time": "07:00", "end_time": "09:00"},
+        {"day": "Friday", "start_time": "17:00", "end_time": "19:00"},
+    ])
+    assert len(mask_intervals(mask)) == 2
+    for day, start, end in [("Saturday", "09:00", "11:00"), ("Monday", "19:00", "21:00")]:
+        with pytest.raises(ValueError):
+            periods_to_mask([{"day": day, "start_time": start, "end_time": end}])
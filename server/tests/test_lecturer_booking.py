@@ -0,0 +1,32 @@
+import pytest
+
+from app.services.timetable_optimizer import ClashDetector
+from app.testing import seed_database
+
+
+@pytest.mark.anyio
+async def test_booking_rejects_any_overlapping_entry(memory_db, auth, request_app):
+    # Course 1's seeded class: Tuesday 09:00-11:00, another lecturer and room
+    seeded = await seed_database(memory_db, courses=2)
+    lecturer = seeded["lecturers"][0]
+    headers = auth("lecturer", lecturer["email"], lecturer["id"])
+
+    async def select(assignment, start, end):
+        return await request_app("POST", "/lecturer/select-time-slot", headers=headers, json={
+            "assignment_id": seeded["assignments"][assignment],
+            "day": "Tuesday", "start_time": start, "end_time": end,
+        })
+
+    assert (await select(1, "10:00", "12:00")).status_code == 409  # partial overlap
+    assert (await select(1, "09:00", "11:00")).status_code == 409  # same slot
+    assert (await select(1, "11:00", "13:00")).status_code == 200  # back to back
+    assert (await select(2, "12:00", "14:00")).status_code == 409  # overlaps the new booking
+    assert (await select(2, "13:00", "15:00")).status_code == 200
+
+
+def test_clash_detector_ignores_unparsable_slots():
+    detector = ClashDetector()
+    detector.add_schedule("l1", "lecturer", {"day": "Someday", "start_time": "09:00", "end_time": "11:00"})
+    assert detector.lecturer_schedule["l1"] == []
+    assert detector.has_clash("l1", "lecturer", {"day": "Monday", "start_time": "bad", "end_time": "11:00"})
+    assert not detector.has_clash("l1", "lecturer", {"day": "Monday", "start_time": "09:00", "end_time": "11:00"})
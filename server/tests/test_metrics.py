@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.metrics import MONGO_DOCUMENTS, MONGO_FAILURES, Metric, mongo_command_metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    metric = Metric("demo_seconds", "Demo", "histogram", ("route",), (0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        metric.observe(value, "/x")
+    lines = metric.render().splitlines()
+    assert 'demo_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/x",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{route="/x"} 4' in lines
+
+
+def test_label_values_are_escaped():
+    metric = Metric("demo_total", "Demo", "counter", ("path",))
+    metric.inc('a"b')
+    assert 'demo_total{path="a\\"b"} 1' in metric.render()
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_labels_routes_by_template(request_app):
+    await request_app("GET", "/calendar/student/abc/def.ics")
+    body = (await request_app("GET", "/metrics")).text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'route="/calendar/{kind}/{user_id}/{token}.ics"' in body
+    assert "/calendar/student/abc" not in body
+
+
+def test_mongo_listener_counts_documents_and_failures():
+    def event(request_id, command, reply=None):
+        return SimpleNamespace(request_id=request_id, command_name=next(iter(command)), command=command,
+                               reply=reply or {}, duration_micros=1500)
+
+    before = MONGO_DOCUMENTS._get(("metrics_test",)).value
+    mongo_command_metrics.started(event(1, {"find": "metrics_test"}))
+    mongo_command_metrics.succeeded(event(1, {"find": "metrics_test"},
+                                          {"cursor": {"firstBatch": [{}, {}, {}]}}))
+    assert MONGO_DOCUMENTS._get(("metrics_test",)).value == before + 3
+
+    mongo_command_metrics.started(event(2, {"insert": "metrics_test"}))
+    mongo_command_metrics.failed(event(2, {"insert": "metrics_test"}))
+    assert MONGO_FAILURES._get(("insert", "metrics_test")).value >= 1
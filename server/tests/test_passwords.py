@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import pbkdf2_sha256
+
+from app.services import passwords as password_module
+from app.services.passwords import PasswordService
+from app.testing import SEED_PASSWORD, seed_database
+
+
+@pytest.mark.anyio
+async def test_hash_verify_and_rehash():
+    service = PasswordService(rounds=1000, workers=2, max_queue=4)
+    hashed = await service.hash("secret")
+    assert await service.verify("secret", hashed)
+    assert not await service.verify("wrong", hashed)
+    assert not await service.verify("secret", "")
+
+    stale = pbkdf2_sha256.using(rounds=2000).hash("secret")
+    valid, new_hash = await service.verify_and_update("secret", stale)
+    assert valid and pbkdf2_sha256.from_string(new_hash).rounds == 1000
+    assert await service.verify_and_update("secret", hashed) == (True, None)
+
+
+@pytest.mark.anyio
+async def test_full_queue_is_rejected_with_503():
+    service = PasswordService(rounds=1000, workers=1, max_queue=1)
+    release = threading.Event()
+    running = asyncio.ensure_future(service._run("hash", release.wait))  # holds the only worker
+    await asyncio.sleep(0.01)
+    waiting = asyncio.ensure_future(service._run("hash", lambda: True))  # fills the queue
+    await asyncio.sleep(0.01)
+    try:
+        with pytest.raises(HTTPException) as rejected:
+            await service.hash("secret")
+        assert rejected.value.status_code == 503
+    finally:
+        release.set()
+        await asyncio.gather(running, waiting)
+
+
+@pytest.mark.anyio
+async def test_login_upgrades_stale_hashes(memory_db, request_app, monkeypatch):
+    seeded = await seed_database(memory_db, courses=1)
+    monkeypatch.setattr(password_module.passwords, "rounds", 1000)
+    monkeypatch.setattr(password_module.passwords, "_hasher", pbkdf2_sha256.using(rounds=1000))
+
+    response = await request_app("POST", "/auth/login", json={
+        "email": seeded["admin_email"], "password": SEED_PASSWORD, "role": "admin"})
+    assert response.status_code == 200, response.text
+    assert "password" not in response.json()["user"]
+    stored = (await memory_db.users.find_one({"email": seeded["admin_email"]}))["password"]
+    assert pbkdf2_sha256.from_string(stored).rounds == 1000
@@ -0,0 +1,130 @@
+from app.services.problem import (
+    ALL_DAYS, Interner, Problem, compile_assignments, compile_courses,
+    is_general_room, plan_sessions, room_type_key, weekly_sessions,
+)
+
+
+def test_interner_gives_dense_stable_ids():
+    interner = Interner()
+    assert [interner.intern(k) for k in ("a", "b", "a", "c")] == [0, 1, 0, 2]
+    assert interner.keys == ["a", "b", "c"]
+    assert len(interner) == 3
+
+
+def test_room_types_and_general_rooms():
+    assert room_type_key(" Computer Lab ") == "computer lab"
+    assert room_type_key("  ") is None
+    assert is_general_room(None)
+    assert is_general_room("lecture hall")
+    assert not is_general_room("computer lab")
+    assert not is_general_room("art-studio")
+
+
+def test_add_slot_fills_the_parallel_arrays():
+    problem = Problem()
+    assert problem.add_slot("Tuesday", "09:00", "11:00") == 0
+    assert problem.add_slot("Someday", "09:00", "11:00") is None
+    assert problem.slot_count == 1
+    assert problem.slot_day[0] == 1
+    assert (problem.slot_start[0], problem.slot_end[0]) == (1440 + 540, 1440 + 660)
+    assert problem.slot_duration[0] == 120
+    assert problem.slot_periods[0]
+
+
+def test_rooms_are_interned_once_and_unknown_rooms_stay_private():
+    problem = Problem()
+    doc = {"_id": "r1", "name": "Lab", "capacity": 40, "room_type": "Computer Lab"}
+    assert problem.add_room(doc) == problem.add_room(doc) == 0
+    assert problem.room_capacity[0] == 40
+    assert problem.room_type[0] == problem.room_types.ids["computer lab"]
+    assert not problem.room_general[0]
+
+    assert problem.room_id("r1") == 0
+    unknown = problem.room_id("elsewhere")
+    assert (problem.room_capacity[unknown], problem.room_available[unknown]) == (0, 0)
+    assert problem.room_id(None) == -1
+    assert problem.room_count == 2
+
+
+def test_tasks_group_their_sessions():
+    problem = Problem()
+    lecturer = problem.lecturer_id("l1")
+    assert problem.lecturer_id("l1") == lecturer
+    assert problem.lecturer_days[lecturer] == ALL_DAYS
+    first = problem.add_task({"n": 1}, lecturer, unit="u1", cohort="c1")
+    problem.add_task({"n": 1}, lecturer, unit="u1", cohort="c1", group=first, session=1)
+    alone = problem.add_task({"n": 2}, lecturer, unit="u2", room_type="Lab")
+    assert problem.groups() == [[0, 1], [2]]
+    assert list(problem.task_session) == [0, 1, 0]
+    assert problem.task_cohort[alone] == -1
+    assert problem.task_room_type[alone] == problem.room_types.ids["lab"]
+
+
+def test_plan_sessions_prefers_covering_then_closest_then_fewest():
+    assert plan_sessions(180, [120, 60]) == [120, 60]
+    assert plan_sessions(120, [120, 60]) == [120]
+    assert plan_sessions(300, [120]) == [120, 120]  # capped at two sessions
+    assert plan_sessions(100, [120, 180]) == [120]
+    assert plan_sessions(60, []) == []
+
+
+def test_weekly_sessions():
+    assert weekly_sessions({"total_hours": 45}, 15, [120, 60]) == [120, 60]
+    assert weekly_sessions({"total_hours": 45, "duration_hours": 1}, 15, [120]) == [60, 60]
+    assert weekly_sessions({"total_hours": 30, "session_hours": 2}, 15, [60]) == [120]
+    assert weekly_sessions({}, 15, [120]) == [0]
+    assert weekly_sessions({"total_hours": 45}, 0, [120]) == [0]
+
+
+def test_compile_assignments():
+    slots = [{"day": "Monday", "start_time": "07:00", "end_time": "09:00"},
+             {"day": "Monday", "start_time": "09:00", "end_time": "10:00"}]
+    assignments = [
+        {"lecturer_id": "l1", "unit_id": "u1", "course_id": "c1", "room_id": "r1",
+         "student_count": 30, "total_hours": 45},
+        {"lecturer_id": "l2", "unit_id": "u2", "course_id": "c1"},
+    ]
+    problem = compile_assignments(assignments, slots, [{"_id": "r1", "capacity": 50}],
+                                  availability={"l1": ["Monday", "Friday"]}, weeks=15,
+                                  masks={"l2": (3, 4)})
+    # 45 hours over 15 weeks: a two-hour and a one-hour session
+    assert problem.groups() == [[0, 1], [2]]
+    assert list(problem.task_minutes) == [120, 60, 0]
+    assert problem.task_room[0] == problem.rooms.ids["r1"]
+    assert problem.task_headcount[0] == 30
+    assert problem.task_room[2] == -1
+    l1, l2 = problem.lecturers.ids["l1"], problem.lecturers.ids["l2"]
+    assert problem.lecturer_days[l1] == 0b10001
+    assert problem.lecturer_days[l2] == ALL_DAYS
+    assert (problem.lecturer_unavailable[l2], problem.lecturer_preferred[l2]) == (3, 4)
+
+
+def test_compile_courses():
+    courses = [{"lecturer_id": "l1", "unit_id": "u1", "course_id": "c1",
+                "students": ["a", "b"], "duration_hours": 2}]
+    problem = compile_courses(courses, [{"_id": "r1", "capacity": 10}],
+                              [{"day": "Friday", "start": "07:00", "end": "09:00"}],
+                              {"l1": ["Friday"]})
+    assert (problem.task_count, problem.slot_count, problem.room_count) == (1, 1, 1)
+    assert problem.task_headcount[0] == 2
+    assert problem.task_minutes[0] == 120
+    assert problem.lecturer_days[0] == 1 << 4
+
+
+def test_bookings_lock_lecturer_and_room():
+    booked = [
+        {"lecturer_id": "l1", "room": "Hall", "day": "Monday", "start_time": "07:00", "end_time": "09:00"},
+        {"lecturer_id": "l2", "room": "TBA", "day": "Monday", "start_time": "09:00", "end_time": "11:00"},
+        {"lecturer_id": "l3", "day": "Someday", "start_time": "07:00", "end_time": "09:00"},
+    ]
+    problem = compile_assignments(
+        [{"lecturer_id": "l1", "unit_id": "u1"}], [], [{"_id": "r1", "name": "Hall", "code": "H1"}],
+        availability={"l1": ["Tuesday"]}, booked=booked)
+    l1, l2 = problem.lecturers.ids["l1"], problem.lecturers.ids["l2"]
+    assert problem.booked == [("lecturer", l1, 420, 540), ("room", 0, 420, 540),
+                              ("lecturer", l2, 540, 660)]
+    # Booking a lecturer does not override their availability
+    assert problem.lecturer_days[l1] == 0b10
+    assert problem.room_of({"room_code": "H1"}) == problem.room_of({"room_id": "r1"}) == 0
+    assert problem.room_of({}) == -1
+    assert problem.room_of({"room": "Elsewhere"}) is None
@@ -0,0 +1,46 @@
+import pytest
+
+from app.config import settings
+from app.security import token_digest, token_verifier
+from app.testing import seed_database
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+
+
+@pytest.mark.anyio
+async def test_admin_profile_is_stored_for_any_worker(memory_db, auth, request_app, profiling):
+    seeded = await seed_database(memory_db, courses=1)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+
+    response = await request_app("GET", "/admin/timetable", headers={**admin, "X-Profile": "1"})
+    assert response.status_code == 200
+    url = response.headers["X-Profile-Url"]
+    assert await memory_db.request_profiles.count_documents({}) == 1
+
+    profile = await request_app("GET", url, headers=admin)
+    assert profile.status_code == 200 and profile.text
+
+
+@pytest.mark.anyio
+async def test_only_valid_admin_tokens_are_profiled(memory_db, auth, request_app, profiling):
+    seeded = await seed_database(memory_db, courses=1)
+    student = auth("student", seeded["students"][0])
+    response = await request_app("GET", "/student/timetable", headers={**student, "X-Profile": "1"})
+    assert "X-Profile-Url" not in response.headers
+
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+    token = admin["Authorization"].split()[1]
+    token_verifier.revoke(token_digest(token), token_verifier.verify(token)["exp"])
+    response = await request_app("GET", "/", headers={**admin, "X-Profile": "1"})
+    assert "X-Profile-Url" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_profiling_is_off_by_default(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+    response = await request_app("GET", "/admin/timetable", headers={**admin, "X-Profile": "1"})
+    assert "X-Profile-Url" not in response.headers
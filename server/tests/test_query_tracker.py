@@ -0,0 +1,56 @@
+import json
+import logging
+from types import SimpleNamespace
+
+from app.config import settings
+from app.utils.query_tracker import RequestQueryStats, _current, query_shape, query_tracker, report
+
+
+def _event(request_id, command, duration_micros=100):
+    return SimpleNamespace(request_id=request_id, command_name=next(iter(command)),
+                           command=command, duration_micros=duration_micros)
+
+
+def test_query_shape_blanks_values():
+    a = query_shape("find", {"find": "users", "filter": {"email": "a@x", "age": {"$gt": 3}}})
+    b = query_shape("find", {"find": "users", "filter": {"email": "b@y", "age": {"$gt": 9}}})
+    assert a == b == 'find users {"age": {"$gt": "?"}, "email": "?"}'
+    assert query_shape("aggregate", {"aggregate": "c", "pipeline": [{"$match": {}}, {"$group": {}}]}) == \
+        'aggregate c ["$match", "$group"]'
+
+
+def test_repeated_shape_is_reported_as_n_plus_one(caplog, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_REPEAT_THRESHOLD", 3)
+    stats = RequestQueryStats({"path": "/admin/courses"})
+    token = _current.set(stats)
+    try:
+        for i in range(4):
+            query_tracker.started(_event(i, {"find": "courses", "filter": {"_id": i}}))
+            query_tracker.succeeded(_event(i, {"find": "courses", "filter": {"_id": i}}))
+    finally:
+        _current.reset(token)
+    assert stats.count == 4
+
+    with caplog.at_level(logging.WARNING, logger="timetable-system"):
+        report(stats, "GET")
+    warning = json.loads(caplog.records[-1].getMessage())
+    assert warning["event"] == "query_budget_exceeded"
+    assert warning["route"] == "/admin/courses"
+    assert warning["repeated_shapes"][0]["count"] == 4
+
+
+def test_quiet_request_is_not_reported(caplog):
+    stats = RequestQueryStats({"path": "/"})
+    stats.count = 1
+    with caplog.at_level(logging.WARNING, logger="timetable-system"):
+        report(stats, "GET")
+    assert not caplog.records
+
+
+def test_slow_query_log(caplog, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 50)
+    with caplog.at_level(logging.WARNING, logger="timetable-system.slow_queries"):
+        query_tracker.started(_event(99, {"find": "rooms", "filter": {}}))
+        query_tracker.succeeded(_event(99, {"find": "rooms", "filter": {}}, duration_micros=80_000))
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry["event"] == "slow_query" and entry["duration_ms"] == 80.0
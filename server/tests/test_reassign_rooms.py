@@ -0,0 +1,25 @@
+import pytest
+
+from app.testing import seed_database
+
+
+@pytest.mark.anyio
+async def test_lecturer_booked_room_is_not_taken(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1)
+    entry = await memory_db.timetable_entries.find_one({"semester": 1, "status": "active"})
+    room = await memory_db.rooms.find_one({"code": "R001"})
+    # Booked by a lecturer: no semester, "confirmed", room recorded by name only
+    await memory_db.timetable_entries.insert_one({
+        "lecturer_id": seeded["lecturers"][0]["id"], "unit_id": "other",
+        "room": room["name"], "day": entry["day"], "start_time": entry["start_time"],
+        "end_time": entry["end_time"], "week_start": entry["week_start"],
+        "week_end": entry["week_end"], "status": "confirmed",
+    })
+
+    response = await request_app(
+        "POST", "/timetable/reassign-rooms",
+        headers=auth("admin", seeded["admin_email"], seeded["admin_id"]),
+        json={"semester": 1, "academic_year": 2024})
+    assert response.status_code == 200, response.text
+    moved = await memory_db.timetable_entries.find_one({"_id": entry["_id"]})
+    assert moved["room_id"] != str(room["_id"])
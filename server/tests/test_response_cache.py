@@ -0,0 +1,79 @@
+import gzip
+import os
+
+import pytest
+from starlette.requests import Request
+
+from app.services.response_cache import (
+    CachedBody, ResponseCache, accepted_encodings, cached_response, encode_body
+)
+
+BODY = CachedBody(b"plain", b"gzipped", b"brotli")
+
+
+def _request(accept_encoding):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_accepted_encodings_parses_q_values():
+    assert accepted_encodings("gzip, br;q=0.5, *;q=0") == {"gzip": 1.0, "br": 0.5, "*": 0.0}
+    assert accepted_encodings("GZIP;q=bad") == {"gzip": 0.0}
+    assert accepted_encodings("") == {}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "brotli"),
+    ("br;q=0, gzip", "gzipped"),
+    ("gzip;q=0", "plain"),
+    ("gzip;q=1, br;q=0.5", "gzipped"),
+    ("*", "brotli"),
+    ("*;q=0, gzip", "gzipped"),
+    (None, "plain"),
+])
+def test_cached_response_honours_q_values(header, expected):
+    response = cached_response(_request(header), BODY)
+    assert response.body.decode() == expected
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+
+def test_cached_response_without_brotli_falls_back_to_gzip():
+    response = cached_response(_request("br, gzip;q=0.1"), CachedBody(b"plain", b"gzipped", None))
+    assert response.body == b"gzipped"
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_encode_body_precompresses():
+    cached = encode_body({"data": [1, 2]})
+    assert cached.identity == b'{"data":[1,2]}'
+    assert gzip.decompress(cached.gzip) == cached.identity
+
+
+def test_lru_spills_and_reloads(tmp_path):
+    cache = ResponseCache(1, str(tmp_path), spill_max=1)
+    cache.put(("a",), {"n": 1})
+    cache.put(("b",), {"n": 2})
+    assert len(os.listdir(tmp_path)) == 1
+    assert cache.get(("a",)).identity == b'{"n":1}'
+    # Reloading "a" spilled "b"; the oldest file beyond spill_max is removed
+    assert cache.get(("b",)).identity == b'{"n":2}'
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_spilled_files_are_indexed_at_startup(tmp_path):
+    first = ResponseCache(1, str(tmp_path), spill_max=10)
+    first.put(("a",), {"n": 1})
+    first.put(("b",), {"n": 2})
+
+    restarted = ResponseCache(1, str(tmp_path), spill_max=10)
+    assert restarted.get(("a",)).identity == b'{"n":1}'
+
+
+def test_startup_trims_spill_dir_to_limit(tmp_path):
+    first = ResponseCache(1, str(tmp_path), spill_max=10)
+    for n in range(4):
+        first.put((n,), {"n": n})
+    assert len(os.listdir(tmp_path)) == 3
+
+    ResponseCache(1, str(tmp_path), spill_max=2)
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,51 @@
+from app.services.room_index import RoomIndex
+
+ROOMS = [
+    {"_id": "big", "name": "Hall", "capacity": 200, "house": "Main", "department_id": "d2"},
+    {"_id": "small", "name": "Seminar", "capacity": 25, "house": "Block A", "department_id": "d1"},
+    {"_id": "mid", "name": "Room 2", "capacity": 60, "house": "Block A", "department_id": "d1"},
+    {"_id": "mid-main", "name": "Room 9", "capacity": 60, "house": "Main", "department_id": "d2"},
+    {"_id": "lab", "name": "Lab", "capacity": 40, "house": "Block A", "department_id": "d1",
+     "room_type": "Computer Lab"},
+    {"_id": "closed", "name": "Closed", "capacity": 50, "house": "Main", "is_available": False},
+]
+
+
+def _ids(index, rooms):
+    return [index.record(r).id for r in rooms]
+
+
+def test_candidates_are_best_fit_first_and_exclude_unavailable_rooms():
+    index = RoomIndex.from_documents(ROOMS)
+    assert len(index) == 5
+    assert _ids(index, index.candidates(30)) == ["mid", "mid-main", "big"]
+    assert _ids(index, index.candidates(0)) == ["small", "mid", "mid-main", "big"]
+    assert index.candidates(500) == []
+
+
+def test_typed_requests_only_see_rooms_of_that_type():
+    index = RoomIndex.from_documents(ROOMS)
+    assert _ids(index, index.candidates(10, "computer lab ")) == ["lab"]
+    assert index.candidates(10, "Chemistry Lab") == []
+    # Labs never serve untyped requests
+    assert "lab" not in _ids(index, index.candidates(10))
+
+
+def test_best_fit_prefers_the_department_house():
+    index = RoomIndex.from_documents(ROOMS)
+    assert index.department_house("d1") == "Block A"
+    assert index.department_house(None) is None
+    assert index.record(index.best_fit(50)).id == "mid"
+    assert index.record(index.best_fit(50, department_id="d2")).id == "mid-main"
+    assert index.record(index.best_fit(50, house="Main")).id == "mid-main"
+    # Falls back to the rest of campus when the house has nothing big enough
+    assert index.record(index.best_fit(150, department_id="d1")).id == "big"
+
+
+def test_best_fit_walks_past_rejected_rooms():
+    index = RoomIndex.from_documents(ROOMS)
+    busy = {index.problem.rooms.ids["mid"], index.problem.rooms.ids["mid-main"]}
+    room = index.best_fit(50, accept=lambda r: r not in busy)
+    assert index.record(room).id == "big"
+    assert index.best_fit(50, accept=lambda r: False) is None
+    assert index.capacity(room) == 200
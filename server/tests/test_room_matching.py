@@ -0,0 +1,78 @@
+from app.services.problem import Problem, compile_assignments
+from app.services.room_matching import RoomMatcher, Session, _hungarian
+from app.services.timetable_optimizer import TimetableGenerator
+
+ROOMS = [{"_id": "big", "name": "Big", "capacity": 100}, {"_id": "small", "name": "Small", "capacity": 30}]
+# A 3h and a 2h slot starting at the same time
+SLOTS = [
+    {"day": "Monday", "start_time": "08:00", "end_time": "11:00"},
+    {"day": "Monday", "start_time": "08:00", "end_time": "10:00"},
+]
+
+
+def _assignment(key, students, hours):
+    return {"_id": key, "lecturer_id": f"L{key}", "unit_id": f"u{key}", "course_id": f"c{key}",
+            "room_id": "", "student_count": students, "duration_hours": hours}
+
+
+def test_hungarian_finds_minimum():
+    cost = [[4, 1, 3], [2, 0, 5], [3, 2, 2]]
+    columns = _hungarian(cost)
+    assert sorted(columns) == [0, 1, 2]
+    assert sum(cost[r][c] for r, c in enumerate(columns)) == 5
+
+
+def test_small_class_moves_out_of_big_room():
+    problem = Problem()
+    for room in ROOMS:
+        problem.add_room(room)
+    big, small = problem.rooms.ids["big"], problem.rooms.ids["small"]
+    # 25 students took Big first; 90 students at the same time have no room
+    sessions = [Session("small-class", 480, 600, headcount=25, room=big),
+                Session("big-class", 480, 600, headcount=90)]
+
+    stats = RoomMatcher(problem).reassign(sessions)
+
+    assert [s.room for s in sessions] == [small, big]
+    assert stats["seated_before"] == 1 and stats["seated_after"] == 2
+
+
+def test_overlapping_slots_keep_longer_session_room():
+    # A (3h) takes Big, B (2h) takes Small; C (2h) only fits by repacking.
+    assignments = [_assignment("A", 90, 3), _assignment("B", 28, 2), _assignment("C", 25, 2)]
+
+    result = TimetableGenerator().solve(compile_assignments(assignments, SLOTS, ROOMS))
+
+    rooms = {e["assignment_id"]: e["room"] for e in result["timetable"]}
+    assert rooms == {"A": "Big", "B": "Small"}
+    assert [u["assignment_id"] for u in result["unassigned"]] == ["C"]
+    assert result["stats"]["wasted_seats_after"] <= result["stats"]["wasted_seats_before"]
+
+
+def test_locked_rooms_are_never_reassigned():
+    problem = Problem()
+    for room in ROOMS:
+        problem.add_room(room)
+    big = problem.rooms.ids["big"]
+    sessions = [Session("s", 480, 600, headcount=20)]
+
+    RoomMatcher(problem).reassign(sessions, locked=[(problem.rooms.ids["small"], 540, 660)])
+
+    assert sessions[0].room == big
+
+
+def test_generator_works_around_booked_rooms_and_lecturers():
+    slots = [{"day": "Monday", "start_time": "08:00", "end_time": "10:00"},
+             {"day": "Tuesday", "start_time": "08:00", "end_time": "10:00"}]
+    booked = [{"lecturer_id": "LA", "room_id": "", "day": "Monday", "start_time": "09:00", "end_time": "11:00"},
+              {"lecturer_id": "other", "room": "Small", "day": "Tuesday", "start_time": "08:00", "end_time": "09:00"}]
+    assignments = [_assignment("A", 20, 2), _assignment("B", 20, 2)]
+
+    problem = compile_assignments(assignments, slots, ROOMS, booked=booked)
+    result = TimetableGenerator().solve(problem)
+
+    placed = {e["assignment_id"]: (e["day"], e["room"]) for e in result["timetable"]}
+    # A's lecturer is busy on Monday; Small is booked on Tuesday, so the
+    # class there takes Big instead
+    assert placed["A"] == ("Tuesday", "Big")
+    assert placed["B"] == ("Monday", "Small")
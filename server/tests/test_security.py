@@ -0,0 +1,37 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.security import TokenVerifier, create_token, token_digest
+
+
+def test_revoked_token_is_rejected_while_cached():
+    verifier = TokenVerifier()
+    token = create_token({"email": "a@example.com"})
+    claims = verifier.verify(token)
+    verifier.revoke(token_digest(token), claims["exp"])
+    with pytest.raises(HTTPException):
+        verifier.verify(token)
+
+
+def test_expired_revocations_are_dropped():
+    verifier = TokenVerifier()
+    now = time.time()
+    verifier.revoke("old", now - 10)
+    verifier.revoke("stale", now + 0.05)
+    verifier.revoke("live", now + 3600)
+    assert set(verifier._revoked) == {"stale", "live"}
+
+    time.sleep(0.06)
+    verifier.revoke("another", now + 3600)
+    assert set(verifier._revoked) == {"live", "another"}
+
+
+def test_callers_get_their_own_claims():
+    verifier = TokenVerifier()
+    token = create_token({"email": "a@example.com", "role": "student"})
+    verifier.verify(token)["role"] = "admin"
+    claims = verifier.verify(token)
+    claims["role"] = "admin"
+    assert verifier.verify(token)["role"] == "student"
@@ -0,0 +1,40 @@
+from app.services.intervals import interval_fields
+from app.services.room_index import RoomIndex
+from app.services.slot_ranking import SlotRanker
+
+ROOMS = [
+    {"_id": "r1", "code": "R1", "name": "Room 1", "capacity": 40, "room_type": "Lecture hall"},
+    {"_id": "r2", "code": "R2", "name": "Room 2", "capacity": 80, "room_type": "Lecture hall"},
+]
+
+
+def _slot(day, start, end):
+    return {"day": day, "start_time": start, "end_time": end, **interval_fields(day, start, end)}
+
+
+def _ranker(entries, shared_students=None):
+    return SlotRanker("lec", "unit", 30, None, entries, RoomIndex.from_documents(ROOMS),
+                      shared_students or {}, [])
+
+
+def test_overlapping_slot_is_ranked_with_its_cohort_cost():
+    other = {**_slot("Monday", "09:00", "11:00"), "unit_id": "other", "lecturer_id": "x", "room_id": "r1"}
+    ranker = _ranker([other], {"other": 12})
+    clash, clear = _slot("Monday", "09:00", "11:00"), _slot("Tuesday", "09:00", "11:00")
+
+    ranked = ranker.top([clash, clear], 5)
+    assert [r["day"] for r in ranked] == ["Tuesday", "Monday"]
+    assert ranked[1]["breakdown"]["cohort"] == 12
+    assert ranked[1]["room"] == "Room 2"  # Room 1 is taken then
+
+
+def test_slot_without_free_room_or_with_own_class_is_skipped():
+    entries = [
+        {**_slot("Monday", "09:00", "11:00"), "unit_id": "a", "lecturer_id": "x", "room_id": "r1"},
+        {**_slot("Monday", "09:00", "11:00"), "unit_id": "b", "lecturer_id": "y", "room": "Room 2"},
+        {**_slot("Tuesday", "09:00", "11:00"), "unit_id": "c", "lecturer_id": "lec", "room_id": "r1"},
+    ]
+    ranker = _ranker(entries)
+    candidates = [_slot("Monday", "09:00", "11:00"), _slot("Tuesday", "10:00", "12:00"),
+                  _slot("Wednesday", "09:00", "11:00")]
+    assert [r["day"] for r in ranker.top(candidates, 5)] == ["Wednesday"]
@@ -0,0 +1,146 @@
+from itertools import combinations
+
+import pytest
+from bson import ObjectId
+
+from app.services import versioning
+from app.services.intervals import interval_of, overlaps
+from app.testing import seed_database
+
+
+@pytest.mark.anyio
+async def test_generate_places_without_clashes(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=3)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+
+    response = await request_app("POST", "/timetable/generate", headers=admin,
+                                 json={"semester": 1, "academic_year": 2024})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["generated_entries"] > 0
+    assert body["clashes_detected"] == 0
+
+    entries = await memory_db.timetable_entries.find({"source": "generator"}).to_list(None)
+    assert len(entries) == body["generated_entries"]
+    for a, b in combinations(entries, 2):
+        if overlaps(interval_of(a), interval_of(b)):
+            assert a["lecturer_id"] != b["lecturer_id"]
+            assert not a.get("room_id") or a.get("room_id") != b.get("room_id")
+
+    versions = await versioning.current_versions([versioning.semester_key(2024, 1)])
+    assert versions[versioning.semester_key(2024, 1)] >= 1
+
+
+@pytest.mark.anyio
+async def test_generate_works_around_booked_entries(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=3)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+    # Each course's first assignment has a seeded, lecturer-booked entry;
+    # a second assignment is confirmed through the slot-selection flow
+    confirmed = seeded["assignments"][1]
+    await memory_db.lecturer_assignments.update_one(
+        {"_id": ObjectId(confirmed)}, {"$set": {"confirmed_time_slot_id": "elsewhere"}})
+    booked = await memory_db.timetable_entries.find({}).to_list(None)
+    payload = {"semester": 1, "academic_year": 2024}
+
+    for _ in range(2):  # a rerun must not be blocked by the run it replaces
+        response = await request_app("POST", "/timetable/generate", headers=admin, json=payload)
+        assert response.status_code == 200, response.text
+        generated = await memory_db.timetable_entries.find({"source": "generator"}).to_list(None)
+        assert len(generated) == response.json()["generated_entries"] > 0
+
+        scheduled = {e["assignment_id"] for e in generated}
+        assert not scheduled & {e["assignment_id"] for e in booked}
+        assert confirmed not in scheduled
+        for entry in generated:
+            for held in booked:
+                if overlaps(interval_of(entry), interval_of(held)):
+                    assert entry["lecturer_id"] != held["lecturer_id"]
+                    assert entry.get("room_id") != held["room_id"]
+
+    assert await memory_db.timetable_entries.count_documents({"source": {"$exists": False}}) == len(booked)
+
+
+@pytest.mark.anyio
+async def test_student_timetable_conditional_get(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1)
+    email = seeded["students"][0]
+    user = await memory_db.users.find_one({"email": email})
+    student = auth("student", email, str(user["_id"]))
+
+    first = await request_app("GET", "/student/timetable", headers=student)
+    assert first.status_code == 200, first.text
+    etag = first.headers["ETag"]
+    again = await request_app("GET", "/student/timetable",
+                              headers={**student, "If-None-Match": etag})
+    assert again.status_code == 304
+
+    # Other courses' and global timetable writes leave the view's ETag alone
+    await versioning.bump(versioning.TIMETABLE, versioning.course_key("another-course"))
+    again = await request_app("GET", "/student/timetable",
+                              headers={**student, "If-None-Match": etag})
+    assert again.status_code == 304
+
+    await versioning.bump(versioning.course_key(seeded["courses"][0]))
+    changed = await request_app("GET", "/student/timetable",
+                                headers={**student, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.anyio
+async def test_student_304_needs_only_the_version_lookup(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=2)
+    email = seeded["students"][0]
+    user = await memory_db.users.find_one({"email": email})
+    student = auth("student", email, str(user["_id"]))
+
+    first = await request_app("GET", "/student/timetable", headers=student)
+    assert first.status_code == 200
+    assert first.json()["data"]
+    etag = first.headers["ETag"]
+
+    # The enrollment isn't read again: removing it behind the app's back
+    # still answers from the recorded course keys
+    await memory_db.student_enrollments.delete_many({"student": email})
+    again = await request_app("GET", "/student/timetable",
+                              headers={**student, "If-None-Match": etag})
+    assert again.status_code == 304
+
+    # Enrolling through the app moves the ETag to the new course
+    enrolled = await request_app("POST", f"/student/enroll/{seeded['courses'][1]}",
+                                 headers=student, json={"unit_ids": []})
+    assert enrolled.status_code == 200, enrolled.text
+    moved = await request_app("GET", "/student/timetable",
+                              headers={**student, "If-None-Match": etag})
+    assert moved.status_code == 200
+    assert {e["course_id"] for e in moved.json()["data"]} == {seeded["courses"][1]}
+
+
+@pytest.mark.anyio
+async def test_admin_timetable_lists_entries(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=2)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+
+    first = await request_app("GET", "/admin/timetable", headers=admin)
+    assert first.status_code == 200, first.text
+    data = first.json()["data"]
+    assert len(data) == await memory_db.timetable_entries.count_documents({})
+    assert data
+
+    again = await request_app("GET", "/admin/timetable",
+                              headers={**admin, "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_generate_tracks_memory_only_on_request(memory_db, auth, request_app):
+    seeded = await seed_database(memory_db, courses=1)
+    admin = auth("admin", seeded["admin_email"], seeded["admin_id"])
+    payload = {"semester": 1, "academic_year": 2024}
+
+    plain = await request_app("POST", "/timetable/generate", headers=admin, json=payload)
+    assert plain.json()["stats"]["peak_memory_bytes"] is None
+    traced = await request_app("POST", "/timetable/generate", headers=admin,
+                               json={**payload, "track_memory": True})
+    assert traced.json()["stats"]["peak_memory_bytes"] > 0
@@ -0,0 +1,37 @@
+import pytest
+
+from app.services import versioning
+
+
+@pytest.mark.anyio
+async def test_bump_and_current_versions(memory_db):
+    course = versioning.course_key("c1")
+    assert await versioning.current_versions([course]) == {course: 0}
+    await versioning.bump(course, versioning.TIMETABLE, course, "")
+    await versioning.bump(course)
+    assert await versioning.current_versions([course, versioning.TIMETABLE]) == \
+        {course: 2, versioning.TIMETABLE: 1}
+
+
+@pytest.mark.anyio
+async def test_student_counter_records_courses(memory_db):
+    assert await versioning.student_versions("s1") is None
+    await versioning.bump(versioning.course_key("c1"), enrollments={"s1": ["c1"]})
+    course_ids, versions = await versioning.student_versions("s1")
+    assert course_ids == ["c1"]
+    assert versions == {versioning.student_key("s1"): 1, versioning.course_key("c1"): 1}
+
+    # Backfilling never overwrites keys an enrollment write recorded
+    await versioning.track_student("s1", ["stale"])
+    assert (await versioning.student_versions("s1"))[0] == ["c1"]
+    await versioning.track_student("s2", ["c2"])
+    assert await versioning.student_versions("s2") == (
+        ["c2"], {versioning.student_key("s2"): 0, versioning.course_key("c2"): 0}
+    )
+
+
+def test_etag_follows_versions():
+    first = versioning.make_etag("student:s1", {"a": 1, "b": 2})
+    assert first == versioning.make_etag("student:s1", {"b": 2, "a": 1})
+    assert first != versioning.make_etag("student:s1", {"a": 2, "b": 2})
+    assert first != versioning.make_etag("student:s2", {"a": 1, "b": 2})